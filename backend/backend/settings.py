@@ -64,6 +64,68 @@ CHANNEL_LAYERS = {
 }
 
 
+# Notification fan-out (stories/fanout.py): chunked inserts + batched pushes
+# run on a background thread after the saving transaction commits.
+NOTIFICATION_FANOUT_ASYNC = os.getenv('NOTIFICATION_FANOUT_ASYNC', 'True').lower() == 'true'
+NOTIFICATION_FANOUT_CHUNK_SIZE = 500
+NOTIFICATION_FANOUT_WORKERS = 2
+
+# Read notifications older than this are removed by `manage.py prune_notifications`.
+NOTIFICATION_RETENTION_DAYS = 90
+
+# Following timeline (/api/core/feed/, stories/timeline.py): readers with at least
+# FEED_CACHE_MIN_READS reads per FEED_READS_WINDOW seconds get the newest
+# FEED_CACHE_SIZE entries cached for FEED_CACHE_TTL seconds; others merge on read.
+FEED_CACHE_MIN_READS = 5
+FEED_READS_WINDOW = 3600
+FEED_CACHE_SIZE = 200
+FEED_CACHE_TTL = 600
+
+# Trending / popular shelves (stories/ranking.py). Engagement bumps
+# Story.trending_score by RANKING_WEIGHTS; `manage.py decay_trending_scores`
+# (run hourly) halves scores every RANKING_HALF_LIFE_HOURS, and its --recompute
+# option (run daily) rebuilds them from the engagement rows. The top
+# RANKING_CACHE_SIZE ids per shelf are cached for RANKING_CACHE_TTL seconds.
+RANKING_WEIGHTS = {'likes': 1.0, 'bookmarks': 2.0, 'comment': 3.0, 'chapter': 5.0}
+RANKING_HALF_LIFE_HOURS = 72
+RANKING_MIN_SCORE = 0.01
+RANKING_CACHE_SIZE = 500
+RANKING_CACHE_TTL = 300
+
+# Tag name -> id map for story writes and imports (stories/tags.py), kept in the
+# default cache for TAG_ID_CACHE_TTL seconds. None = only when that cache is
+# shared (Redis), so a rename or delete in one worker is seen by all of them.
+TAG_ID_CACHE_ENABLED = None
+TAG_ID_CACHE_TTL = 3600
+
+
+# How long each worker trusts its cached chat room name -> id (chat/rooms.py)
+CHAT_ROOM_ID_TTL = 300
+
+# Chat history endpoint page size (`?limit=` is capped at the max)
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+# Chat presence (chat/presence.py): connections not refreshed within the TTL
+# are treated as gone; consumers refresh every CHAT_PRESENCE_HEARTBEAT seconds.
+CHAT_PRESENCE_TTL = 90
+CHAT_PRESENCE_HEARTBEAT = 30
+
+# Chat write-behind buffer (chat/buffer.py)
+CHAT_BUFFER_MAX_BATCH = 100
+CHAT_BUFFER_FLUSH_INTERVAL = 0.5
+CHAT_BUFFER_MAX_PENDING = 5000
+
+# Chat inbound rate limits (frames/second and burst, per connection) and
+# typing-indicator batching (chat/typing.py)
+CHAT_MESSAGE_RATE = 2
+CHAT_MESSAGE_BURST = 5
+CHAT_TYPING_RATE = 2
+CHAT_TYPING_BURST = 4
+CHAT_TYPING_INTERVAL = 1.0
+CHAT_TYPING_TIMEOUT = 4.0
+
+
 ROOT_URLCONF = 'backend.urls'
 
 
@@ -88,7 +150,8 @@ ALLOWED_HOSTS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from the token claims; CustomUser loads lazily
+        'users.authentication.StatelessJWTAuthentication',
     ),
 }
 
@@ -121,6 +184,37 @@ DATABASES = {
 }
 
 
+# Caches. 'default' holds shared state (auth, follow graph, feeds, response
+# cache versions): Redis when CACHE_REDIS_URL is set, else per-process memory.
+# 'local' is always per-process, the response cache's first tier.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Anonymous read cache (stories/response_cache.py): bodies live RESPONSE_CACHE_TTL
+# seconds in the shared tier and RESPONSE_CACHE_LOCAL_TTL in process memory;
+# on a miss other callers wait up to RESPONSE_CACHE_LOCK_WAIT for the rebuild.
+# Invalidation only reaches other workers through Redis (CACHE_REDIS_URL);
+# without it each process serves what it cached for up to the local TTL.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TTL = 60
+RESPONSE_CACHE_LOCAL_TTL = 5
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+RESPONSE_CACHE_LOCK_WAIT = 2.0
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -138,6 +232,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Token -> user cache lifetime for REST and WebSocket auth (users/authentication.py),
+# capped by the token's own expiry
+AUTH_USER_CACHE_TTL = 300
+# REST reads authenticate from the token without a user query. None = only when
+# the default cache is shared (Redis), since per-process caches can't see a
+# deactivation made by another worker. Writes always load the user row.
+AUTH_STATELESS_JWT = None
+
+# Cached follower/following id sets (users/graph.py); users with more than MAX
+# edges are not cached and fall back to a query. None = only when the default
+# cache is shared (Redis), so a follow made in one worker is seen by all of them.
+FOLLOW_GRAPH_CACHE_ENABLED = None
+FOLLOW_GRAPH_CACHE_MAX = 5000
+FOLLOW_GRAPH_CACHE_TTL = 3600
+
+
 #JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=5), 
@@ -0,0 +1,145 @@
+import asyncio
+import atexit
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Message
+
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBufferFull(Exception):
+    """Raised when the database has fallen too far behind to accept more messages."""
+
+
+#-----------------WRITE-BEHIND BUFFER--------------------------------
+
+class MessageBuffer:
+    """
+    Collects chat messages in memory and persists them with bulk_create.
+
+    A flush runs when `max_batch` messages are pending or `flush_interval`
+    seconds after the first pending message, whichever comes first, so the
+    consumer can broadcast without waiting on the database. If `max_pending`
+    messages pile up (the DB is slow or down), senders wait for a flush, and if
+    that still doesn't drain the backlog they get MessageBufferFull.
+    Whatever is still pending at interpreter exit is written synchronously.
+    """
+
+    def __init__(self, max_batch=100, flush_interval=0.5, max_pending=5000):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = []
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._tasks = set()
+
+    async def add(self, room_id, user_id, content):
+        if len(self.pending) >= self.max_pending:
+            # Backpressure: the sender waits for the database before queueing more.
+            await self.flush()
+            if len(self.pending) >= self.max_pending:
+                raise MessageBufferFull()
+
+        # Stamp now, not at flush time, so history order matches broadcast order.
+        self.pending.append(Message(room_id=room_id, user_id=user_id, content=content, timestamp=timezone.now()))
+
+        if len(self.pending) >= self.max_batch:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._spawn_flush)
+
+    def _spawn_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Persist everything pending; returns the number of rows written."""
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            try:
+                await database_sync_to_async(_bulk_insert)(batch)
+            except IntegrityError:
+                # One bad row (e.g. its user was deleted meanwhile) must not
+                # wedge the whole backlog: save row by row and drop the rejects.
+                return await database_sync_to_async(_insert_each)(batch)
+            except Exception:
+                logger.exception("Chat write-behind flush of %d messages failed; will retry", len(batch))
+                self.pending[:0] = batch
+                self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._spawn_flush)
+                return 0
+            return len(batch)
+
+    def flush_sync(self):
+        """Blocking flush for shutdown, when no event loop is running any more."""
+        batch, self.pending = self.pending, []
+        try:
+            if batch:
+                _bulk_insert(batch)
+        except Exception:
+            self.pending[:0] = batch
+            raise
+        return len(batch)
+
+
+def _bulk_insert(batch):
+    Message.objects.bulk_create(batch, batch_size=500)
+
+
+def _insert_each(batch):
+    written = 0
+    for message in batch:
+        try:
+            with transaction.atomic():
+                message.save(force_insert=True)
+            written += 1
+        except IntegrityError:
+            logger.warning("Dropping chat message that can no longer be stored: %r", message.content[:50])
+    return written
+
+
+#-----------------PROCESS-WIDE INSTANCE--------------------------------
+
+_buffer = None
+_buffer_loop = None
+
+
+def get_message_buffer():
+    """The buffer for the running event loop (one per Daphne worker process)."""
+    global _buffer, _buffer_loop
+    loop = asyncio.get_running_loop()
+    if _buffer is None or _buffer_loop is not loop:
+        previous = _buffer
+        _buffer = MessageBuffer(
+            max_batch=getattr(settings, "CHAT_BUFFER_MAX_BATCH", 100),
+            flush_interval=getattr(settings, "CHAT_BUFFER_FLUSH_INTERVAL", 0.5),
+            max_pending=getattr(settings, "CHAT_BUFFER_MAX_PENDING", 5000),
+        )
+        if previous is not None:
+            # The old loop is gone; its timer will never fire, so adopt its backlog.
+            _buffer.pending = previous.pending
+        _buffer_loop = loop
+    return _buffer
+
+
+@atexit.register
+def _flush_on_exit():
+    if _buffer is not None and _buffer.pending:
+        try:
+            written = _buffer.flush_sync()
+            logger.info("Flushed %d buffered chat messages on shutdown", written)
+        except Exception:
+            logger.exception("Lost %d buffered chat messages on shutdown", len(_buffer.pending))
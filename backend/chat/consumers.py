@@ -1,35 +1,75 @@
 # consumers.py
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import ChatRoom, Message
+from django.conf import settings
+from .buffer import MessageBufferFull, get_message_buffer
+from .presence import get_presence
+from .rooms import cached_room_id, can_join, get_room_id, room_group_name
+from .throttle import TokenBucket, stats
+from .typing import get_typing_coalescer
 from django.contrib.auth.models import AnonymousUser
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
-    connected_users = set()
 
     async def connect(self):
-        self.room_name = "global"
-        self.room_group_name = "chat_global"
+        self.room_name = self.scope["url_route"]["kwargs"].get("room_name", "global")
+        self.room_group_name = room_group_name(self.room_name)
         self.user = self.scope["user"]
 
         if isinstance(self.user, AnonymousUser):
             await self.close()
             return
 
-        self.connected_users.add(self.user.username)
+        if not await database_sync_to_async(can_join)(self.user, self.room_name):
+            await self.close()
+            return
+
+        # Cached per process, so sending a message rarely has to look the room up
+        self.room_id = await database_sync_to_async(get_room_id)(self.room_name)
+        self.presence = get_presence()
+        self.message_bucket = TokenBucket(
+            getattr(settings, "CHAT_MESSAGE_RATE", 2), getattr(settings, "CHAT_MESSAGE_BURST", 5)
+        )
+        self.typing_bucket = TokenBucket(
+            getattr(settings, "CHAT_TYPING_RATE", 2), getattr(settings, "CHAT_TYPING_BURST", 4)
+        )
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
 
-        await self.send_online_user_count()
+        diff = await self.presence.join(self.room_name, self.user.username, self.channel_name)
+
+        # Full list goes to the newcomer only; everyone else gets the diff.
+        await self.send(text_data=json.dumps({
+            "type": "presence",
+            "online_users": await self.presence.online_users(self.room_name),
+            "online_count": diff.online_count,
+        }))
+        await self.broadcast_presence(diff)
+
+        self.heartbeat_task = asyncio.create_task(self.heartbeat_loop())
 
     async def disconnect(self, close_code):
-        if not isinstance(self.user, AnonymousUser):
-            self.connected_users.discard(self.user.username)
-            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
-            await self.send_online_user_count()
+        if not hasattr(self, "room_id"):
+            return
+        if hasattr(self, "heartbeat_task"):
+            self.heartbeat_task.cancel()
+        get_typing_coalescer().update(self.room_group_name, self.user.username, False)
+        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        diff = await self.presence.leave(self.room_name, self.user.username, self.channel_name)
+        await self.broadcast_presence(diff)
+
+    async def heartbeat_loop(self):
+        # Keeps this connection's presence entry alive; if the worker dies the
+        # entry expires after CHAT_PRESENCE_TTL and is swept by the next caller.
+        interval = getattr(settings, "CHAT_PRESENCE_HEARTBEAT", 30)
+        while True:
+            await asyncio.sleep(interval)
+            diff = await self.presence.heartbeat(self.room_name, self.user.username, self.channel_name)
+            await self.broadcast_presence(diff)
 
     async def receive(self, text_data):
         data = json.loads(text_data)
@@ -37,66 +77,88 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message = data.get("message")
         typing = data.get("typing")
 
+        if message and not self.message_bucket.allow():
+            stats["messages_dropped"] += 1
+            await self.reject_message("You're sending messages too fast.")
+            return
+
         if message:
-            await self.save_message(self.user, self.room_name, message)
+            # Re-resolved once the cached id expires, in case the room was recreated
+            self.room_id = cached_room_id(self.room_name) or await database_sync_to_async(get_room_id)(self.room_name)
+            # Queued for a batched write; the broadcast doesn't wait on the DB.
+            try:
+                await get_message_buffer().add(self.room_id, self.user.id, message)
+            except MessageBufferFull:
+                await self.reject_message("Chat is busy right now, your message was not sent.")
+                return
 
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     "type": "chat_message",
+                    "room": self.room_name,
                     "message": message,
                     "user": self.user.username,
-                    "online_users": list(self.connected_users),
-                    "online_count": len(self.connected_users),
                 },
             )
 
         if typing is not None:
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    "type": "user_typing",
-                    "user": self.user.username,
-                    "typing": typing,
-                },
-            )
+            # Stop frames always pass: they end a state and never fan out twice.
+            if not typing or self.typing_bucket.allow():
+                # Coalesced per room and sent in batches; see chat/typing.py
+                get_typing_coalescer().update(self.room_group_name, self.user.username, bool(typing))
+            else:
+                stats["typing_dropped"] += 1
+
+    async def reject_message(self, error):
+        # A message frame ends the sender's typing state whether or not it was
+        # posted (so any typing flag on it is moot); the error lets the UI say why.
+        get_typing_coalescer().update(self.room_group_name, self.user.username, False)
+        await self.send(text_data=json.dumps({"type": "error", "error": error}))
 
     async def chat_message(self, event):
         await self.send(
             text_data=json.dumps(
                 {
+                    "room": event.get("room", self.room_name),
                     "message": event["message"],
                     "user": event["user"],
-                    "online_users": event.get("online_users", []),
-                    "online_count": event.get("online_count", 0),
                 }
             )
         )
 
-    async def user_typing(self, event):
+    async def typing_update(self, event):
         await self.send(
             text_data=json.dumps(
                 {
-                    "typing": event["typing"],
-                    "user": event["user"],
                     "type": "typing",
+                    "started": event["started"],
+                    "stopped": event["stopped"],
                 }
             )
         )
 
-    async def send_online_user_count(self):
+    async def presence_diff(self, event):
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "type": "presence_diff",
+                    "joined": event["joined"],
+                    "left": event["left"],
+                    "online_count": event["online_count"],
+                }
+            )
+        )
+
+    async def broadcast_presence(self, diff):
+        if not diff:
+            return
         await self.channel_layer.group_send(
             self.room_group_name,
             {
-                "type": "chat_message",
-                "message": "",
-                "user": "system",
-                "online_users": list(self.connected_users),
-                "online_count": len(self.connected_users),
+                "type": "presence_diff",
+                "joined": diff.joined,
+                "left": diff.left,
+                "online_count": diff.online_count,
             },
         )
-
-    @database_sync_to_async
-    def save_message(self, user, room_name, message):
-        room, _ = ChatRoom.objects.get_or_create(name=room_name)
-        return Message.objects.create(room=room, user=user, content=message)
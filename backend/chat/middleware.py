@@ -4,24 +4,25 @@ from urllib.parse import parse_qs
 from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
 from rest_framework_simplejwt.tokens import AccessToken
-from django.contrib.auth import get_user_model
+from users.authentication import resolve_user
 
-User = get_user_model()
 
-@database_sync_to_async
+# Every socket route goes through TokenAuthMiddleware, so this is the one place
+# a WebSocket token becomes a user; users.authentication caches it per token id.
 def get_user_from_token(token):
     try:
-        access_token = AccessToken(token)
-        return User.objects.get(id=access_token["user_id"])
-    except Exception:
+        return resolve_user(AccessToken(token))
+    except (TokenError, AuthenticationFailed):
         return AnonymousUser()
 
+
 class TokenAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
         query_string = scope.get("query_string", b"").decode()
         query_params = parse_qs(query_string)
         token = query_params.get("token", [None])[0]
 
-        scope["user"] = await get_user_from_token(token) if token else AnonymousUser()
+        scope["user"] = await database_sync_to_async(get_user_from_token)(token) if token else AnonymousUser()
         return await super().__call__(scope, receive, send)
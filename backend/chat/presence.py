@@ -0,0 +1,218 @@
+import time
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+#-----------------PRESENCE DIFF--------------------------------
+
+class PresenceDiff:
+    """Users who came online / went offline in a room, plus the new online count."""
+
+    def __init__(self, joined=(), left=(), online_count=0):
+        self.joined = list(joined)
+        self.left = list(left)
+        self.online_count = online_count
+
+    def __bool__(self):
+        return bool(self.joined or self.left)
+
+
+#-----------------LOCAL (SINGLE PROCESS) BACKEND--------------------------------
+
+class LocalPresence:
+    """
+    In-process stand-in with the same semantics as RedisPresence.
+
+    Only correct when every socket lives in one process (dev, tests, the
+    in-memory channel layer).
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.connections = {}  # room -> {(username, channel_name): expires_at}
+        self.refcounts = {}    # room -> {username: open connections}
+
+    def _sweep(self, room, now):
+        conns = self.connections.get(room, {})
+        expired = [key for key, expires_at in conns.items() if expires_at <= now]
+        left = [user for user, channel in expired if self._drop(room, user, channel)]
+        return PresenceDiff(left=left)
+
+    def _drop(self, room, user, channel):
+        # True when this was the user's last connection in the room.
+        if self.connections.get(room, {}).pop((user, channel), None) is None:
+            return False
+        refs = self.refcounts[room]
+        refs[user] -= 1
+        if refs[user] > 0:
+            return False
+        del refs[user]
+        return True
+
+    async def join(self, room, user, channel):
+        now = time.time()
+        diff = self._sweep(room, now)
+        conns = self.connections.setdefault(room, {})
+        refs = self.refcounts.setdefault(room, {})
+        if (user, channel) not in conns:
+            refs[user] = refs.get(user, 0) + 1
+            if refs[user] == 1:
+                diff.joined.append(user)
+        conns[(user, channel)] = now + self.ttl
+        diff.online_count = len(refs)
+        return diff
+
+    async def leave(self, room, user, channel):
+        diff = self._sweep(room, time.time())
+        if self._drop(room, user, channel):
+            diff.left.append(user)
+        diff.online_count = await self.online_count(room)
+        return diff
+
+    async def heartbeat(self, room, user, channel):
+        now = time.time()
+        conns = self.connections.get(room, {})
+        if (user, channel) in conns:
+            conns[(user, channel)] = now + self.ttl
+            diff = self._sweep(room, now)
+            diff.online_count = await self.online_count(room)
+            return diff
+        # Expired while still connected (e.g. a stalled event loop): rejoin.
+        return await self.join(room, user, channel)
+
+    async def online_count(self, room):
+        return len(self.refcounts.get(room, {}))
+
+    async def online_users(self, room):
+        return sorted(self.refcounts.get(room, {}))
+
+
+#-----------------REDIS BACKEND--------------------------------
+
+# KEYS: conns zset, users hash. ARGV: username, member, expires_at
+_JOIN = """
+if redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2]) == 1 then
+    return redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+end
+return -1
+"""
+
+# Returns the user's remaining connection count, or -1 if the connection was already gone.
+_LEAVE = """
+if redis.call('ZREM', KEYS[1], ARGV[2]) == 0 then
+    return -1
+end
+local n = redis.call('HINCRBY', KEYS[2], ARGV[1], -1)
+if n <= 0 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+return n
+"""
+
+
+class RedisPresence:
+    """
+    Presence shared by every worker through the channel layer's Redis.
+
+    Per room: a sorted set of live connections scored by heartbeat expiry and a
+    hash of username -> open connection count. The online count is HLEN, O(1)
+    regardless of how many processes serve the room. Connections of a crashed
+    worker stop heartbeating and are swept once their score passes.
+    """
+    sweep_batch = 100
+
+    def __init__(self, url, ttl, prefix="presence"):
+        self.redis = aioredis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._join = self.redis.register_script(_JOIN)
+        self._leave = self.redis.register_script(_LEAVE)
+
+    def _keys(self, room):
+        return [f"{self.prefix}:{room}:conns", f"{self.prefix}:{room}:users"]
+
+    @staticmethod
+    def _member(user, channel):
+        return f"{user}|{channel}"
+
+    async def _sweep(self, room, now):
+        conns_key, _ = keys = self._keys(room)
+        expired = await self.redis.zrangebyscore(conns_key, "-inf", now, start=0, num=self.sweep_batch)
+        left = []
+        for member in expired:
+            member = member.decode()
+            user = member.split("|", 1)[0]
+            if await self._leave(keys=keys, args=[user, member]) == 0:
+                left.append(user)
+        return PresenceDiff(left=left)
+
+    async def join(self, room, user, channel):
+        now = time.time()
+        diff = await self._sweep(room, now)
+        refs = await self._join(keys=self._keys(room), args=[user, self._member(user, channel), now + self.ttl])
+        if refs == 1:
+            diff.joined.append(user)
+        diff.online_count = await self.online_count(room)
+        return diff
+
+    async def leave(self, room, user, channel):
+        diff = await self._sweep(room, time.time())
+        if await self._leave(keys=self._keys(room), args=[user, self._member(user, channel)]) == 0:
+            diff.left.append(user)
+        diff.online_count = await self.online_count(room)
+        return diff
+
+    async def heartbeat(self, room, user, channel):
+        now = time.time()
+        conns_key, _ = self._keys(room)
+        refreshed = await self.redis.zadd(conns_key, {self._member(user, channel): now + self.ttl}, xx=True, ch=True)
+        if not refreshed:
+            return await self.join(room, user, channel)
+        diff = await self._sweep(room, now)
+        diff.online_count = await self.online_count(room)
+        return diff
+
+    async def online_count(self, room):
+        return await self.redis.hlen(self._keys(room)[1])
+
+    async def online_users(self, room):
+        return sorted(user.decode() for user in await self.redis.hkeys(self._keys(room)[1]))
+
+
+#-----------------BACKEND SELECTION--------------------------------
+
+_presence = None
+
+
+def get_presence():
+    """
+    Process-wide presence backend.
+
+    Uses the channel layer's Redis when the channel layer is Redis-backed,
+    otherwise the local stand-in. CHAT_PRESENCE_BACKEND = "redis" / "local"
+    forces one or the other.
+    """
+    global _presence
+    if _presence is None:
+        ttl = getattr(settings, "CHAT_PRESENCE_TTL", 90)
+        layer = settings.CHANNEL_LAYERS.get("default", {})
+        backend = getattr(settings, "CHAT_PRESENCE_BACKEND", None)
+        if backend is None:
+            backend = "redis" if layer.get("BACKEND", "").endswith("RedisChannelLayer") else "local"
+
+        if backend == "redis":
+            host = layer.get("CONFIG", {}).get("hosts", ["redis://localhost:6379"])[0]
+            _presence = RedisPresence(host, ttl)
+        else:
+            _presence = LocalPresence(ttl)
+    return _presence
+
+
+@receiver(setting_changed)
+def _reset_presence(setting, **kwargs):
+    global _presence
+    if setting in ("CHANNEL_LAYERS", "CHAT_PRESENCE_BACKEND", "CHAT_PRESENCE_TTL"):
+        _presence = None
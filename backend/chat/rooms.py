@@ -0,0 +1,83 @@
+import re
+import time
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.text import slugify
+
+from stories.models import GenreChoices, Story
+from .models import ChatRoom
+
+
+#-----------------ROOM NAMES--------------------------------
+# global            -> everyone
+# story-<id>        -> readers of one story
+# genre-<slug>      -> one genre (slug of GenreChoices value)
+# dm-<id>-<id>      -> direct messages, user ids in ascending order
+
+ROOM_NAME_RE = re.compile(r"^(global|story-(?P<story>\d+)|genre-(?P<genre>[a-z0-9-]+)|dm-(?P<a>\d+)-(?P<b>\d+))$")
+
+
+def dm_room_name(user_id, other_id):
+    low, high = sorted((int(user_id), int(other_id)))
+    return f"dm-{low}-{high}"
+
+
+def room_group_name(room_name):
+    return f"chat_{room_name}"
+
+
+def can_join(user, room_name):
+    """Whether `user` may read/post in `room_name`. Runs at most one small query."""
+    match = ROOM_NAME_RE.match(room_name or "")
+    if not match or not user.is_authenticated:
+        return False
+
+    if match.group("story"):
+        return Story.objects.filter(pk=match.group("story")).exists()
+    if match.group("genre"):
+        return match.group("genre") in {slugify(value) for value in GenreChoices.values}
+    if match.group("a"):
+        a, b = int(match.group("a")), int(match.group("b"))
+        return a < b and user.id in (a, b)
+    return True
+
+
+#-----------------ROOM LOOKUP CACHE--------------------------------
+# name -> (id, expires_at) per process. A deleted room is dropped here at once
+# by post_delete; other workers notice within CHAT_ROOM_ID_TTL seconds, and
+# consumers re-check on every message so an open socket follows along.
+
+ROOM_ID_CACHE_SIZE = 4096
+
+_room_ids = {}
+
+
+def cached_room_id(room_name):
+    """Cached id for `room_name` if it hasn't expired, without touching the DB."""
+    entry = _room_ids.get(room_name)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    return None
+
+
+def get_room_id(room_name):
+    """ChatRoom id for `room_name`, created on first use and cached per process."""
+    room_id = cached_room_id(room_name)
+    if room_id is None:
+        room, _ = ChatRoom.objects.get_or_create(name=room_name)
+        room_id = room.id
+        if len(_room_ids) >= ROOM_ID_CACHE_SIZE:
+            _room_ids.clear()
+        _room_ids[room_name] = (room_id, time.monotonic() + getattr(settings, "CHAT_ROOM_ID_TTL", 300))
+    return room_id
+
+
+def forget_room_ids():
+    _room_ids.clear()
+
+
+@receiver(post_delete, sender=ChatRoom)
+def forget_deleted_room(sender, instance, **kwargs):
+    _room_ids.pop(instance.name, None)
@@ -0,0 +1,402 @@
+import asyncio
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from users.models import CustomUser
+from stories.models import Story
+from .models import ChatRoom, Message
+from unittest import mock
+from .buffer import MessageBuffer, MessageBufferFull, get_message_buffer
+from .presence import LocalPresence
+from .throttle import TokenBucket, stats
+from .typing import TypingCoalescer, get_typing_coalescer
+from .rooms import can_join, dm_room_name, forget_room_ids, get_room_id
+from .routing import websocket_urlpatterns
+from .middleware import TokenAuthMiddleware, get_user_from_token
+from django.core.cache import cache
+from stories.routing import websocket_urlpatterns as notification_urlpatterns
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def get_auth_headers(user):
+    refresh = RefreshToken.for_user(user)
+    return {"HTTP_AUTHORIZATION": f"Bearer {refresh.access_token}"}
+
+
+@override_settings(AUTH_STATELESS_JWT=True)
+class ChatHistoryTests(APITestCase):
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(username=f"user{i}", password="pass123")
+            for i in range(3)
+        ]
+        self.room = ChatRoom.objects.create(name="global")
+        self.messages = [
+            Message.objects.create(room=self.room, user=self.users[i % 3], content=f"msg {i}")
+            for i in range(7)
+        ]
+        self.client.credentials(**get_auth_headers(self.users[0]))
+
+    def test_latest_page_is_oldest_first(self):
+        res = self.client.get(reverse("chat-messages") + "?limit=3")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([m["content"] for m in res.data["results"]], ["msg 4", "msg 5", "msg 6"])
+        self.assertTrue(res.data["has_more"])
+        self.assertEqual(res.data["before"], self.messages[4].id)
+
+    def test_page_back_until_start(self):
+        seen = []
+        before = None
+        while True:
+            url = reverse("chat-messages") + "?limit=3" + (f"&before={before}" if before else "")
+            res = self.client.get(url)
+            seen = [m["content"] for m in res.data["results"]] + seen
+            if not res.data["has_more"]:
+                break
+            before = res.data["before"]
+        self.assertEqual(seen, [f"msg {i}" for i in range(7)])
+
+    def test_query_count_is_independent_of_page_size(self):
+        # room + one joined page query (the JWT user comes from the token)
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("chat-messages") + "?limit=7")
+        self.assertEqual(res.data["results"][0]["user"], "user0")
+
+    def test_invalid_before(self):
+        res = self.client.get(reverse("chat-messages") + "?before=abc")
+        self.assertEqual(res.status_code, 400)
+
+
+class ChatRoomRulesTests(APITestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(username="alice", password="pass123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pass123")
+        self.story = Story.objects.create(
+            title="Room Story", synopsis="s", genre="Fantasy", status="Ongoing", author=self.alice,
+        )
+
+    def test_room_access(self):
+        dm = dm_room_name(self.bob.id, self.alice.id)
+        self.assertTrue(can_join(self.alice, "global"))
+        self.assertTrue(can_join(self.alice, f"story-{self.story.id}"))
+        self.assertFalse(can_join(self.alice, f"story-{self.story.id + 99}"))
+        self.assertTrue(can_join(self.alice, "genre-scifi"))
+        self.assertFalse(can_join(self.alice, "genre-cooking"))
+        self.assertTrue(can_join(self.bob, dm))
+        self.assertFalse(can_join(self.bob, f"dm-{self.alice.id}-{self.bob.id + 50}"))
+        self.assertFalse(can_join(self.alice, "Not A Room"))
+
+    def test_room_ids_follow_deletes_and_expire(self):
+        forget_room_ids()
+        old_id = get_room_id("genre-fantasy")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_room_id("genre-fantasy"), old_id)
+
+        ChatRoom.objects.filter(pk=old_id).delete()
+        new_id = get_room_id("genre-fantasy")
+        self.assertNotEqual(new_id, old_id)
+
+        # A change made by another worker sends no signal here; the entry expires
+        with override_settings(CHAT_ROOM_ID_TTL=0):
+            forget_room_ids()
+            self.assertEqual(get_room_id("genre-fantasy"), new_id)
+            ChatRoom.objects.filter(pk=new_id).update(name="moved")
+            self.assertNotEqual(get_room_id("genre-fantasy"), new_id)
+
+    def test_dm_history_is_private(self):
+        carol = CustomUser.objects.create_user(username="carol", password="pass123")
+        dm = dm_room_name(self.alice.id, self.bob.id)
+        Message.objects.create(room_id=get_room_id(dm), user=self.alice, content="psst")
+
+        self.client.credentials(**get_auth_headers(self.bob))
+        res = self.client.get(reverse("chat-room-messages", args=[dm]))
+        self.assertEqual([m["content"] for m in res.data["results"]], ["psst"])
+
+        self.client.credentials(**get_auth_headers(carol))
+        res = self.client.get(reverse("chat-room-messages", args=[dm]))
+        self.assertEqual(res.status_code, 404)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ChatConsumerRoomTests(TransactionTestCase):
+    def setUp(self):
+        forget_room_ids()
+        self.alice = CustomUser.objects.create_user(username="alice", password="pass123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pass123")
+
+    async def connect(self, user, room):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f"/ws/chat/{room}/")
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_messages_stay_in_their_room(self):
+        alice, ok = await self.connect(self.alice, "genre-fantasy")
+        self.assertTrue(ok)
+        await alice.receive_json_from()  # presence snapshot
+        await alice.receive_json_from()  # own join diff
+
+        bob, ok = await self.connect(self.bob, "genre-horror")
+        self.assertTrue(ok)
+        await bob.receive_json_from()
+        await bob.receive_json_from()
+
+        await alice.send_json_to({"message": "hello fantasy"})
+        event = await alice.receive_json_from()
+        self.assertEqual(event["message"], "hello fantasy")
+        self.assertEqual(event["room"], "genre-fantasy")
+        self.assertTrue(await bob.receive_nothing())
+
+        await get_message_buffer().flush()
+        count = await database_sync_to_async(
+            Message.objects.filter(room__name="genre-fantasy").count
+        )()
+        self.assertEqual(count, 1)
+
+        await alice.disconnect()
+        await bob.disconnect()
+
+    async def test_dm_rejects_outsiders(self):
+        carol = await database_sync_to_async(CustomUser.objects.create_user)(username="carol", password="x")
+        room = dm_room_name(self.alice.id, self.bob.id)
+        communicator, ok = await self.connect(carol, room)
+        self.assertFalse(ok)
+
+    async def test_presence_diffs_and_refcounted_tabs(self):
+        alice1, _ = await self.connect(self.alice, "global")
+        snapshot = await alice1.receive_json_from()
+        self.assertEqual(snapshot["type"], "presence")
+        self.assertEqual(snapshot["online_users"], ["alice"])
+        self.assertEqual((await alice1.receive_json_from())["joined"], ["alice"])
+
+        # A second tab of the same user is not a new arrival.
+        alice2, _ = await self.connect(self.alice, "global")
+        self.assertEqual((await alice2.receive_json_from())["online_count"], 1)
+        self.assertTrue(await alice1.receive_nothing())
+
+        bob, _ = await self.connect(self.bob, "global")
+        await bob.receive_json_from()
+        diff = await alice1.receive_json_from()
+        self.assertEqual((diff["type"], diff["joined"], diff["online_count"]), ("presence_diff", ["bob"], 2))
+        await alice2.receive_json_from()
+        await bob.receive_json_from()
+
+        # Closing one of alice's tabs keeps her online.
+        await alice1.disconnect()
+        self.assertTrue(await bob.receive_nothing())
+
+        await alice2.disconnect()
+        diff = await bob.receive_json_from()
+        self.assertEqual((diff["left"], diff["online_count"]), (["alice"], 1))
+        await bob.disconnect()
+
+
+    @override_settings(CHAT_MESSAGE_RATE=0.0001, CHAT_MESSAGE_BURST=2)
+    async def test_message_flood_is_rate_limited(self):
+        alice, _ = await self.connect(self.alice, "global")
+        await alice.receive_json_from()
+        await alice.receive_json_from()
+
+        for i in range(3):
+            await alice.send_json_to({"message": f"spam {i}"})
+        frames = [await alice.receive_json_from() for _ in range(3)]
+        self.assertEqual([f.get("message") for f in frames[:2]], ["spam 0", "spam 1"])
+        self.assertEqual(frames[2]["type"], "error")
+        self.assertEqual(await get_message_buffer().flush(), 2)
+        await alice.disconnect()
+
+    async def test_full_buffer_rejects_the_message_and_ends_typing(self):
+        alice, _ = await self.connect(self.alice, "global")
+        await alice.receive_json_from()
+        await alice.receive_json_from()
+
+        await alice.send_json_to({"typing": True})
+        with mock.patch.object(get_message_buffer(), "add", side_effect=MessageBufferFull):
+            await alice.send_json_to({"message": "lost", "typing": True})
+            frame = await alice.receive_json_from()
+        self.assertEqual(frame["type"], "error")
+        self.assertNotIn("alice", get_typing_coalescer().typers.get("chat_global", {}))
+        await alice.disconnect()
+
+
+class LocalPresenceTests(TransactionTestCase):
+    async def test_expired_connections_are_swept(self):
+        presence = LocalPresence(ttl=0)
+        diff = await presence.join("global", "alice", "c1")
+        self.assertEqual(diff.joined, ["alice"])
+
+        diff = await presence.join("global", "bob", "c2")
+        self.assertEqual(diff.left, ["alice"])
+        self.assertEqual(diff.joined, ["bob"])
+        self.assertEqual(await presence.online_users("global"), ["bob"])
+
+
+class MessageBufferTests(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="alice", password="pass123")
+        self.room = ChatRoom.objects.create(name="global")
+
+    def count(self):
+        return database_sync_to_async(Message.objects.count)()
+
+    async def test_flushes_on_batch_size(self):
+        buffer = MessageBuffer(max_batch=3, flush_interval=60)
+        for i in range(2):
+            await buffer.add(self.room.id, self.user.id, f"m{i}")
+        self.assertEqual(await self.count(), 0)
+
+        await buffer.add(self.room.id, self.user.id, "m2")
+        await asyncio.gather(*buffer._tasks)
+        self.assertEqual(await self.count(), 3)
+
+    async def test_flushes_on_interval(self):
+        buffer = MessageBuffer(max_batch=100, flush_interval=0.05)
+        await buffer.add(self.room.id, self.user.id, "hello")
+        await asyncio.sleep(0.3)
+        self.assertEqual(await self.count(), 1)
+
+    async def test_backpressure_when_database_is_down(self):
+        buffer = MessageBuffer(max_batch=100, flush_interval=60, max_pending=2)
+        await buffer.add(self.room.id, self.user.id, "a")
+        await buffer.add(self.room.id, self.user.id, "b")
+
+        with mock.patch("chat.buffer._bulk_insert", side_effect=RuntimeError("db down")), \
+                self.assertLogs("chat.buffer", level="ERROR"):
+            with self.assertRaises(MessageBufferFull):
+                await buffer.add(self.room.id, self.user.id, "c")
+        self.assertEqual(len(buffer.pending), 2)
+
+        # Once the DB recovers the backlog drains and the sender gets through.
+        await buffer.add(self.room.id, self.user.id, "c")
+        await buffer.flush()
+        contents = await database_sync_to_async(
+            lambda: list(Message.objects.order_by("timestamp").values_list("content", flat=True))
+        )()
+        self.assertEqual(contents, ["a", "b", "c"])
+
+    async def test_unstorable_message_does_not_block_the_batch(self):
+        buffer = MessageBuffer(max_batch=100, flush_interval=60)
+        await buffer.add(self.room.id, self.user.id, "kept")
+        await buffer.add(self.room.id, self.user.id + 999, "orphan")
+
+        with self.assertLogs("chat.buffer", level="WARNING"):
+            self.assertEqual(await buffer.flush(), 1)
+        self.assertEqual(buffer.pending, [])
+        contents = await database_sync_to_async(lambda: list(Message.objects.values_list("content", flat=True)))()
+        self.assertEqual(contents, ["kept"])
+
+    def test_flush_sync_for_shutdown(self):
+        buffer = MessageBuffer()
+        buffer.pending.append(Message(room=self.room, user=self.user, content="bye"))
+        self.assertEqual(buffer.flush_sync(), 1)
+        self.assertEqual(Message.objects.count(), 1)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class TypingCoalescingTests(TransactionTestCase):
+    async def test_only_transitions_are_batched_per_room(self):
+        from channels.layers import get_channel_layer
+
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add("chat_global", channel)
+
+        coalescer = TypingCoalescer(interval=60, timeout=60)
+        stats.clear()
+        self.assertTrue(coalescer.update("chat_global", "alice", True))
+        self.assertFalse(coalescer.update("chat_global", "alice", True))
+        self.assertTrue(coalescer.update("chat_global", "bob", True))
+        # carol starts and stops within one tick: nothing to report
+        coalescer.update("chat_global", "carol", True)
+        coalescer.update("chat_global", "carol", False)
+        await coalescer.flush()
+
+        event = await layer.receive(channel)
+        self.assertEqual(event["started"], ["alice", "bob"])
+        self.assertEqual(event["stopped"], [])
+        self.assertEqual(stats["typing_coalesced"], 1)
+        self.assertEqual(stats["typing_events"], 1)
+
+        # Nothing changed since: no event at all.
+        await coalescer.flush()
+        self.assertEqual(stats["typing_events"], 1)
+        coalescer._task.cancel()
+
+    async def test_silent_typers_expire(self):
+        from channels.layers import get_channel_layer
+
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add("chat_global", channel)
+
+        coalescer = TypingCoalescer(interval=60, timeout=0.05)
+        coalescer.update("chat_global", "alice", True)
+        await coalescer.flush()
+        await layer.receive(channel)  # alice started
+        await asyncio.sleep(0.1)
+        await coalescer.flush()
+        event = await layer.receive(channel)
+        self.assertEqual(event["stopped"], ["alice"])
+        coalescer._task.cancel()
+
+
+class TokenBucketTests(APITestCase):
+    def test_burst_then_limit(self):
+        bucket = TokenBucket(rate=0.0001, burst=3)
+        self.assertEqual([bucket.allow() for _ in range(5)], [True, True, True, False, False])
+
+
+class WebSocketAuthCacheTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="pass123")
+        self.token = str(RefreshToken.for_user(self.alice).access_token)
+
+    def test_user_is_cached_per_token(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_from_token(self.token), self.alice)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_from_token(self.token), self.alice)
+
+    def test_renamed_user_is_reloaded(self):
+        get_user_from_token(self.token)
+        self.alice.username = "alicia"
+        self.alice.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_from_token(self.token).username, "alicia")
+
+    def test_saving_user_invalidates_cache(self):
+        get_user_from_token(self.token)
+        self.alice.is_active = False
+        self.alice.save()
+        # Deactivation is known from the cache alone.
+        with self.assertNumQueries(0):
+            self.assertFalse(get_user_from_token(self.token).is_authenticated)
+
+    def test_invalid_token_is_anonymous(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(get_user_from_token("not-a-token").is_authenticated)
+
+    @override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+    async def test_notification_socket_uses_middleware_user(self):
+        app = TokenAuthMiddleware(URLRouter(notification_urlpatterns))
+
+        communicator = WebsocketCommunicator(app, f"/ws/notifications/?token={self.token}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+        # Reconnecting with the same token is served from the cache.
+        communicator = WebsocketCommunicator(app, f"/ws/notifications/?token={self.token}")
+        with mock.patch("users.authentication.User.objects.get") as lookup:
+            connected, _ = await communicator.connect()
+        lookup.assert_not_called()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+        communicator = WebsocketCommunicator(app, "/ws/notifications/")
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
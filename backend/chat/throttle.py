@@ -0,0 +1,34 @@
+import time
+from collections import Counter
+
+
+#-----------------COUNTERS--------------------------------
+# Process-wide tallies of what the chat consumers dropped or merged, e.g.
+# stats["typing_coalesced"]. Read with get_stats().
+
+stats = Counter()
+
+
+def get_stats():
+    return dict(stats)
+
+
+#-----------------TOKEN BUCKET--------------------------------
+
+class TokenBucket:
+    """Per-connection inbound rate limit: `rate` frames/second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
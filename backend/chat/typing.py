@@ -0,0 +1,112 @@
+import asyncio
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .throttle import stats
+
+
+#-----------------TYPING COALESCER--------------------------------
+
+class TypingCoalescer:
+    """
+    Per-process typing state for every room this worker serves.
+
+    Repeated `typing: true` frames only push the user's expiry forward; the room
+    hears about a user when they start and when they stop (explicitly or after
+    `timeout` seconds of silence). Transitions are collected and sent as one
+    `typing_update` event per room every `interval` seconds, so a room full of
+    typists costs one channel-layer message per tick instead of one per keystroke.
+    """
+
+    def __init__(self, interval=1.0, timeout=4.0):
+        self.interval = interval
+        self.timeout = timeout
+        self.typers = {}   # group -> {username: expires_at}
+        self.changes = {}  # group -> {"started": set(), "stopped": set()}
+        self._task = None
+
+    def update(self, group, user, typing):
+        """Record a typing frame; returns True if it changed the user's state."""
+        stats["typing_received"] += 1
+        now = asyncio.get_running_loop().time()
+        typers = self.typers.setdefault(group, {})
+
+        if typing:
+            already = user in typers
+            typers[user] = now + self.timeout
+            if already:
+                stats["typing_coalesced"] += 1
+                return False
+            self._mark(group, user, started=True)
+        else:
+            if typers.pop(user, None) is None:
+                stats["typing_coalesced"] += 1
+                return False
+            self._mark(group, user, started=False)
+
+        self._ensure_running()
+        return True
+
+    def _mark(self, group, user, started):
+        change = self.changes.setdefault(group, {"started": set(), "stopped": set()})
+        if started:
+            if user in change["stopped"]:
+                change["stopped"].discard(user)  # stopped and restarted within one tick
+            else:
+                change["started"].add(user)
+        else:
+            if user in change["started"]:
+                change["started"].discard(user)  # started and stopped within one tick
+            else:
+                change["stopped"].add(user)
+
+    def _expire(self, now):
+        for group, typers in self.typers.items():
+            for user in [u for u, expires_at in typers.items() if expires_at <= now]:
+                del typers[user]
+                self._mark(group, user, started=False)
+        self.typers = {group: typers for group, typers in self.typers.items() if typers}
+
+    async def flush(self):
+        """Send one batched event per room with pending transitions."""
+        self._expire(asyncio.get_running_loop().time())
+        changes, self.changes = self.changes, {}
+        channel_layer = get_channel_layer()
+        for group, change in changes.items():
+            if not (change["started"] or change["stopped"]):
+                continue
+            stats["typing_events"] += 1
+            await channel_layer.group_send(group, {
+                "type": "typing_update",
+                "started": sorted(change["started"]),
+                "stopped": sorted(change["stopped"]),
+            })
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        # Runs only while someone is typing somewhere on this worker.
+        while self.typers or self.changes:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+#-----------------PROCESS-WIDE INSTANCE--------------------------------
+
+_coalescer = None
+_coalescer_loop = None
+
+
+def get_typing_coalescer():
+    global _coalescer, _coalescer_loop
+    loop = asyncio.get_running_loop()
+    if _coalescer is None or _coalescer_loop is not loop:
+        _coalescer = TypingCoalescer(
+            interval=getattr(settings, "CHAT_TYPING_INTERVAL", 1.0),
+            timeout=getattr(settings, "CHAT_TYPING_TIMEOUT", 4.0),
+        )
+        _coalescer_loop = loop
+    return _coalescer
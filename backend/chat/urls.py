@@ -2,5 +2,6 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path("messages/", views.chat_messages),
+    path("messages/", views.chat_messages, name="chat-messages"),
+    path("messages/<str:room_name>/", views.chat_messages, name="chat-room-messages"),
 ]
@@ -1,18 +1,58 @@
+from django.conf import settings
+from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from .models import ChatRoom, Message
 from .serializers import MessageSerializer  
+from .rooms import can_join
 
 
+def _history_limit(request):
+    default = getattr(settings, "CHAT_HISTORY_PAGE_SIZE", 50)
+    maximum = getattr(settings, "CHAT_HISTORY_MAX_PAGE_SIZE", 200)
+    try:
+        limit = int(request.query_params.get("limit", default))
+    except ValueError:
+        return default
+    return max(1, min(limit, maximum))
+
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def chat_messages(request, room_name="global"):
+    """
+    Last `limit` messages of the room, oldest first.
+
+    Pass `?before=<message id>` to page further back; each page is one range
+    scan on the (room, timestamp) index, however long the history is.
+    """
+    if not can_join(request.user, room_name):
+        return Response({"error": "Room not found"}, status=404)
+
     try:
         room = ChatRoom.objects.get(name=room_name)
-        messages = Message.objects.filter(room=room).order_by("timestamp")
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
     except ChatRoom.DoesNotExist:
         return Response({"error": "Room not found"}, status=404)
+
+    limit = _history_limit(request)
+    messages = Message.objects.filter(room=room).select_related("user")
+
+    before = request.query_params.get("before")
+    if before:
+        try:
+            anchor = Message.objects.filter(room=room, pk=int(before)).values_list("timestamp", flat=True).get()
+        except (ValueError, Message.DoesNotExist):
+            return Response({"error": "Invalid 'before' message id"}, status=400)
+        messages = messages.filter(Q(timestamp__lt=anchor) | Q(timestamp=anchor, id__lt=int(before)))
+
+    page = list(messages.order_by("-timestamp", "-id")[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit][::-1]
+
+    serializer = MessageSerializer(page, many=True)
+    return Response({
+        "results": serializer.data,
+        "has_more": has_more,
+        "before": page[0].id if page and has_more else None,
+    })
@@ -0,0 +1,93 @@
+import hashlib
+
+from django.db.models import Exists, Max, OuterRef, Subquery, Value
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .models import Chapter, Story, _m2m_count_subquery
+
+
+#-----------------CONDITIONAL GET--------------------------------
+# Detail views compute a validator from one small query before loading or
+# serializing anything. A matching If-None-Match (or If-Modified-Since, where a
+# Last-Modified is sent) short-circuits to 304; otherwise the same validators
+# are stamped on the full response.
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def not_modified(request, etag, last_modified=None):
+    """A 304 response if the client's copy is current, else None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    res = get_conditional_response(request, etag=quote_etag(etag), last_modified=timestamp)
+    if res is not None:
+        set_validators(res, etag, last_modified)
+    return res
+
+
+def set_validators(res, etag, last_modified=None):
+    res.headers['ETag'] = quote_etag(etag)
+    if last_modified:
+        res.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    # Some payloads differ per viewer (drafts, is_following)
+    patch_vary_headers(res, ['Authorization'])
+    return res
+
+
+#-----------------VALIDATORS--------------------------------
+# Story: the row's updated_at covers edits and tag changes (stories.signals
+# touches it when a story's tags or a tag's name change); engagement moves via
+# UPDATEs that don't touch it, so the counters and the chapter versions are
+# folded in, plus the author's updated_at for the username. The viewer's own
+# bookmark flag is part of the payload, so it is part of the validator too.
+# No Last-Modified is sent for stories since no single timestamp covers those.
+
+def viewer_bookmarked(user):
+    """Exists() annotation: has `user` bookmarked the outer story?"""
+    return Exists(Story.bookmarks.through.objects.filter(story_id=OuterRef('pk'), customuser_id=user.pk))
+
+
+def story_etag(pk, user):
+    latest_chapter = (
+        Chapter.objects.filter(story_id=OuterRef('pk'))
+        .order_by()
+        .values('story_id')
+        .annotate(latest=Max('updated_at'))
+        .values('latest')
+    )
+    row = (
+        Story.objects.filter(pk=pk)
+        .annotate(
+            chapters_updated=Subquery(latest_chapter),
+            chapter_count=_m2m_count_subquery(Chapter),
+            is_bookmarked=viewer_bookmarked(user) if user.is_authenticated else Value(False),
+        )
+        .values_list(
+            'updated_at', 'likes_count', 'bookmarks_count', 'comments_count', 'author_id',
+            'chapters_updated', 'chapter_count', 'author__updated_at', 'is_bookmarked',
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    *state, author_id = row[:5]
+    # Authors also see their drafts in the table of contents
+    return make_etag(*state, *row[5:], user.pk == author_id)
+
+
+def chapter_validators(story_id, chapter_no, user):
+    """(etag, last_modified) for a chapter the user may read, else None."""
+    row = (
+        Chapter.objects.filter(story_id=story_id, chapter_no=chapter_no)
+        .values_list('id', 'updated_at', 'is_published', 'story__author_id')
+        .first()
+    )
+    if row is None:
+        return None
+    pk, updated_at, is_published, author_id = row
+    if not is_published and user.pk != author_id:
+        return None
+    return make_etag(pk, updated_at), updated_at
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import QuerySet
+
+from .models import Notification
+from .notifications import invalidate_unread_counts
+
+
+logger = logging.getLogger(__name__)
+
+
+#-----------------SETTINGS--------------------------------
+
+def _setting(name, default):
+    return getattr(settings, f'NOTIFICATION_FANOUT_{name}', default)
+
+
+# Small fixed pool: fan-out is I/O bound and we don't want it competing with
+# request threads for DB connections.
+_executor = ThreadPoolExecutor(
+    max_workers=_setting('WORKERS', 2),
+    thread_name_prefix='notify-fanout',
+)
+
+
+#-----------------STATS--------------------------------
+
+class FanoutStats:
+    """Items processed and wall time per pipeline stage for one fan-out run."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def record(self, stage, items, seconds):
+        done, elapsed = self.stages.get(stage, (0, 0.0))
+        self.stages[stage] = (done + items, elapsed + seconds)
+
+    def throughput(self, stage):
+        items, seconds = self.stages.get(stage, (0, 0.0))
+        return items / seconds if seconds else float(items)
+
+    def as_dict(self):
+        return {
+            stage: {'items': items, 'seconds': round(seconds, 4), 'per_second': round(self.throughput(stage), 1)}
+            for stage, (items, seconds) in self.stages.items()
+        }
+
+
+#-----------------PIPELINE STAGES--------------------------------
+
+def _iter_recipient_chunks(recipients, chunk_size):
+    if not isinstance(recipients, QuerySet):
+        # Ids already known (e.g. from the follow graph cache): no SELECT at all.
+        ids = sorted(recipients)
+        for start in range(0, len(ids), chunk_size):
+            yield ids[start:start + chunk_size]
+        return
+
+    # Keyset over the user id instead of OFFSET or one huge IN list, so each
+    # chunk is a bounded index range scan no matter how many followers exist.
+    last_id = 0
+    while True:
+        ids = list(
+            recipients.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def _insert_notifications(user_ids, message, url):
+    Notification.objects.bulk_create(
+        [Notification(user_id=user_id, message=message, url=url) for user_id in user_ids],
+        batch_size=_setting('INSERT_BATCH_SIZE', 500),
+    )
+    # bulk_create skips post_save, so drop the cached badges for this chunk here.
+    invalidate_unread_counts(user_ids)
+
+
+async def _push_batch(channel_layer, user_ids, event):
+    # Issue the whole batch concurrently on one event loop instead of one
+    # blocking round trip per follower.
+    results = await asyncio.gather(
+        *(channel_layer.group_send(f"user_{user_id}", event) for user_id in user_ids),
+        return_exceptions=True,
+    )
+    return sum(1 for result in results if isinstance(result, Exception))
+
+
+def run_fanout(recipients, message, url=None):
+    """
+    Write one Notification per recipient and push the matching realtime event.
+
+    `recipients` is a CustomUser queryset or a collection of user ids; it is
+    consumed in chunks of NOTIFICATION_FANOUT_CHUNK_SIZE. Returns a FanoutStats
+    for the run.
+    """
+    stats = FanoutStats()
+    chunk_size = _setting('CHUNK_SIZE', 500)
+    channel_layer = get_channel_layer()
+    event = {"type": "send_notification", "message": message, "url": url or ""}
+    failed_pushes = 0
+
+    chunks = _iter_recipient_chunks(recipients, chunk_size)
+    while True:
+        started = time.perf_counter()
+        user_ids = next(chunks, None)
+        if user_ids is None:
+            break
+        stats.record('select', len(user_ids), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        _insert_notifications(user_ids, message, url)
+        stats.record('insert', len(user_ids), time.perf_counter() - started)
+
+        if channel_layer is not None:
+            started = time.perf_counter()
+            failed_pushes += async_to_sync(_push_batch)(channel_layer, user_ids, event)
+            stats.record('push', len(user_ids), time.perf_counter() - started)
+
+    if failed_pushes:
+        logger.warning("Notification fan-out: %d realtime pushes failed", failed_pushes)
+    logger.info("Notification fan-out finished: %s", stats.as_dict())
+    return stats
+
+
+def _run_in_worker(recipients, message, url):
+    try:
+        run_fanout(recipients, message, url)
+    except Exception:
+        logger.exception("Notification fan-out failed for %r", message)
+    finally:
+        close_old_connections()
+
+
+def schedule_fanout(recipients, message, url=None):
+    """
+    Run `run_fanout` once the surrounding transaction commits.
+
+    By default the work goes to a background thread so the request that saved
+    the Story/Chapter returns immediately. Set NOTIFICATION_FANOUT_ASYNC = False
+    to run it inline (tests, management commands).
+    """
+    def start():
+        if _setting('ASYNC', True):
+            _executor.submit(_run_in_worker, recipients, message, url)
+        else:
+            run_fanout(recipients, message, url)
+
+    transaction.on_commit(start)
@@ -0,0 +1,132 @@
+import datetime
+
+from django.db.models import Count, Subquery
+from rest_framework.exceptions import ValidationError
+
+from .models import GenreChoices, StatusChoices, Story
+from .tags import clean_tag_names
+
+
+#-----------------CATALOG FILTERS--------------------------------
+# Query params understood by the story catalog (GET /api/core/stories/):
+#
+#   genre=Fantasy&genre=Horror    any of the listed genres
+#   status=Ongoing                any of the listed statuses
+#   tag=magic&tag=dragons         stories with any listed tag (tag_mode=any,
+#                                 the default) or with all of them (tag_mode=all)
+#   author=<username>
+#   is_serialized=true|false
+#   created_after / created_before=YYYY-MM-DD (inclusive)
+#
+# Each filter is applied in the database; tag filters go through the tags join
+# table as a subquery so the outer query never needs DISTINCT.
+
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+MAX_TAG_FACETS = 20
+
+StoryTag = Story.tags.through
+
+
+def _choices(params, name, choices):
+    values = [value for value in params.getlist(name) if value]
+    unknown = sorted(set(values) - set(choices.values))
+    if unknown:
+        raise ValidationError({name: f"Unknown value(s): {', '.join(unknown)}"})
+    return values
+
+
+def _date(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Expected a date as YYYY-MM-DD'})
+
+
+def parse_story_filters(params):
+    """Validated filter values from request.query_params (empty ones dropped)."""
+    filters = {
+        'genre': _choices(params, 'genre', GenreChoices),
+        'status': _choices(params, 'status', StatusChoices),
+        'tag': clean_tag_names(params.getlist('tag')),
+        'tag_mode': params.get('tag_mode', 'any'),
+        'author': params.get('author', '').strip(),
+        'is_serialized': None,
+        'created_after': _date(params, 'created_after'),
+        'created_before': _date(params, 'created_before'),
+    }
+    if filters['tag_mode'] not in ('any', 'all'):
+        raise ValidationError({'tag_mode': "Expected 'any' or 'all'"})
+
+    is_serialized = params.get('is_serialized', '').lower()
+    if is_serialized in TRUE_VALUES:
+        filters['is_serialized'] = True
+    elif is_serialized in FALSE_VALUES:
+        filters['is_serialized'] = False
+    elif is_serialized:
+        raise ValidationError({'is_serialized': "Expected 'true' or 'false'"})
+    return filters
+
+
+def _tagged_story_ids(names, mode):
+    rows = StoryTag.objects.filter(tag__name__in=names)
+    if mode == 'all' and len(set(names)) > 1:
+        rows = (
+            rows.order_by()
+            .values('story_id')
+            .annotate(matched=Count('tag_id', distinct=True))
+            .filter(matched=len(set(names)))
+        )
+    return rows.values('story_id')
+
+
+def filter_stories(queryset, filters, exclude=None):
+    """Apply `filters` to a Story queryset, skipping the `exclude` dimension."""
+    if filters['genre'] and exclude != 'genre':
+        queryset = queryset.filter(genre__in=filters['genre'])
+    if filters['status'] and exclude != 'status':
+        queryset = queryset.filter(status__in=filters['status'])
+    if filters['tag'] and exclude != 'tag':
+        queryset = queryset.filter(id__in=Subquery(_tagged_story_ids(filters['tag'], filters['tag_mode'])))
+    if filters['author']:
+        queryset = queryset.filter(author__username=filters['author'])
+    if filters['is_serialized'] is not None:
+        queryset = queryset.filter(is_serialized=filters['is_serialized'])
+    if filters['created_after']:
+        queryset = queryset.filter(created_at__gte=filters['created_after'])
+    if filters['created_before']:
+        queryset = queryset.filter(created_at__lte=filters['created_before'])
+    return queryset
+
+
+#-----------------FACET COUNTS--------------------------------
+# One GROUP BY query per dimension. Each facet ignores its own filter so the
+# client can show how many stories every other genre/status/tag would give
+# (selecting "Fantasy" doesn't collapse the genre list to just "Fantasy").
+
+def story_facets(filters):
+    def grouped(field, exclude):
+        rows = (
+            filter_stories(Story.objects.all(), filters, exclude=exclude)
+            .order_by()
+            .values(field)
+            .annotate(count=Count('id'))
+        )
+        return {row[field]: row['count'] for row in rows}
+
+    tag_rows = (
+        StoryTag.objects.filter(story_id__in=filter_stories(Story.objects.all(), filters, exclude='tag').values('id'))
+        .order_by()
+        .values('tag__name')
+        .annotate(count=Count('story_id'))
+        .order_by('-count', 'tag__name')[:MAX_TAG_FACETS]
+    )
+    return {
+        'genre': grouped('genre', 'genre'),
+        'status': grouped('status', 'status'),
+        'tags': [{'name': row['tag__name'], 'count': row['count']} for row in tag_rows],
+    }
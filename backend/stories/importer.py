@@ -0,0 +1,87 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Story
+from .response_cache import LISTS, invalidate_responses
+from .search import get_search_backend
+from .tags import clean_tag_names, resolve_tag_ids, tag_names_error
+
+
+#-----------------BULK IMPORT--------------------------------
+# Loads many stories for one author without the per-story cost of the API:
+# one query to find titles already taken, one INSERT per batch of stories, tag
+# ids through the shared name -> id cache (stories/tags.py) and one INSERT per
+# batch of story-tag rows. bulk_create sends no post_save, so the work those
+# signals would do is done here once per batch: the search index and cached
+# story lists are refreshed after commit. Followers are deliberately not
+# notified and no timeline entries are written for imported back-catalogue.
+
+STORY_FIELDS = ('title', 'genre', 'synopsis', 'status', 'is_serialized')
+
+StoryTag = Story.tags.through
+
+
+def _build_story(author, row):
+    story = Story(author=author, **{field: row[field] for field in STORY_FIELDS if field in row})
+    # author is a known-good instance; skipping it avoids a lookup per row
+    story.full_clean(exclude=['author', 'cover_image'], validate_unique=False)
+    tags = clean_tag_names(row.get('tags') or [])
+    # Same rules as StorySerializer: an over-long name would fail the tag
+    # INSERT and abort the import halfway, after earlier batches committed
+    error = tag_names_error(tags)
+    if error:
+        raise ValidationError({'tags': error})
+    return story, tags
+
+
+def _import_batch(built):
+    stories = Story.objects.bulk_create([story for story, _ in built])
+
+    tag_ids = resolve_tag_ids({name for _, tags in built for name in tags})
+    StoryTag.objects.bulk_create(
+        [
+            StoryTag(story_id=story.pk, tag_id=tag_ids[name])
+            for story, (_, tags) in zip(stories, built)
+            for name in tags
+        ],
+        ignore_conflicts=True,
+    )
+    return [story.pk for story in stories]
+
+
+def import_stories(author, rows, batch_size=500):
+    """
+    Create a story per row (dicts of Story fields plus an optional `tags` list).
+
+    Rows whose title is already taken, or repeats an earlier row, are skipped;
+    invalid rows are reported instead of created. Returns
+    {'created': [ids], 'skipped': [titles], 'errors': {row index: messages}}.
+    """
+    rows = list(rows)
+    taken = set(
+        Story.objects.filter(title__in=[row.get('title') for row in rows]).values_list('title', flat=True)
+    )
+    result = {'created': [], 'skipped': [], 'errors': {}}
+
+    pending = []
+    for index, row in enumerate(rows):
+        title = row.get('title')
+        if title in taken:
+            result['skipped'].append(title)
+            continue
+        try:
+            pending.append(_build_story(author, row))
+        except ValidationError as exc:
+            result['errors'][index] = exc.message_dict
+            continue
+        taken.add(title)
+
+    for start in range(0, len(pending), batch_size):
+        with transaction.atomic():
+            created = _import_batch(pending[start:start + batch_size])
+            transaction.on_commit(lambda ids=created: get_search_backend().index(ids))
+        result['created'].extend(created)
+
+    if result['created']:
+        invalidate_responses(LISTS)
+    return result
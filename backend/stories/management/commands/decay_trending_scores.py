@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stories.ranking import decay_trending_scores, recompute_trending_scores
+
+
+class Command(BaseCommand):
+    help = "Age every story's trending score to now (run it on a schedule, e.g. hourly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recompute', action='store_true',
+            help="Rebuild every score from likes, bookmarks, comments and chapters instead (e.g. daily, to repair drift).",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['recompute']:
+            touched = recompute_trending_scores(batch_size=options['batch_size'])
+            verb = "Recomputed"
+        else:
+            touched = decay_trending_scores()
+            verb = "Decayed"
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"{verb} trending scores of {touched} stories in {elapsed:.2f}s."))
@@ -0,0 +1,38 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from stories.importer import import_stories
+
+
+class Command(BaseCommand):
+    help = "Bulk-create stories for one author from a JSON file holding a list of story objects."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON list of {title, genre, synopsis, status, is_serialized, tags}.")
+        parser.add_argument('--author', required=True, help="Username the stories are created for.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            author = get_user_model().objects.get(username=options['author'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['author']!r}.")
+        try:
+            with open(options['path'], encoding='utf-8') as fh:
+                rows = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {options['path']}: {exc}")
+        if not isinstance(rows, list):
+            raise CommandError("Expected a JSON list of stories.")
+
+        started = time.perf_counter()
+        result = import_stories(author, rows, batch_size=options['batch_size'])
+        for index, errors in result['errors'].items():
+            self.stderr.write(f"  row {index}: {errors}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(result['created'])} stories ({len(result['skipped'])} skipped, "
+            f"{len(result['errors'])} invalid) in {time.perf_counter() - started:.1f}s."
+        ))
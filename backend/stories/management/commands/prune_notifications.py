@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stories.notifications import compact_unread_notifications, prune_read_notifications
+
+
+class Command(BaseCommand):
+    help = "Delete old read notifications in batches and collapse repeated unread ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90),
+            help="Delete read notifications older than this many days.",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between delete batches.")
+        parser.add_argument('--skip-compact', action='store_true', help="Only prune, don't collapse duplicates.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        pruned = prune_read_notifications(options['days'], options['batch_size'], options['pause'])
+
+        compacted = 0
+        if not options['skip_compact']:
+            compacted = compact_unread_notifications(options['batch_size'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {pruned} read notifications older than {options['days']} days, "
+            f"collapsed {compacted} duplicates in {elapsed:.2f}s."
+        ))
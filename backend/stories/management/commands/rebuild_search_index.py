@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from stories.models import Story
+from stories.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the story full-text search index from scratch, in primary-key batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--keep', action='store_true', help="Upsert over the existing index instead of clearing it first.")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if not options['keep']:
+            backend.clear()
+
+        indexed = 0
+        last_id = 0
+        while True:
+            ids = list(
+                Story.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            backend.index(ids)
+            last_id = ids[-1]
+            indexed += len(ids)
+            self.stdout.write(f"  indexed {indexed} stories...")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} stories with {type(backend).__name__} in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from stories.models import Story
+
+
+class Command(BaseCommand):
+    help = "Repair drift between Story.likes_count/bookmarks_count/comments_count and the rows they count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Report drifted stories without fixing them.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        checked = repaired = 0
+        last_id = 0
+
+        # Walk the table in primary-key batches so no single statement holds
+        # locks on the whole catalog.
+        while True:
+            ids = list(
+                Story.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            drifted = list(
+                Story.objects.filter(pk__in=ids)
+                .with_actual_engagement_counts()
+                .filter(
+                    ~Q(likes_count=F('actual_likes_count'))
+                    | ~Q(bookmarks_count=F('actual_bookmarks_count'))
+                    | ~Q(comments_count=F('actual_comments_count'))
+                )
+                .values_list('pk', flat=True)
+            )
+            if drifted and not dry_run:
+                Story.objects.filter(pk__in=drifted).refresh_engagement_counts()
+            repaired += len(drifted)
+
+        verb = "Found" if dry_run else "Repaired"
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} stories. {verb} {repaired} with drifted counters."
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:18
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_engagement_counters(apps, schema_editor):
+    Story = apps.get_model("stories", "Story")
+
+    def count_of(through):
+        counts = (
+            through.objects.filter(story_id=OuterRef("pk"))
+            .order_by()
+            .values("story_id")
+            .annotate(c=Count("*"))
+            .values("c")
+        )
+        return Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+
+    Story.objects.update(
+        likes_count=count_of(Story.likes.through),
+        bookmarks_count=count_of(Story.bookmarks.through),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0002_story_feed_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="story",
+            name="bookmarks_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="story",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_engagement_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:05
+
+import datetime
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_feed_items(apps, schema_editor):
+    # Stories only carry a creation date, so they land at midnight of that day;
+    # published chapters use their creation time (no publish time was recorded).
+    Story = apps.get_model("stories", "Story")
+    Chapter = apps.get_model("stories", "Chapter")
+    FeedItem = apps.get_model("stories", "FeedItem")
+
+    tz = django.utils.timezone.get_current_timezone()
+    items = [
+        FeedItem(
+            author_id=story.author_id,
+            story_id=story.id,
+            kind="story",
+            created_at=datetime.datetime.combine(story.created_at, datetime.time.min, tzinfo=tz),
+        )
+        for story in Story.objects.only("id", "author_id", "created_at").iterator()
+    ]
+    items += [
+        FeedItem(
+            author_id=chapter.story.author_id,
+            story_id=chapter.story_id,
+            chapter_id=chapter.id,
+            kind="chapter",
+            created_at=chapter.created_at,
+        )
+        for chapter in Chapter.objects.filter(is_published=True).select_related("story").iterator()
+    ]
+    FeedItem.objects.bulk_create(items, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0004_notification_inbox_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("story", "Story"), ("chapter", "Chapter")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, editable=False
+                    ),
+                ),
+                (
+                    "author",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_items",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "chapter",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_item",
+                        to="stories.chapter",
+                    ),
+                ),
+                (
+                    "story",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="feed_items",
+                        to="stories.story",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["author", "-created_at", "-id"], name="feed_author_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_feed_items, migrations.RunPython.noop),
+    ]
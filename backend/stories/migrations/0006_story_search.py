@@ -0,0 +1,71 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:17
+
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+POSTGRES_DDL = [
+    """
+    CREATE TABLE stories_search (
+        story_id bigint PRIMARY KEY REFERENCES stories_story (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX stories_search_document_gin ON stories_search USING gin (document)",
+]
+
+SQLITE_DDL = [
+    # rowid is the story id; prefix='2 3' keeps short prefix queries on the index.
+    """
+    CREATE VIRTUAL TABLE stories_search USING fts5(
+        title, synopsis, tags, chapters,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+]
+
+
+def create_search_table(apps, schema_editor):
+    # Other backends get no index table; stories/search.py falls back to LIKE.
+    ddl = {"postgresql": POSTGRES_DDL, "sqlite": SQLITE_DDL}.get(schema_editor.connection.vendor, [])
+    for statement in ddl:
+        schema_editor.execute(statement)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ("postgresql", "sqlite"):
+        schema_editor.execute("DROP TABLE IF EXISTS stories_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0005_feed_item"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StorySearchDocument",
+            fields=[
+                (
+                    "story",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="stories.story",
+                    ),
+                ),
+                ("document", django.contrib.postgres.search.SearchVectorField()),
+            ],
+            options={
+                "db_table": "stories_search",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# The auto-created tags join table only has (story_id, tag_id) unique; tag
+# filters and tag facets start from the tag side, so give them (tag_id, story_id).
+STORY_TAGS_INDEX = models.Index(fields=["tag", "story"], name="story_tags_tag_story_idx")
+
+
+def add_story_tags_index(apps, schema_editor):
+    through = apps.get_model("stories", "Story").tags.through
+    schema_editor.add_index(through, STORY_TAGS_INDEX)
+
+
+def remove_story_tags_index(apps, schema_editor):
+    through = apps.get_model("stories", "Story").tags.through
+    schema_editor.remove_index(through, STORY_TAGS_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0006_story_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="story",
+            index=models.Index(
+                fields=["genre", "-created_at", "-id"], name="story_genre_feed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="story",
+            index=models.Index(
+                fields=["status", "-created_at", "-id"], name="story_status_feed_idx"
+            ),
+        ),
+        migrations.RunPython(add_story_tags_index, remove_story_tags_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+def backfill_word_counts(apps, schema_editor):
+    Chapter = apps.get_model("stories", "Chapter")
+    batch = []
+    for chapter in Chapter.objects.only("id", "content").iterator(chunk_size=500):
+        chapter.word_count = len(chapter.content.split())
+        batch.append(chapter)
+        if len(batch) >= 500:
+            Chapter.objects.bulk_update(batch, ["word_count"])
+            batch = []
+    Chapter.objects.bulk_update(batch, ["word_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0008_story_rankings"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chapter",
+            name="word_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_word_counts, migrations.RunPython.noop),
+    ]
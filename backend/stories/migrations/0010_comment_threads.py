@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comments_count(apps, schema_editor):
+    Story = apps.get_model("stories", "Story")
+    Comment = apps.get_model("stories", "Comment")
+    counts = (
+        Comment.objects.filter(story_id=OuterRef("pk"))
+        .order_by()
+        .values("story_id")
+        .annotate(c=Count("*"))
+        .values("c")
+    )
+    Story.objects.update(
+        comments_count=Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0009_chapter_word_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="story",
+            name="comments_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="comment",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["story", "-created_at", "-id"], name="comment_thread_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_comments_count, migrations.RunPython.noop),
+    ]
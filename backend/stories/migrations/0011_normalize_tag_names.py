@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 22:10
+
+from django.db import migrations
+
+
+def normalize(name):
+    return " ".join(name.split()).lower()
+
+
+def normalize_tag_names(apps, schema_editor):
+    Tag = apps.get_model("stories", "Tag")
+    StoryTag = apps.get_model("stories", "Story").tags.through
+
+    # Tags differing only by case/spacing collapse onto the lowest id
+    keepers = {}
+    duplicates = {}
+    renamed = []
+    for pk, name in Tag.objects.order_by("id").values_list("id", "name"):
+        key = normalize(name)
+        if key in keepers:
+            duplicates[pk] = keepers[key]
+        else:
+            keepers[key] = pk
+            if name != key:
+                renamed.append(Tag(id=pk, name=key))
+
+    if duplicates:
+        rows = StoryTag.objects.filter(tag_id__in=duplicates).values_list("story_id", "tag_id")
+        StoryTag.objects.bulk_create(
+            [StoryTag(story_id=story_id, tag_id=duplicates[tag_id]) for story_id, tag_id in rows],
+            ignore_conflicts=True,
+        )
+        Tag.objects.filter(id__in=duplicates).delete()
+
+    Tag.objects.bulk_update(renamed, ["name"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0010_comment_threads"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_tag_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0011_normalize_tag_names"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="group_size",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.3 on 2026-10-18 22:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+def backfill_trending_scores(apps, schema_editor):
+    # Same rebuild as stories.ranking.recompute_trending_scores, on the
+    # historical models: engagement points aged from each story's last activity
+    Story = apps.get_model("stories", "Story")
+    Comment = apps.get_model("stories", "Comment")
+    Chapter = apps.get_model("stories", "Chapter")
+    weights = getattr(settings, "RANKING_WEIGHTS", {"likes": 1.0, "bookmarks": 2.0, "comment": 3.0, "chapter": 5.0})
+    half_life = getattr(settings, "RANKING_HALF_LIFE_HOURS", 72) * 3600
+    min_score = getattr(settings, "RANKING_MIN_SCORE", 0.01)
+    now = timezone.now()
+
+    def latest(model, field, **filters):
+        rows = model.objects.filter(story_id=OuterRef("pk"), **filters).order_by().values("story_id")
+        return Subquery(rows.annotate(latest=Max(field)).values("latest"))
+
+    published = (
+        Chapter.objects.filter(story_id=OuterRef("pk"), is_published=True)
+        .order_by().values("story_id").annotate(c=Count("*")).values("c")
+    )
+    rows = Story.objects.annotate(
+        published_chapters=Coalesce(Subquery(published, output_field=models.IntegerField()), Value(0)),
+        last_active=Greatest(
+            "updated_at",
+            Coalesce(latest(Comment, "created_at"), "updated_at"),
+            Coalesce(latest(Chapter, "updated_at", is_published=True), "updated_at"),
+        ),
+    ).values_list("pk", "likes_count", "bookmarks_count", "comments_count", "published_chapters", "last_active")
+
+    scored = []
+    for pk, likes, bookmarks, comments, chapters, last_active in rows.iterator():
+        points = (
+            weights.get("likes", 0.0) * likes
+            + weights.get("bookmarks", 0.0) * bookmarks
+            + weights.get("comment", 0.0) * comments
+            + weights.get("chapter", 0.0) * chapters
+        )
+        score = points * 0.5 ** (max((now - last_active).total_seconds(), 0) / half_life)
+        if score >= min_score:
+            scored.append(Story(pk=pk, trending_score=score, trending_at=now))
+    Story.objects.bulk_update(scored, ["trending_score", "trending_at"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stories", "0013_notification_list_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_trending_scores, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+from django.contrib.postgres.search import SearchVectorField
 from cloudinary.models import CloudinaryField
 
 
@@ -23,14 +27,54 @@ class StatusChoices(models.TextChoices):
 #-----------------TAG MODEL--------------------------------
 
 class Tag(models.Model):
+    # Stored normalized (see normalize), so lookups by name are exact matches
     name = models.CharField(max_length=30, unique=True)
 
+    @staticmethod
+    def normalize(name):
+        return ' '.join(str(name).split()).lower()
+
+    def save(self, *args, **kwargs):
+        self.name = self.normalize(self.name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
 
 #-----------------STORY MODEL--------------------------------
 
+def _m2m_count_subquery(through, fk='story_id'):
+    # Correlated COUNT over the join table only; avoids multiplying rows the way
+    # two Count() joins on the same query would.
+    counts = (
+        through.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(c=Count('*'))
+        .values('c')
+    )
+    return Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+
+
+class StoryQuerySet(models.QuerySet):
+    def with_actual_engagement_counts(self):
+        # Live counts from the join tables, used to verify the stored counters.
+        return self.annotate(
+            actual_likes_count=_m2m_count_subquery(Story.likes.through),
+            actual_bookmarks_count=_m2m_count_subquery(Story.bookmarks.through),
+            actual_comments_count=_m2m_count_subquery(Comment),
+        )
+
+    def refresh_engagement_counts(self):
+        # Recompute the stored counters in a single UPDATE; returns rows touched.
+        return self.update(
+            likes_count=_m2m_count_subquery(Story.likes.through),
+            bookmarks_count=_m2m_count_subquery(Story.bookmarks.through),
+            comments_count=_m2m_count_subquery(Comment),
+        )
+
+
 class Story(models.Model):
     title = models.CharField(max_length=100, unique=True)
     genre = models.CharField(max_length=50, choices=GenreChoices.choices)
@@ -45,11 +89,32 @@ class Story(models.Model):
     likes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='liked_stories', blank=True)
     bookmarks = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='bookmarked_stories', blank=True)
 
+    #denormalized counters, kept in sync by the toggle views and m2m signals
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmarks_count = models.PositiveIntegerField(default=0, editable=False)
+    #kept in sync by the Comment post_save/post_delete signals
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    #time-decayed engagement score for the trending shelf (stories/ranking.py)
+    trending_score = models.FloatField(default=0, editable=False)
+    trending_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = StoryQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='story_feed_idx'),
+            # Catalog filters keep the feed's keyset order within one genre/status
+            models.Index(fields=['genre', '-created_at', '-id'], name='story_genre_feed_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='story_status_feed_idx'),
+            # Ranked shelves (/stories/trending/, /stories/popular/)
+            models.Index(fields=['-trending_score', '-id'], name='story_trending_idx'),
+            models.Index(fields=['-likes_count', '-id'], name='story_popular_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -61,9 +126,15 @@ class Comment(models.Model):
     story = models.ForeignKey('Story', on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
-    created_at = models.DateField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pages of a story's thread: WHERE story = x ORDER BY created_at DESC, id DESC
+            models.Index(fields=['story', '-created_at', '-id'], name='comment_thread_idx'),
+        ]
+
     def __str__(self):
         return f"Comment on {self.story} by {self.user}"
     
@@ -77,6 +148,8 @@ class Chapter(models.Model):
     content = models.TextField(blank=False, null=False)
     order = models.PositiveIntegerField(default=1)
     is_published = models.BooleanField(default=False)
+    #kept with the row so the story's table of contents never loads content
+    word_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -84,6 +157,15 @@ class Chapter(models.Model):
         ordering = ['order']
         unique_together = ('story', 'chapter_no')
 
+    def save(self, *args, **kwargs):
+        # Skip when content was deferred (and so can't have changed here)
+        if 'content' in self.__dict__:
+            self.word_count = len(self.content.split())
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'content' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'word_count'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.story.title} - Chapter {self.chapter_no}: {self.title}"
 
@@ -100,6 +182,63 @@ class Notification(models.Model):
     url = models.URLField(null=True, blank=True)  
     is_read = models.BooleanField(default=False)
     created_at = models.DateField(auto_now_add=True)
+    #how many notifications this row stands for once compacted (prune_notifications)
+    group_size = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # unread badge COUNT
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_inbox_idx'),
+            # inbox pages: WHERE user ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_list_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.user.username}: {self.message[:30]}"
+
+
+#-----------------FEED ITEM MODEL--------------------------------
+
+class FeedItem(models.Model):
+    """
+    One entry in followers' home timelines: a story going up or a chapter being
+    published, stamped with the moment it happened. Written by stories.signals.
+    """
+    class Kind(models.TextChoices):
+        STORY = "story"
+        CHAPTER = "chapter"
+
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_items')
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='feed_items')
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, null=True, blank=True, related_name='feed_item')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # Timeline reads: WHERE author IN (...) ORDER BY created_at DESC, id DESC
+            models.Index(fields=['author', '-created_at', '-id'], name='feed_author_idx'),
+        ]
 
     def __str__(self):
-        return f"Notification for {self.user.username}: {self.message[:30]}"
\ No newline at end of file
+        return f"{self.kind} by {self.author_id} at {self.created_at}"
+
+
+#-----------------SEARCH DOCUMENT MODEL--------------------------------
+
+class StorySearchDocument(models.Model):
+    """
+    PostgreSQL search index row: one weighted tsvector per story (GIN indexed).
+
+    The table is created by migration 0006 only on PostgreSQL; on SQLite the
+    same name is an FTS5 virtual table driven by raw SQL. See stories/search.py.
+    """
+    story = models.OneToOneField(
+        Story, on_delete=models.DO_NOTHING, primary_key=True,
+        related_name='search_document', db_constraint=False,
+    )
+    document = SearchVectorField()
+
+    class Meta:
+        managed = False
+        db_table = 'stories_search'
@@ -0,0 +1,164 @@
+import re
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Notification, Story
+
+
+#-----------------UNREAD COUNT CACHE--------------------------------
+# The navbar polls the unread badge constantly, so the count lives in the
+# cache and is adjusted in place on every write path. A missing key simply
+# falls back to one COUNT over notification_inbox_idx (user, is_read, ...).
+#
+# Counts are stored under a per-user generation. Writes that can't adjust the
+# cached count bump the generation (again after commit), so a reader whose
+# COUNT raced that write stores its result under a key nobody reads any more.
+
+UNREAD_COUNT_TTL = 60 * 60
+
+
+def _generation_key(user_id):
+    return f"notifications:unread:gen:{user_id}"
+
+
+def unread_count_key(user_id, generation):
+    return f"notifications:unread:{user_id}:{generation}"
+
+
+def _current_key(user_id):
+    generation = cache.get_or_set(_generation_key(user_id), time.time_ns, None)
+    return unread_count_key(user_id, generation)
+
+
+def get_unread_count(user_id):
+    key = _current_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        # add, not set: an adjustment that landed meanwhile is newer than this COUNT
+        cache.add(key, count, UNREAD_COUNT_TTL)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    try:
+        count = cache.incr(_current_key(user_id), delta)
+    except ValueError:
+        # Not cached; a COUNT already in flight may predate this write.
+        invalidate_unread_counts([user_id])
+        return
+    if count < 0:
+        invalidate_unread_counts([user_id])
+
+
+def _bump(keys):
+    cache.set_many({key: time.time_ns() for key in keys}, None)
+
+
+def invalidate_unread_counts(user_ids):
+    keys = [_generation_key(user_id) for user_id in user_ids]
+    if not keys:
+        return
+    _bump(keys)
+    if connection.in_atomic_block:
+        # A COUNT between the bump and the commit still misses this write
+        transaction.on_commit(lambda: _bump(keys))
+
+
+#-----------------BULK READ--------------------------------
+
+def mark_notifications_read(user_id, up_to_id=None):
+    """Mark the user's unread notifications (optionally only ids <= up_to_id) read in one UPDATE."""
+    notifications = Notification.objects.filter(user_id=user_id, is_read=False)
+    if up_to_id is not None:
+        notifications = notifications.filter(id__lte=up_to_id)
+    updated = notifications.update(is_read=True)
+
+    if updated:
+        adjust_unread_count(user_id, -updated)
+    return updated
+
+
+#-----------------RETENTION & COMPACTION--------------------------------
+
+_STORY_URL = re.compile(r"^/explore/(\d+)/$")
+_MORE_SUFFIX = re.compile(r" \(\+\d+ more\)$")
+
+
+def prune_read_notifications(days, batch_size=1000, pause=0.0):
+    """
+    Delete read notifications older than `days` in primary-key batches.
+
+    Each batch is its own short DELETE ... WHERE id IN (...), so no statement
+    holds locks across the whole table. Returns the number of rows removed.
+    """
+    cutoff = timezone.localdate() - timedelta(days=days)
+    expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+    removed = 0
+
+    while True:
+        ids = list(expired.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        removed += Notification.objects.filter(id__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+    return removed
+
+
+def compact_unread_notifications(batch_size=1000):
+    """
+    Collapse unread notifications that point at the same place for the same user
+    (e.g. ten new chapters of one story) into the newest row, rewritten as a
+    summary. Rows carry how many notifications they already stand for
+    (group_size), so re-compacting a summary adds to its total instead of
+    restarting it. Each batch of groups is one bulk UPDATE and one DELETE.
+    Returns the number of rows removed.
+    """
+    groups = (
+        Notification.objects.filter(is_read=False)
+        .values('user_id', 'url')
+        .annotate(rows=Count('id'), total=Sum('group_size'), latest_id=Max('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    removed = 0
+    touched_users = set()
+
+    while True:
+        batch = list(groups[:batch_size])
+        if not batch:
+            break
+
+        story_ids = {int(m.group(1)) for g in batch if g['url'] and (m := _STORY_URL.match(g['url']))}
+        titles = dict(Story.objects.filter(id__in=story_ids).values_list('id', 'title'))
+        messages = dict(
+            Notification.objects.filter(id__in=[g['latest_id'] for g in batch]).values_list('id', 'message')
+        )
+
+        summaries = []
+        older = Q()
+        for group in batch:
+            match = _STORY_URL.match(group['url'] or '')
+            title = titles.get(int(match.group(1))) if match else None
+            if title:
+                message = f"{group['total']} new updates in '{title}'"
+            else:
+                base = _MORE_SUFFIX.sub('', messages.get(group['latest_id'], ''))
+                message = f"{base} (+{group['total'] - 1} more)"
+            summaries.append(Notification(id=group['latest_id'], message=message, group_size=group['total']))
+            # Anything newer than latest_id arrived after the GROUP BY and stays
+            older |= Q(user_id=group['user_id'], url=group['url'], id__lt=group['latest_id'])
+            touched_users.add(group['user_id'])
+
+        with transaction.atomic():
+            Notification.objects.bulk_update(summaries, ['message', 'group_size'])
+            removed += Notification.objects.filter(older, is_read=False).delete()[0]
+
+    invalidate_unread_counts(touched_users)
+    return removed
@@ -0,0 +1,119 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+#-----------------KEYSET (CURSOR) PAGINATION--------------------------------
+
+class KeysetPagination:
+    """
+    Forward-only keyset pagination ordered by (`ordering_field`, `id`) descending.
+
+    Each page is a single indexed range scan (`WHERE (field, id) < (x, y) LIMIT n`),
+    so its cost does not grow with how deep the client has scrolled, and no
+    `COUNT(*)` is issued. The cursor is an opaque token encoding the last row's
+    position; clients pass it back unchanged as `?cursor=`.
+    """
+    ordering_field = 'created_at'
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.ordering_field
+
+        queryset = queryset.order_by(f'-{field}', '-id')
+        position = self.decode_cursor(request)
+        if position is not None:
+            value, pk = position
+            try:
+                value = queryset.model._meta.get_field(field).to_python(value)
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+            )
+
+        # Fetch one extra row to learn whether another page exists.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            last = results[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, value, pk):
+        raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, pk])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            return value, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+
+#-----------------STORY FEED PAGINATION--------------------------------
+
+class StoryFeedPagination(KeysetPagination):
+    ordering_field = 'created_at'
+    page_size = 20
+
+
+#-----------------COMMENT THREAD PAGINATION--------------------------------
+
+class CommentPagination(KeysetPagination):
+    ordering_field = 'created_at'
+    page_size = 10
+
+
+#-----------------NOTIFICATION INBOX PAGINATION--------------------------------
+
+class NotificationPagination(KeysetPagination):
+    ordering_field = 'created_at'
+    page_size = 20
+
+
+
+#-----------------FOLLOWING TIMELINE PAGINATION--------------------------------
+
+class FeedPagination(KeysetPagination):
+    ordering_field = 'created_at'
+    page_size = 20
@@ -0,0 +1,158 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Chapter, Comment, Story
+
+
+#-----------------SETTINGS--------------------------------
+
+DEFAULT_WEIGHTS = {'likes': 1.0, 'bookmarks': 2.0, 'comment': 3.0, 'chapter': 5.0}
+
+
+def _setting(name, default):
+    return getattr(settings, f'RANKING_{name}', default)
+
+
+def event_weight(event):
+    return _setting('WEIGHTS', DEFAULT_WEIGHTS).get(event, 0.0)
+
+
+#-----------------INCREMENTAL UPDATES--------------------------------
+# Story.trending_score is the decayed engagement score as of the last decay run
+# (Story.trending_at) plus everything that happened since at full weight. New
+# events go straight in with one UPDATE; the decay job below ages them in bulk.
+
+def trending_updates(event, times=1):
+    """UPDATE kwargs adding `times` events of this kind (negative removes)."""
+    return {
+        'trending_score': Greatest(F('trending_score') + event_weight(event) * times, Value(0.0)),
+        # A score that had faded to 0 starts afresh: an old stamp would make the
+        # next decay run age the new points by the whole time since then
+        'trending_at': Case(When(trending_score__lte=0, then=Value(None)), default=F('trending_at')),
+    }
+
+
+def bump_trending(story_ids, event, times=1):
+    if event_weight(event) and story_ids:
+        Story.objects.filter(pk__in=story_ids).update(**trending_updates(event, times))
+
+
+#-----------------BULK DECAY--------------------------------
+# Every row decayed by the same run shares its trending_at, so a run is one
+# UPDATE per distinct timestamp (normally one or two) with a constant factor,
+# never a per-row loop. Scores that have faded below RANKING_MIN_SCORE drop to 0.
+
+def decay_trending_scores(now=None):
+    """Age every live score to `now`; returns the number of stories touched."""
+    now = now or timezone.now()
+    half_life = _setting('HALF_LIFE_HOURS', 72) * 3600
+    live = Story.objects.filter(trending_score__gt=0)
+
+    touched = live.filter(trending_at__isnull=True).update(trending_at=now)
+    stamps = live.exclude(trending_at__isnull=True).exclude(trending_at=now).order_by()
+    for stamp in stamps.values_list('trending_at', flat=True).distinct():
+        factor = 0.5 ** (max((now - stamp).total_seconds(), 0) / half_life)
+        touched += live.filter(trending_at=stamp).update(
+            trending_score=F('trending_score') * factor, trending_at=now,
+        )
+
+    live.filter(trending_score__lt=_setting('MIN_SCORE', 0.01)).update(trending_score=0, trending_at=None)
+    invalidate_rankings()
+    return touched
+
+
+#-----------------BULK RECOMPUTE--------------------------------
+# Rebuilds trending_score from the rows it summarizes: backfills stories that
+# predate the column and repairs drift the incremental path leaves alone (e.g.
+# engagement removed from a score that had already faded). Likes and bookmarks
+# carry no timestamp, so each story's points are aged from its last activity:
+# the newest of its comments, its published chapters and its own updated_at.
+# One SELECT and one bulk UPDATE per batch of stories.
+
+def _latest(model, field, **filters):
+    rows = model.objects.filter(story_id=OuterRef('pk'), **filters).order_by().values('story_id')
+    return Subquery(rows.annotate(latest=Max(field)).values('latest'))
+
+
+def recompute_trending_scores(now=None, batch_size=1000):
+    """Rebuild every story's score from its engagement as of `now`; returns stories changed."""
+    now = now or timezone.now()
+    half_life = _setting('HALF_LIFE_HOURS', 72) * 3600
+    min_score = _setting('MIN_SCORE', 0.01)
+    published = (
+        Chapter.objects.filter(story_id=OuterRef('pk'), is_published=True)
+        .order_by().values('story_id').annotate(c=Count('*')).values('c')
+    )
+    stories = Story.objects.annotate(
+        published_chapters=Coalesce(Subquery(published), Value(0)),
+        last_active=Greatest(
+            'updated_at',
+            Coalesce(_latest(Comment, 'created_at'), 'updated_at'),
+            Coalesce(_latest(Chapter, 'updated_at', is_published=True), 'updated_at'),
+        ),
+    ).order_by('pk')
+
+    changed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            stories.filter(pk__gt=last_id).only('trending_score', 'trending_at', 'likes_count',
+                                                'bookmarks_count', 'comments_count')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].pk
+
+        updates = []
+        for story in batch:
+            points = (
+                event_weight('likes') * story.likes_count
+                + event_weight('bookmarks') * story.bookmarks_count
+                + event_weight('comment') * story.comments_count
+                + event_weight('chapter') * story.published_chapters
+            )
+            age = max((now - story.last_active).total_seconds(), 0)
+            score = points * 0.5 ** (age / half_life)
+            score, stamp = (score, now) if score >= min_score else (0.0, None)
+            if (score, stamp) != (story.trending_score, story.trending_at):
+                story.trending_score, story.trending_at = score, stamp
+                updates.append(story)
+        Story.objects.bulk_update(updates, ['trending_score', 'trending_at'])
+        changed += len(updates)
+
+    invalidate_rankings()
+    return changed
+
+
+#-----------------CACHED SHELVES--------------------------------
+# Each shelf caches its ranked story ids (top RANKING_CACHE_SIZE) for
+# RANKING_CACHE_TTL seconds; pages are slices of that snapshot, so paging stays
+# consistent while scores move underneath.
+
+RANKINGS = {
+    'trending': ('-trending_score', '-id'),
+    'popular': ('-likes_count', '-id'),
+}
+
+
+def _ranking_key(name):
+    return f"rankings:{name}"
+
+
+def ranked_story_ids(name):
+    key = _ranking_key(name)
+    ids = cache.get(key)
+    if ids is None:
+        stories = Story.objects.order_by(*RANKINGS[name])
+        if name == 'trending':
+            stories = stories.filter(trending_score__gt=0)
+        ids = list(stories.values_list('id', flat=True)[:_setting('CACHE_SIZE', 500)])
+        cache.set(key, ids, _setting('CACHE_TTL', 300))
+    return ids
+
+
+def invalidate_rankings():
+    cache.delete_many([_ranking_key(name) for name in RANKINGS])
@@ -0,0 +1,159 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from rest_framework.response import Response
+
+
+#-----------------SETTINGS--------------------------------
+
+def _setting(name, default):
+    return getattr(settings, f'RESPONSE_CACHE_{name}', default)
+
+
+#-----------------SCOPES / INVALIDATION--------------------------------
+# Cached bodies are keyed on the current version of every scope they depend on.
+# Versions live in the default cache, so bumping one makes the matching entries
+# unreachable in every tier of every process that shares that cache (Redis):
+#
+#   ALL           every cached response (tag renames)
+#   LISTS         catalog pages and per-author story lists: which stories they
+#                 hold (a story created, deleted, edited or re-tagged)
+#   story:<id>    one story's detail and chapter list, and the list pages that
+#                 show it (counters move, comments, chapters)
+#
+# List pages record the story:<id> versions of the stories they show and are
+# rebuilt when one of those moves, so a like only costs the pages the story is
+# on. With the default LocMemCache each process keeps its own versions and
+# cannot see another worker's bumps; bodies are then kept only
+# RESPONSE_CACHE_LOCAL_TTL seconds, which bounds how stale other workers get.
+
+ALL = 'all'
+LISTS = 'story-lists'
+
+
+def story_scope(story_id):
+    return f'story:{story_id}'
+
+
+def _version_key(scope):
+    return f"respcache:v:{scope}"
+
+
+def _bump(scopes):
+    cache.set_many({_version_key(scope): time.time_ns() for scope in scopes}, None)
+
+
+def invalidate_responses(*scopes):
+    # Bump now so this process stops serving the old body, and again after
+    # commit so a reader that re-cached pre-commit data is orphaned too.
+    _bump(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def _versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    return [found[key] if key in found else cache.get_or_set(key, time.time_ns, None) for key in keys]
+
+
+#-----------------TIERS--------------------------------
+# 'local' is per-process memory with a short TTL; 'default' is the shared
+# tier when it is Redis. With an in-memory default there is only one tier.
+
+def _local_tier():
+    return caches['local']
+
+
+def _shared_tier():
+    shared = caches['default']
+    return None if isinstance(shared, LocMemCache) else shared
+
+
+def _get(key):
+    data = _local_tier().get(key)
+    shared = _shared_tier()
+    if data is None and shared is not None:
+        data = shared.get(key)
+        if data is not None:
+            _local_tier().set(key, data, _setting('LOCAL_TTL', 5))
+    return data
+
+
+def _set(key, data):
+    _local_tier().set(key, data, _setting('LOCAL_TTL', 5))
+    shared = _shared_tier()
+    if shared is not None:
+        shared.set(key, data, _setting('TTL', 60))
+
+
+#-----------------CACHED READS--------------------------------
+
+def story_item_scopes(data):
+    """story:<id> scopes of the stories in a list body (paginated or not)."""
+    items = data['results'] if isinstance(data, dict) else data
+    return [story_scope(item['id']) for item in items]
+
+
+def _fresh(entry):
+    """The cached body, unless a story it shows has changed since."""
+    if entry is None:
+        return None
+    items = entry['items']
+    if items and _versions(list(items)) != list(items.values()):
+        return None
+    return entry['data']
+
+
+def cached_response(request, scopes, build, per_viewer=False, item_scopes=None):
+    """
+    `build()`'s Response for this GET, served from cache when possible.
+
+    Keyed by path, query params and viewer class ('anon' / 'auth'); views whose
+    payload differs per signed-in user pass per_viewer=True and are only cached
+    for anonymous visitors. `item_scopes(data)` names further scopes the body
+    depends on item by item (see story_item_scopes). On a miss one caller
+    rebuilds while others wait up to RESPONSE_CACHE_LOCK_WAIT seconds for its
+    result (single flight).
+    """
+    if not _setting('ENABLED', True) or request.method != 'GET':
+        return build()
+    if request.user.is_authenticated:
+        if per_viewer:
+            return build()
+        viewer = 'auth'
+    else:
+        viewer = 'anon'
+
+    versions = _versions([ALL, *scopes])
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(repr((request.path, params, versions)).encode(), usedforsecurity=False).hexdigest()
+    key = f"respcache:{viewer}:{digest}"
+
+    data = _fresh(_get(key))
+    if data is not None:
+        return Response(data)
+
+    lock = f"{key}:lock"
+    if cache.add(lock, 1, _setting('LOCK_TIMEOUT', 10)):
+        try:
+            res = build()
+            if res.status_code == 200:
+                items = item_scopes(res.data) if item_scopes else []
+                _set(key, {'data': res.data, 'items': dict(zip(items, _versions(items)))})
+            return res
+        finally:
+            cache.delete(lock)
+
+    deadline = time.monotonic() + _setting('LOCK_WAIT', 2.0)
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        data = _fresh(_get(key))
+        if data is not None:
+            return Response(data)
+    # The builder is slow or died; answer this request ourselves
+    return build()
@@ -0,0 +1,213 @@
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Substr
+
+from .models import Chapter, Story, StorySearchDocument
+
+
+#-----------------DOCUMENTS--------------------------------
+# What gets indexed per story: title, synopsis, tag names and the text of its
+# published chapters. Built for a batch of stories with three queries.
+
+# Keeps one story's tsvector well under PostgreSQL's 1MB limit.
+MAX_CHAPTER_CHARS = 200_000
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _documents(story_ids):
+    docs = {
+        pk: {'title': title, 'synopsis': synopsis, 'tags': [], 'chapters': []}
+        for pk, title, synopsis in Story.objects.filter(pk__in=story_ids).values_list('pk', 'title', 'synopsis')
+    }
+    for story_id, name in Story.tags.through.objects.filter(story_id__in=docs).values_list('story_id', 'tag__name'):
+        docs[story_id]['tags'].append(name)
+
+    chapter_chars = defaultdict(int)
+    chapters = Chapter.objects.filter(story_id__in=docs, is_published=True).order_by('story_id', 'order')
+    # No chapter can contribute more than the cap, so don't fetch more than that
+    capped = chapters.values_list('story_id', Substr('content', 1, MAX_CHAPTER_CHARS))
+    for story_id, content in capped.iterator():
+        room = MAX_CHAPTER_CHARS - chapter_chars[story_id]
+        if room > 0:
+            docs[story_id]['chapters'].append(content[:room])
+            chapter_chars[story_id] += min(len(content), room)
+
+    return {
+        pk: (doc['title'], doc['synopsis'], ' '.join(doc['tags']), '\n'.join(doc['chapters']))
+        for pk, doc in docs.items()
+    }
+
+
+def search_terms(text):
+    return TERM_RE.findall((text or '').lower())[:10]
+
+
+#-----------------POSTGRESQL BACKEND--------------------------------
+
+class PostgresSearchBackend:
+    """Weighted tsvector per story in stories_search, GIN indexed."""
+    config = 'simple'
+
+    def index(self, story_ids):
+        docs = _documents(story_ids)
+        if docs:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    """
+                    INSERT INTO stories_search (story_id, document)
+                    VALUES (%s, setweight(to_tsvector(%s::regconfig, %s), 'A')
+                              || setweight(to_tsvector(%s::regconfig, %s), 'B')
+                              || setweight(to_tsvector(%s::regconfig, %s), 'C')
+                              || setweight(to_tsvector(%s::regconfig, %s), 'D'))
+                    ON CONFLICT (story_id) DO UPDATE SET document = EXCLUDED.document
+                    """,
+                    [
+                        (pk, self.config, title, self.config, tags, self.config, synopsis, self.config, chapters)
+                        for pk, (title, synopsis, tags, chapters) in docs.items()
+                    ],
+                )
+        self.delete(set(story_ids) - set(docs))
+
+    def delete(self, story_ids):
+        if story_ids:
+            StorySearchDocument.objects.filter(story_id__in=list(story_ids)).delete()
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute("TRUNCATE stories_search")
+
+    def search(self, text, limit, offset=0):
+        terms = search_terms(text)
+        if not terms:
+            return []
+        # Every term must match; each one also matches as a prefix.
+        query = SearchQuery(' & '.join(f"{term}:*" for term in terms), config=self.config, search_type='raw')
+        rows = (
+            StorySearchDocument.objects.filter(document=query)
+            .annotate(rank=SearchRank(F('document'), query))
+            .order_by('-rank', '-story_id')
+            .values_list('story_id', flat=True)[offset:offset + limit]
+        )
+        return list(rows)
+
+
+#-----------------SQLITE FTS5 BACKEND--------------------------------
+
+class SQLiteSearchBackend:
+    """FTS5 virtual table stories_search (rowid = story id), ranked with bm25."""
+    # bm25 column weights: title, synopsis, tags, chapters
+    weights = (10.0, 4.0, 6.0, 1.0)
+
+    def index(self, story_ids):
+        docs = _documents(story_ids)
+        with connection.cursor() as cursor:
+            self._delete(cursor, story_ids)
+            cursor.executemany(
+                "INSERT INTO stories_search (rowid, title, synopsis, tags, chapters) VALUES (%s, %s, %s, %s, %s)",
+                [(pk, *doc) for pk, doc in docs.items()],
+            )
+
+    def _delete(self, cursor, story_ids):
+        story_ids = list(story_ids)
+        for start in range(0, len(story_ids), 500):
+            batch = story_ids[start:start + 500]
+            cursor.execute(
+                f"DELETE FROM stories_search WHERE rowid IN ({', '.join(['%s'] * len(batch))})", batch
+            )
+
+    def delete(self, story_ids):
+        with connection.cursor() as cursor:
+            self._delete(cursor, story_ids)
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM stories_search")
+
+    def search(self, text, limit, offset=0):
+        terms = search_terms(text)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT rowid FROM stories_search
+                WHERE stories_search MATCH %s
+                ORDER BY bm25(stories_search, {', '.join(map(str, self.weights))}), rowid DESC
+                LIMIT %s OFFSET %s
+                """,
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+#-----------------FALLBACK BACKEND--------------------------------
+
+class BasicSearchBackend:
+    """No index (e.g. MySQL): case-insensitive matching on title, synopsis and tags."""
+
+    def index(self, story_ids):
+        pass
+
+    delete = index
+
+    def clear(self):
+        pass
+
+    def search(self, text, limit, offset=0):
+        terms = search_terms(text)
+        if not terms:
+            return []
+        stories = Story.objects.all()
+        for term in terms:
+            stories = stories.filter(
+                Q(title__icontains=term) | Q(synopsis__icontains=term) | Q(tags__name__icontains=term)
+            )
+        return list(stories.distinct().order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit])
+
+
+#-----------------BACKEND SELECTION / INCREMENTAL UPDATES--------------------------------
+
+def get_search_backend():
+    return {
+        'postgresql': PostgresSearchBackend,
+        'sqlite': SQLiteSearchBackend,
+    }.get(connection.vendor, BasicSearchBackend)()
+
+
+def _pending_reindex():
+    if not hasattr(connection, '_pending_reindex'):
+        connection._pending_reindex = set()
+    return connection._pending_reindex
+
+
+def _flush_reindex():
+    pending = _pending_reindex()
+    if pending:
+        story_ids = sorted(pending)
+        pending.clear()
+        get_search_backend().index(story_ids)
+
+
+def schedule_reindex(story_id):
+    """
+    Re-index a story after the surrounding transaction commits.
+
+    A story saved, re-tagged and given a chapter in one request is indexed
+    once: every call adds to the connection's pending ids and queues a flush,
+    and the first flush to run after commit indexes them all while the rest
+    find nothing left. Ids left behind by a rollback are simply re-indexed
+    with the next batch, which only re-reads what's in the database.
+    """
+    _pending_reindex().add(story_id)
+    # Outside a transaction this runs right away
+    transaction.on_commit(_flush_reindex)
+
+
+def schedule_unindex(story_id):
+    transaction.on_commit(lambda: get_search_backend().delete([story_id]))
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Story, Chapter, Comment, Notification, Tag
+from .models import Story, Chapter, Comment, Notification, FeedItem
+from .tags import clean_tag_names, resolve_tag_ids, tag_names_error
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
@@ -38,20 +39,30 @@ class ChapterSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+#-----------------CHAPTER TABLE OF CONTENTS SERIALIZER--------------------------------
+
+class ChapterTOCSerializer(serializers.ModelSerializer):
+    # Everything but the body; readers fetch that from the chapter endpoint.
+    class Meta:
+        model = Chapter
+        fields = ['id', 'chapter_no', 'title', 'word_count', 'is_published', 'created_at']
+
+
 #-----------------STORY LIST SERIALIZER (Lightweight)--------------------------------
 
 class StoryListSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source='author.username')
     cover_image_url = serializers.SerializerMethodField()
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    bookmarks_count = serializers.IntegerField(source='bookmarks.count', read_only=True)
+    likes_count = serializers.IntegerField(read_only=True)
+    bookmarks_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
     tags = serializers.SerializerMethodField()
 
     class Meta:
         model = Story
         fields = [
             'id', 'title', 'genre', 'cover_image_url', 'status',
-            'author', 'likes_count', 'bookmarks_count', 'tags', 'created_at'
+            'author', 'likes_count', 'bookmarks_count', 'comments_count', 'tags', 'created_at'
         ]
 
     def get_cover_image_url(self, obj):
@@ -70,13 +81,16 @@ class StorySerializer(serializers.ModelSerializer):
     cover_image_url = serializers.SerializerMethodField()
     chapters = serializers.SerializerMethodField()
     tags = serializers.SerializerMethodField()
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    bookmarks_count = serializers.IntegerField(source='bookmarks.count', read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    likes_count = serializers.IntegerField(read_only=True)
+    bookmarks_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
+    # Only the viewer's own flag is read back, never the list of bookmarkers
+    is_bookmarked = serializers.SerializerMethodField()
     bookmarks = serializers.PrimaryKeyRelatedField(
         many=True,
         queryset=User.objects.all(),
-        required=False
+        required=False,
+        write_only=True
     )
 
     class Meta:
@@ -84,8 +98,8 @@ class StorySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'genre', 'synopsis', 'cover_image', 'cover_image_url', 'status',
             'is_serialized', 'author', 'created_at', 'updated_at',
-            'tags', 'chapters', 'bookmarks',
-            'likes_count', 'bookmarks_count', 'comments'
+            'tags', 'chapters', 'bookmarks', 'is_bookmarked',
+            'likes_count', 'bookmarks_count', 'comments_count'
         ]
 
     def get_cover_image_url(self, obj):
@@ -94,37 +108,66 @@ class StorySerializer(serializers.ModelSerializer):
         return None
 
     def get_chapters(self, obj):
+        # Table of contents only; filtered in Python so a prefetch is reused
         request = self.context.get('request')
         user = request.user if request else None
-        chapters = obj.chapters.all() if user == obj.author else obj.chapters.filter(is_published=True)
-        return ChapterSerializer(chapters, many=True).data
+        chapters = obj.chapters.all()
+        if user != obj.author:
+            chapters = [chapter for chapter in chapters if chapter.is_published]
+        return ChapterTOCSerializer(chapters, many=True).data
 
     def get_tags(self, obj):
         return [tag.name for tag in obj.tags.all()]
 
-    def validate_tags_input(self, tags_list):
-        if len(tags_list) > 10:
-            raise serializers.ValidationError("A story cannot have more than 10 tags.")
-        return [tag.strip() for tag in tags_list if tag.strip()]
+    def get_is_bookmarked(self, obj):
+        # story_detail annotates it; other callers pay one EXISTS
+        if hasattr(obj, 'viewer_bookmarked'):
+            return obj.viewer_bookmarked
+        request = self.context.get('request')
+        if not request or not request.user.is_authenticated:
+            return False
+        return obj.bookmarks.filter(pk=request.user.pk).exists()
 
-    def create(self, validated_data):
+    def _tags_input(self):
+        """Raw tag names from the request, or None when no tags were sent."""
         request = self.context.get("request")
-        tags_data = []
-        bookmarks_data = validated_data.pop("bookmarks", [])
+        if request is None:
+            return None
+        data = request.data
+        if hasattr(data, "getlist"):
+            if "tags[]" not in data and "tags" not in data:
+                return None
+            return data.getlist("tags[]") or data.getlist("tags")
+        if "tags" not in data:
+            return None
+        tags = data["tags"]
+        return [tags] if isinstance(tags, str) else list(tags or [])
 
-        if request:
-            if hasattr(request.data, "getlist"):
-                tags_data = request.data.getlist("tags[]") or request.data.getlist("tags")
-            else:
-                tags_data = request.data.get("tags", [])
+    def validate(self, data):
+        data = super().validate(data)
+        tags = self._tags_input()
+        if tags is not None:
+            # A present but empty list (multipart: a single blank "tags") clears them
+            tags = clean_tag_names(tags)
+            error = tag_names_error(tags)
+            if error:
+                raise serializers.ValidationError({'tags': error})
+        data['tag_names'] = tags
+        return data
 
-        tags_data = self.validate_tags_input(tags_data)
+    def _set_tags(self, story, tag_names):
+        # One INSERT ... ON CONFLICT and one SELECT for unseen names, then set()
+        tag_ids = resolve_tag_ids(tag_names)
+        story.tags.set([tag_ids[name] for name in tag_names])
+
+    def create(self, validated_data):
+        tag_names = validated_data.pop("tag_names", None)
+        bookmarks_data = validated_data.pop("bookmarks", [])
 
         story = Story.objects.create(**validated_data)
 
-        if tags_data:
-            tag_objs = [Tag.objects.get_or_create(name=tag)[0] for tag in tags_data]
-            story.tags.set(tag_objs)
+        if tag_names:
+            self._set_tags(story, tag_names)
 
         if bookmarks_data:
             story.bookmarks.set(bookmarks_data)
@@ -132,25 +175,17 @@ class StorySerializer(serializers.ModelSerializer):
         return story
 
     def update(self, instance, validated_data):
-        request = self.context.get("request")
-        tags_data = []
+        tag_names = validated_data.pop("tag_names", None)
         bookmarks_data = validated_data.pop("bookmarks", None)
 
-        if request:
-            if hasattr(request.data, "getlist"):
-                tags_data = request.data.getlist("tags[]") or request.data.getlist("tags")
-            else:
-                tags_data = request.data.get("tags", [])
-
-        tags_data = self.validate_tags_input(tags_data)
-
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        # Only the edited columns: the engagement counters and trending score
+        # loaded with `instance` may have moved since, and must not be rolled back
+        instance.save(update_fields=[*validated_data, 'updated_at'])
 
-        if tags_data:
-            tag_objs = [Tag.objects.get_or_create(name=tag)[0] for tag in tags_data]
-            instance.tags.set(tag_objs)
+        if tag_names is not None:
+            self._set_tags(instance, tag_names)
 
         if bookmarks_data is not None:
             instance.bookmarks.set(bookmarks_data)
@@ -163,4 +198,21 @@ class StorySerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'message', 'url', 'is_read', 'created_at']
\ No newline at end of file
+        fields = ['id', 'message', 'url', 'is_read', 'created_at']
+
+
+#-----------------FOLLOWING FEED SERIALIZER--------------------------------
+
+class FeedItemSerializer(serializers.ModelSerializer):
+    author = serializers.ReadOnlyField(source='author.username')
+    story = StoryListSerializer(read_only=True)
+    chapter = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FeedItem
+        fields = ['id', 'kind', 'created_at', 'author', 'story', 'chapter']
+
+    def get_chapter(self, obj):
+        if obj.chapter_id is None:
+            return None
+        return {'chapter_no': obj.chapter.chapter_no, 'title': obj.chapter.title}
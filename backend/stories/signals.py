@@ -1,10 +1,20 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, m2m_changed
 from django.dispatch import receiver
-from stories.models import Story, Chapter, Notification
+from stories.models import Story, Chapter, Comment, Notification, Tag
 from users.models import CustomUser, Follow
-from django.db.models import Subquery
+from users.graph import follower_ids
+from django.db.models import F, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
+from .fanout import schedule_fanout
+from .notifications import adjust_unread_count
+from .timeline import invalidate_timelines, record_story, sync_chapter
+from .search import schedule_reindex, schedule_unindex
+from .ranking import bump_trending
+from .response_cache import ALL, LISTS, invalidate_responses, story_scope
+from .tags import forget_tag_ids
 
 
 #------logic for live notification------
@@ -27,27 +37,21 @@ def send_realtime_notification(user_id, message, url=None):
 def notify_followers_on_story_create(sender, instance, created, **kwargs):
     if created:
         author = instance.author
-        followers = CustomUser.objects.filter(
-            id__in=Subquery(Follow.objects.filter(following=author).values("follower_id"))
-        ).exclude(id=author.id)
-
-        notifications = [
-            Notification(
-                user=follower,
-                message=f"{author.username} just dropped a new story: '{instance.title}'",
-                url=f"/explore/{instance.id}/"
-            )
-            for follower in followers
-        ]
-        Notification.objects.bulk_create(notifications)
+        # Cached adjacency set when we have one, else the follower subquery
+        followers = follower_ids(author.id)
+        if followers is not None:
+            followers = followers - {author.id}
+        else:
+            followers = CustomUser.objects.filter(
+                id__in=Subquery(Follow.objects.filter(following=author).values("follower_id"))
+            ).exclude(id=author.id)
 
-        # 🔴 Send live notification
-        for follower in followers:
-            send_realtime_notification(
-                follower.id,
-                f"{author.username} just dropped a new story: '{instance.title}'",
-                f"/explore/{instance.id}/"
-            )
+        # 🔴 Rows + live pushes are written in chunks off the request thread
+        schedule_fanout(
+            followers,
+            f"{author.username} just dropped a new story: '{instance.title}'",
+            f"/explore/{instance.id}/"
+        )
 
 
 #-------2️⃣ Notify user when they get a new follower-------
@@ -73,38 +77,221 @@ def notify_on_follow(sender, instance, created, **kwargs):
 
 #----------3️⃣ Notify all bookmarkers when a chapter is published------
 
-_old_publish_status = {}
-
-@receiver(pre_save, sender=Chapter)
-def cache_old_publish_status(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old_instance = Chapter.objects.get(pk=instance.pk)
-            _old_publish_status[instance.pk] = old_instance.is_published
-        except Chapter.DoesNotExist:
-            _old_publish_status[instance.pk] = False
+@receiver(post_init, sender=Chapter)
+def remember_loaded_publish_status(sender, instance, **kwargs):
+    # Snapshot of is_published as loaded, kept on the instance itself so the
+    # save path needs no extra SELECT and no process-wide state. A deferred
+    # field stays unknown (None) rather than triggering a query here.
+    instance._loaded_is_published = instance.__dict__.get('is_published')
 
 @receiver(post_save, sender=Chapter)
 def notify_bookmarkers_on_publish(sender, instance, created, **kwargs):
+    # Refreshed by remember_saved_publish_status once every handler has run
+    old_published = instance._loaded_is_published
+    # 🏠 Publish / unpublish also adds / drops the chapter's timeline entry
+    sync_chapter(instance, old_published, created)
+    # 🔥 A chapter going live counts towards the story's trending score
+    if instance.is_published and (created or old_published is False):
+        bump_trending([instance.story_id], 'chapter')
     if created:
         return
-    old_published = _old_publish_status.pop(instance.pk, False)
-    if not old_published and instance.is_published:
+    if old_published is False and instance.is_published:
         story = instance.story
         bookmarkers = story.bookmarks.exclude(id=story.author_id)
-        notifications = [
-            Notification(
-                user=user,
-                message=f"New chapter in '{story.title}': {instance.title or f'Chapter {instance.chapter_no}'}",
-                url=f"/explore/{story.id}/"
-            )
-            for user in bookmarkers
-        ]
-        Notification.objects.bulk_create(notifications)
+        schedule_fanout(
+            bookmarkers,
+            f"New chapter in '{story.title}': {instance.title or f'Chapter {instance.chapter_no}'}",
+            f"/explore/{story.id}/"
+        )
 
-        for user in bookmarkers:
-            send_realtime_notification(
-                user.id,
-                f"New chapter in '{story.title}': {instance.title or f'Chapter {instance.chapter_no}'}",
-                f"/explore/{story.id}/"
-            )
+
+#----------4️⃣ Keep Story.likes_count / bookmarks_count in sync with .add/.remove/.set------
+
+@receiver(m2m_changed, sender=Story.likes.through)
+@receiver(m2m_changed, sender=Story.bookmarks.through)
+def sync_story_engagement_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    # The toggle views write the through tables directly and adjust the counters
+    # themselves; this covers every other writer (serializers, admin, shell).
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        Story.objects.filter(pk=instance.pk).refresh_engagement_counts()
+        instance.refresh_from_db(fields=['likes_count', 'bookmarks_count'])
+    elif pk_set:
+        Story.objects.filter(pk__in=pk_set).refresh_engagement_counts()
+
+
+#----------5️⃣ Keep the cached unread badge in step with single inserts------
+
+@receiver(post_save, sender=Notification)
+def bump_unread_count(sender, instance, created, **kwargs):
+    if created and not instance.is_read:
+        adjust_unread_count(instance.user_id, 1)
+
+
+#----------6️⃣ Following timeline entries and cache------
+
+@receiver(post_save, sender=Story)
+def add_story_to_timeline(sender, instance, created, **kwargs):
+    if created:
+        record_story(instance)
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def drop_timeline_on_follow_change(sender, instance, **kwargs):
+    # Following someone new (or unfollowing) changes whose items belong in it.
+    invalidate_timelines([instance.follower_id])
+
+
+#----------7️⃣ Keep the full-text search index current------
+
+@receiver(post_save, sender=Story)
+def reindex_story(sender, instance, **kwargs):
+    schedule_reindex(instance.pk)
+
+@receiver(post_delete, sender=Story)
+def unindex_story(sender, instance, **kwargs):
+    schedule_unindex(instance.pk)
+
+@receiver(m2m_changed, sender=Story.tags.through)
+def reindex_story_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_reindex(instance.pk)
+    else:
+        for story_id in pk_set or ():
+            schedule_reindex(story_id)
+
+@receiver(post_save, sender=Chapter)
+def reindex_chapter_story(sender, instance, **kwargs):
+    # Only published text is indexed, so draft autosaves can't change the document
+    if instance._loaded_is_published is False and not instance.is_published:
+        return
+    schedule_reindex(instance.story_id)
+
+@receiver(post_delete, sender=Chapter)
+def reindex_story_without_chapter(sender, instance, **kwargs):
+    if instance.__dict__.get('is_published') is not False:
+        schedule_reindex(instance.story_id)
+
+
+#----------8️⃣ Trending scores for engagement outside the toggle views------
+
+@receiver(m2m_changed, sender=Story.likes.through)
+@receiver(m2m_changed, sender=Story.bookmarks.through)
+def bump_trending_on_engagement(sender, instance, action, reverse, pk_set, **kwargs):
+    # Only add/remove carry pk_set; a clear is left for the decay job to age out.
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    event = 'likes' if sender is Story.likes.through else 'bookmarks'
+    sign = 1 if action == 'post_add' else -1
+    if not reverse:
+        bump_trending([instance.pk], event, sign * len(pk_set))
+    else:
+        bump_trending(pk_set, event, sign)
+
+@receiver(post_save, sender=Comment)
+def bump_trending_on_comment(sender, instance, created, **kwargs):
+    if created:
+        bump_trending([instance.story_id], 'comment')
+
+
+#----------9️⃣ Drop cached read responses that a write makes stale------
+
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def invalidate_story_responses(sender, instance, **kwargs):
+    invalidate_responses(LISTS, story_scope(instance.pk))
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_story_detail_responses(sender, instance, **kwargs):
+    # Chapter TOC / chapter list and the comment count live on the story's pages
+    invalidate_responses(story_scope(instance.story_id))
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_responses(sender, instance, **kwargs):
+    # A renamed tag shows up on every story carrying it
+    invalidate_responses(ALL)
+
+@receiver(m2m_changed, sender=Story.tags.through)
+@receiver(m2m_changed, sender=Story.likes.through)
+@receiver(m2m_changed, sender=Story.bookmarks.through)
+def invalidate_story_membership_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Tags decide which filtered pages a story is on; likes and bookmarks only
+    # move its counters, which the pages showing it track through its scope
+    lists = [LISTS] if sender is Story.tags.through else []
+    if not reverse:
+        invalidate_responses(*lists, story_scope(instance.pk))
+    elif pk_set:
+        invalidate_responses(*lists, *(story_scope(pk) for pk in pk_set))
+    else:
+        # Reverse clear (e.g. user.liked_stories.clear()) doesn't say which stories
+        invalidate_responses(ALL)
+
+
+#----------🔟 Keep Story.comments_count in step with the comment rows------
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Story.objects.filter(pk=instance.story_id).update(comments_count=F('comments_count') + 1)
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Story.objects.filter(pk=instance.story_id).update(comments_count=Greatest(F('comments_count') - 1, 0))
+
+
+
+#----------1️⃣1️⃣ Forget cached tag ids when a tag is renamed or deleted------
+
+@receiver(post_init, sender=Tag)
+def remember_loaded_tag_name(sender, instance, **kwargs):
+    instance._loaded_name = instance.__dict__.get('name')
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def forget_cached_tag_ids(sender, instance, created=False, **kwargs):
+    # New tags can't invalidate a name -> id entry; renames and deletes can
+    if not created:
+        forget_tag_ids(instance._loaded_name, instance.name)
+    instance._loaded_name = instance.name
+
+
+#----------1️⃣2️⃣ Chapter publish snapshot, refreshed after every post_save handler above------
+
+@receiver(post_save, sender=Chapter)
+def remember_saved_publish_status(sender, instance, **kwargs):
+    # Sections 3️⃣ and 7️⃣ compare against the state before this save; the next
+    # save of the same instance compares against this one.
+    instance._loaded_is_published = instance.is_published
+
+
+#----------1️⃣3️⃣ Story.updated_at covers its tags (story ETags, stories/conditional.py)------
+
+@receiver(m2m_changed, sender=Story.tags.through)
+def touch_story_on_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # tag.stories.clear(): afterwards nothing says which stories had it
+        Story.objects.filter(tags=instance).update(updated_at=timezone.now())
+    elif action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        Story.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+    elif action in ('post_add', 'post_remove') and pk_set:
+        Story.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=Tag)
+def touch_stories_on_tag_rename(sender, instance, created, **kwargs):
+    if not created:
+        Story.objects.filter(tags=instance).update(updated_at=timezone.now())
+
+@receiver(pre_delete, sender=Tag)
+def touch_stories_on_tag_delete(sender, instance, **kwargs):
+    # Before the cascade removes the join rows that say which stories had it
+    Story.objects.filter(tags=instance).update(updated_at=timezone.now())
@@ -0,0 +1,82 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Tag
+
+
+#-----------------TAG NAMES--------------------------------
+
+MAX_TAGS_PER_STORY = 10
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def clean_tag_names(names):
+    """Normalized tag names, blanks and repeats dropped, in input order."""
+    cleaned = (Tag.normalize(name) for name in names)
+    return list(dict.fromkeys(name for name in cleaned if name))
+
+
+def tag_names_error(names):
+    """Why cleaned `names` can't go on one story, or None if they can."""
+    if len(names) > MAX_TAGS_PER_STORY:
+        return f"A story cannot have more than {MAX_TAGS_PER_STORY} tags."
+    if any(len(name) > MAX_TAG_LENGTH for name in names):
+        return f"Tags cannot exceed {MAX_TAG_LENGTH} characters."
+    return None
+
+
+#-----------------NAME -> ID CACHE--------------------------------
+# Tag ids only ever need resolving by name, and names are few and hot, so the
+# name -> id map lives in the default cache for TAG_ID_CACHE_TTL seconds.
+# Unknown names cost one SELECT ... IN, plus one INSERT ... ON CONFLICT DO
+# NOTHING and one more SELECT for the ones that don't exist yet; the race
+# between two writers creating the same tag is settled by the unique index.
+# stories.signals drops a tag's entry when it is renamed or deleted. Every
+# worker must see that, so with a per-process LocMemCache the map is only used
+# when TAG_ID_CACHE_ENABLED says so explicitly.
+
+def _enabled():
+    enabled = getattr(settings, 'TAG_ID_CACHE_ENABLED', None)
+    if enabled is None:
+        return not isinstance(caches['default'], LocMemCache)
+    return enabled
+
+
+def _key(name):
+    # Names may contain spaces and non-ASCII letters, which memcached keys can't
+    return "tags:id:" + hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()
+
+
+def resolve_tag_ids(names):
+    """{name: id} for already-normalized `names`, creating the missing tags."""
+    names = set(names)
+    found = {}
+    if _enabled() and names:
+        cached = cache.get_many([_key(name) for name in names])
+        found = {name: cached[_key(name)] for name in names if _key(name) in cached}
+
+    missing = names - found.keys()
+    if missing:
+        fetched = dict(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        new = missing - fetched.keys()
+        if new:
+            Tag.objects.bulk_create([Tag(name=name) for name in sorted(new)], ignore_conflicts=True)
+            fetched.update(Tag.objects.filter(name__in=new).values_list('name', 'id'))
+        found.update(fetched)
+        if _enabled():
+            # Tags created by a transaction that rolls back must not be remembered
+            transaction.on_commit(lambda: _remember(fetched))
+    return found
+
+
+def _remember(tag_ids):
+    ttl = getattr(settings, 'TAG_ID_CACHE_TTL', 3600)
+    cache.set_many({_key(name): pk for name, pk in tag_ids.items()}, ttl)
+
+
+def forget_tag_ids(*names):
+    cache.delete_many([_key(name) for name in names if name])
@@ -1,8 +1,27 @@
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from django.utils import timezone
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
-from users.models import CustomUser
-from .models import Story, Chapter, Comment, Notification, Tag
+from users.models import CustomUser, Follow
+from .models import Story, Chapter, Comment, Notification, Tag, FeedItem
+from .fanout import run_fanout
+from .notifications import compact_unread_notifications, get_unread_count
+from .serializers import StorySerializer
+from .search import _documents, get_search_backend
+from .ranking import decay_trending_scores, recompute_trending_scores
+from .importer import import_stories
+from .response_cache import invalidate_responses, story_scope
+from .tags import resolve_tag_ids
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
@@ -11,8 +30,10 @@ def get_auth_headers(user):
     return {"HTTP_AUTHORIZATION": f"Bearer {refresh.access_token}"}
 
 
+@override_settings(AUTH_STATELESS_JWT=True)
 class StoryFlowTests(APITestCase):
     def setUp(self):
+        cache.clear()
         self.author = CustomUser.objects.create_user(username="author", password="pass123")
         self.reader = CustomUser.objects.create_user(username="reader", password="pass456")
 
@@ -36,7 +57,37 @@ class StoryFlowTests(APITestCase):
     def test_story_list(self):
         res = self.client.get(reverse("story-list-create"))
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(len(res.data) >= 1)
+        self.assertTrue(len(res.data["results"]) >= 1)
+
+    def test_story_list_cursor_pagination(self):
+        for i in range(4):
+            Story.objects.create(
+                title=f"Paged {i}", synopsis="s", genre="Fantasy",
+                status="Ongoing", author=self.author,
+            )
+        self.story.likes.add(self.reader)
+
+        seen = []
+        url = reverse("story-list-create") + "?page_size=2"
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertLessEqual(len(res.data["results"]), 2)
+            seen.extend(s["id"] for s in res.data["results"])
+            url = res.data["next"]
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+        res = self.client.get(reverse("story-list-create") + "?page_size=10")
+        liked = next(s for s in res.data["results"] if s["id"] == self.story.id)
+        self.assertEqual(liked["likes_count"], 1)
+        self.assertEqual(liked["bookmarks_count"], 0)
+
+    def test_story_list_invalid_cursor(self):
+        res = self.client.get(reverse("story-list-create") + "?cursor=not-a-cursor")
+        self.assertEqual(res.status_code, 404)
 
     def test_create_story_authenticated(self):
         self.client.credentials(**get_auth_headers(self.author))
@@ -68,6 +119,23 @@ class StoryFlowTests(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(res.data["title"], self.story.title)
 
+    def test_story_detail_has_toc_and_comment_count_only(self):
+        Chapter.objects.create(story=self.story, title="Draft", chapter_no=2, content="not yet", is_published=False)
+        Comment.objects.create(story=self.story, user=self.reader, content="Lovely")
+        # ETag validator, story, chapters, tags (no bookmarker list any more)
+        with self.assertNumQueries(4):
+            res = self.client.get(reverse("story-detail", args=[self.story.id]))
+        self.assertEqual(res.data["comments_count"], 1)
+        self.assertNotIn("comments", res.data)
+        self.assertEqual(res.data["chapters"], [{
+            "id": self.chapter.id, "chapter_no": 1, "title": "Chapter 1", "word_count": 4,
+            "is_published": True, "created_at": res.data["chapters"][0]["created_at"],
+        }])
+
+        self.client.credentials(**get_auth_headers(self.author))
+        res = self.client.get(reverse("story-detail", args=[self.story.id]))
+        self.assertEqual([c["chapter_no"] for c in res.data["chapters"]], [1, 2])
+
     def test_story_update_by_author(self):
         self.client.credentials(**get_auth_headers(self.author))
         res = self.client.put(reverse("story-detail", args=[self.story.id]), {
@@ -81,6 +149,19 @@ class StoryFlowTests(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(res.data["title"], "Updated Title")
 
+    def test_story_update_keeps_counters_that_moved_meanwhile(self):
+        story = Story.objects.get(pk=self.story.pk)
+        # A like, comment and trending bump land while the edit is in flight
+        Story.objects.filter(pk=story.pk).update(likes_count=5, comments_count=2, trending_score=4.0)
+
+        serializer = StorySerializer(story, data={"synopsis": "Edited"}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        story.refresh_from_db()
+        self.assertEqual(story.synopsis, "Edited")
+        self.assertEqual((story.likes_count, story.comments_count, story.trending_score), (5, 2, 4.0))
+
     def test_story_update_by_other_user(self):
         self.client.credentials(**get_auth_headers(self.reader))
         res = self.client.put(reverse("story-detail", args=[self.story.id]), {
@@ -99,16 +180,48 @@ class StoryFlowTests(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(res.data["action"], "liked")
 
+        self.assertEqual(res.data["likes_count"], 1)
+
         res = self.client.post(reverse("story-like", args=[self.story.id]))
         self.assertEqual(res.data["action"], "disliked")
+        self.assertEqual(res.data["likes_count"], 0)
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.likes_count, 0)
 
     def test_bookmark_toggle(self):
         self.client.credentials(**get_auth_headers(self.reader))
         res = self.client.post(reverse("story-bookmark", args=[self.story.id]))
         self.assertEqual(res.data["action"], "bookmarked")
 
+        self.assertEqual(res.data["bookmarks_count"], 1)
+
         res = self.client.post(reverse("story-bookmark", args=[self.story.id]))
         self.assertEqual(res.data["action"], "unmarked")
+        self.assertEqual(res.data["bookmarks_count"], 0)
+
+    def test_engagement_counters_follow_m2m_writes(self):
+        self.story.likes.add(self.reader, self.author)
+        self.story.bookmarks.add(self.reader)
+        self.assertEqual(self.story.likes_count, 2)
+        self.assertEqual(self.story.bookmarks_count, 1)
+
+        self.story.likes.remove(self.author)
+        self.reader.bookmarked_stories.remove(self.story)
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.likes_count, 1)
+        self.assertEqual(self.story.bookmarks_count, 0)
+
+    def test_reconcile_story_counters(self):
+        self.story.likes.add(self.reader)
+        Story.objects.filter(pk=self.story.pk).update(likes_count=7, bookmarks_count=3)
+
+        out = StringIO()
+        call_command("reconcile_story_counters", stdout=out)
+        self.assertIn("Repaired 1", out.getvalue())
+
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.likes_count, 1)
+        self.assertEqual(self.story.bookmarks_count, 0)
 
     def test_comment_on_story(self):
         self.client.credentials(**get_auth_headers(self.reader))
@@ -119,6 +232,42 @@ class StoryFlowTests(APITestCase):
         self.assertEqual(res.status_code, 201)
         self.assertEqual(Comment.objects.count(), 1)
 
+    def test_comment_thread_keyset_pages(self):
+        users = [CustomUser.objects.create_user(username=f"c{i}", password="pass") for i in range(4)]
+        comments = [Comment.objects.create(story=self.story, user=user, content=f"#{i}") for i, user in enumerate(users * 3)]
+        url = reverse("story-comments", args=[self.story.id])
+
+        seen = []
+        while url:
+            # story lookup + one page with its users joined in
+            with self.assertNumQueries(2):
+                res = self.client.get(url)
+            self.assertNotIn("count", res.data)
+            seen.extend(c["content"] for c in res.data["results"])
+            url = res.data["next"]
+        # Newest first, even though all were written within the same day
+        self.assertEqual(seen, [c.content for c in reversed(comments)])
+        self.assertEqual(res.data["results"][-1]["user"], "c0")
+
+    def test_comments_count_follows_comment_rows(self):
+        comment = Comment.objects.create(story=self.story, user=self.reader, content="one")
+        Comment.objects.create(story=self.story, user=self.author, content="two")
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.comments_count, 2)
+        comment.delete()
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.comments_count, 1)
+
+        res = self.client.get(reverse("story-list-create"))
+        self.assertEqual(res.data["results"][0]["comments_count"], 1)
+
+        Story.objects.filter(pk=self.story.pk).update(comments_count=7)
+        out = StringIO()
+        call_command("reconcile_story_counters", stdout=out)
+        self.assertIn("Repaired 1", out.getvalue())
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.comments_count, 1)
+
     def test_get_chapters_public_user(self):
         self.client.credentials(**get_auth_headers(self.reader))
         url = reverse("chapter-list-create", args=[self.story.id])
@@ -196,7 +345,857 @@ class StoryFlowTests(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertTrue(res.data["is_read"])
 
+        res = self.client.get(reverse("notification-list"))
+        self.assertEqual(res.data["unread_count"], 0)
+
+        res = self.client.post(reverse("notification-toggle-read", args=[notify_id + 100]))
+        self.assertEqual(res.status_code, 404)
+
+    def test_notification_inbox_pagination_and_mark_read(self):
+        notes = [Notification.objects.create(user=self.reader, message=f"n{i}") for i in range(5)]
+        Notification.objects.create(user=self.author, message="not mine")
+        self.client.credentials(**get_auth_headers(self.reader))
+
+        res = self.client.get(reverse("notification-list") + "?page_size=3")
+        self.assertEqual(len(res.data["notifications"]), 3)
+        self.assertEqual(res.data["unread_count"], 5)
+        res = self.client.get(res.data["next"])
+        self.assertEqual(len(res.data["notifications"]), 2)
+        self.assertIsNone(res.data["next"])
+
+        res = self.client.post(reverse("notification-mark-read"), {"up_to": notes[1].id}, format="json")
+        self.assertEqual(res.data["updated"], 2)
+        self.assertEqual(res.data["unread_count"], 3)
+
+        # The user row (writes always verify the account) and a single UPDATE
+        with self.assertNumQueries(2):
+            res = self.client.post(reverse("notification-mark-read"), {}, format="json")
+        self.assertEqual(res.data["updated"], 3)
+        self.assertEqual(res.data["unread_count"], 0)
+        self.assertFalse(Notification.objects.filter(user=self.author, is_read=True).exists())
+
+    def test_unread_count_racing_a_new_notification_is_not_cached(self):
+        real_filter = Notification.objects.filter
+
+        def notification_lands_mid_count(*args, **kwargs):
+            count = real_filter(*args, **kwargs).count()
+            with self.captureOnCommitCallbacks(execute=True):
+                Notification.objects.create(user=self.reader, message="late")
+            return mock.Mock(count=lambda: count)
+
+        with mock.patch.object(Notification.objects, "filter", side_effect=notification_lands_mid_count):
+            self.assertEqual(get_unread_count(self.reader.id), 0)
+        self.assertEqual(get_unread_count(self.reader.id), 1)
+
     def test_user_stories_by_username(self):
         res = self.client.get(reverse("user-stories", args=["author"]))
         self.assertEqual(res.status_code, 200)
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data), 1)
+
+@override_settings(NOTIFICATION_FANOUT_ASYNC=False, NOTIFICATION_FANOUT_CHUNK_SIZE=2)
+class NotificationFanoutTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.followers = [
+            CustomUser.objects.create_user(username=f"fan{i}", password="pass123")
+            for i in range(5)
+        ]
+        for fan in self.followers:
+            Follow.objects.create(follower=fan, following=self.author)
+        Notification.objects.all().delete()
+
+    def test_story_create_fans_out_after_commit_in_chunks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            story = Story.objects.create(
+                title="Fan-out Story", synopsis="s", genre="Fantasy",
+                status="Ongoing", author=self.author,
+            )
+
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(
+            set(Notification.objects.values_list("user_id", flat=True)),
+            {fan.id for fan in self.followers},
+        )
+        self.assertFalse(Notification.objects.filter(user=self.author).exists())
+        self.assertTrue(all(n.url == f"/explore/{story.id}/" for n in Notification.objects.all()))
+
+    def test_nothing_is_written_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Story.objects.create(
+                title="Pending Story", synopsis="s", genre="Fantasy",
+                status="Ongoing", author=self.author,
+            )
+        self.assertTrue(callbacks)
+        self.assertEqual(Notification.objects.count(), 0)
+
+    def test_run_fanout_reports_stage_throughput(self):
+        stats = run_fanout(CustomUser.objects.exclude(id=self.author.id), "hello", "/x/")
+        report = stats.as_dict()
+        self.assertEqual(report["insert"]["items"], 5)
+        self.assertEqual(report["push"]["items"], 5)
+        self.assertEqual(Notification.objects.filter(message="hello").count(), 5)
+
+
+@override_settings(NOTIFICATION_FANOUT_ASYNC=False)
+class ChapterPublishTransitionTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.reader = CustomUser.objects.create_user(username="reader", password="pass456")
+        self.story = Story.objects.create(
+            title="Serial", synopsis="s", genre="Fantasy",
+            status="Ongoing", author=self.author,
+        )
+        self.story.bookmarks.add(self.reader, self.author)
+        self.chapter = Chapter.objects.create(
+            story=self.story, title="Draft", chapter_no=1, content="...", is_published=False,
+        )
+
+    def publish(self, chapter):
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.is_published = True
+            chapter.save()
+
+    def test_publish_transition_notifies_bookmarkers_once(self):
+        self.publish(self.chapter)
+        self.assertEqual(Notification.objects.filter(user=self.reader).count(), 1)
+        self.assertFalse(Notification.objects.filter(user=self.author).exists())
+
+        # Saving an already-published chapter again is not a transition.
+        self.publish(self.chapter)
+        self.publish(Chapter.objects.get(pk=self.chapter.pk))
+        self.assertEqual(Notification.objects.filter(user=self.reader).count(), 1)
+
+    def test_save_does_not_reread_the_chapter(self):
+        chapter = Chapter.objects.get(pk=self.chapter.pk)
+        chapter.title = "Renamed"
+        with self.assertNumQueries(1):
+            chapter.save()
+
+    def test_view_publish_notifies(self):
+        self.client.credentials(**get_auth_headers(self.author))
+        url = reverse("chapter-detail", args=[self.story.id, 1])
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.put(url, {"title": "Live", "chapter_no": 1, "is_published": True}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Notification.objects.filter(user=self.reader).count(), 1)
+
+
+class NotificationRetentionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.reader = CustomUser.objects.create_user(username="reader", password="pass456")
+        self.story = Story.objects.create(
+            title="Long Serial", synopsis="s", genre="Fantasy",
+            status="Ongoing", author=self.author,
+        )
+
+    def test_prune_and_compact(self):
+        old = Notification.objects.create(user=self.reader, message="old", is_read=True)
+        Notification.objects.filter(pk=old.pk).update(created_at=date.today() - timedelta(days=200))
+        recent_read = Notification.objects.create(user=self.reader, message="recent", is_read=True)
+        url = f"/explore/{self.story.id}/"
+        for i in range(4):
+            Notification.objects.create(user=self.reader, message=f"New chapter {i}", url=url)
+        other = Notification.objects.create(user=self.reader, message="followed", url="/community/1/")
+
+        out = StringIO()
+        call_command("prune_notifications", "--days", "90", "--batch-size", "2", stdout=out)
+        self.assertIn("Pruned 1", out.getvalue())
+        self.assertIn("collapsed 3", out.getvalue())
+
+        self.assertFalse(Notification.objects.filter(pk=old.pk).exists())
+        self.assertTrue(Notification.objects.filter(pk=recent_read.pk).exists())
+        self.assertTrue(Notification.objects.filter(pk=other.pk).exists())
+        collapsed = Notification.objects.get(url=url)
+        self.assertEqual(collapsed.message, "4 new updates in 'Long Serial'")
+
+    def test_compacting_again_adds_to_the_summary(self):
+        url = f"/explore/{self.story.id}/"
+        for i in range(4):
+            Notification.objects.create(user=self.reader, message=f"New chapter {i}", url=url)
+            Notification.objects.create(user=self.reader, message="Someone followed you", url=None)
+        compact_unread_notifications()
+
+        Notification.objects.create(user=self.reader, message="New chapter 4", url=url)
+        Notification.objects.create(user=self.reader, message="Someone followed you", url=None)
+        # one GROUP BY, titles, latest messages, bulk UPDATE, DELETE (+ savepoint),
+        # then the empty GROUP BY that ends the loop
+        with self.assertNumQueries(8):
+            self.assertEqual(compact_unread_notifications(), 2)
+
+        summary = Notification.objects.get(url=url)
+        self.assertEqual((summary.message, summary.group_size), ("5 new updates in 'Long Serial'", 5))
+        self.assertEqual(Notification.objects.get(url=None).message, "Someone followed you (+4 more)")
+
+
+@override_settings(NOTIFICATION_FANOUT_ASYNC=False, AUTH_STATELESS_JWT=True)
+class FollowingFeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = CustomUser.objects.create_user(username="reader", password="pass123")
+        self.followed = CustomUser.objects.create_user(username="followed", password="pass123")
+        self.stranger = CustomUser.objects.create_user(username="stranger", password="pass123")
+        Follow.objects.create(follower=self.reader, following=self.followed)
+        self.client.credentials(**get_auth_headers(self.reader))
+
+    def make_story(self, author, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Story.objects.create(title=title, synopsis="s", genre="Fantasy", status="Ongoing", author=author)
+
+    def feed(self, **params):
+        res = self.client.get(reverse("following-feed"), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_feed_merges_stories_and_published_chapters_of_followed_authors(self):
+        story = self.make_story(self.followed, "Followed Tale")
+        self.make_story(self.stranger, "Stranger Tale")
+        draft = Chapter.objects.create(story=story, title="One", chapter_no=1, content="...", is_published=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.is_published = True
+            draft.save()
+
+        results = self.feed()["results"]
+        self.assertEqual([item["kind"] for item in results], ["chapter", "story"])
+        self.assertEqual(results[0]["chapter"], {"chapter_no": 1, "title": "One"})
+        self.assertEqual(results[1]["story"]["title"], "Followed Tale")
+        self.assertEqual(results[1]["author"], "followed")
+
+    def test_unpublishing_removes_the_chapter_entry(self):
+        story = self.make_story(self.followed, "Tale")
+        chapter = Chapter.objects.create(story=story, title="One", chapter_no=1, content="...", is_published=True)
+        self.assertTrue(FeedItem.objects.filter(chapter=chapter).exists())
+        chapter.is_published = False
+        chapter.save()
+        self.assertFalse(FeedItem.objects.filter(chapter=chapter).exists())
+
+    def test_keyset_pagination(self):
+        for i in range(5):
+            self.make_story(self.followed, f"Tale {i}")
+        first = self.feed(page_size=3)
+        second = self.feed(page_size=3, cursor=first["next_cursor"])
+        titles = [item["story"]["title"] for item in first["results"] + second["results"]]
+        self.assertEqual(titles, [f"Tale {i}" for i in reversed(range(5))])
+        self.assertIsNone(second["next_cursor"])
+
+    @override_settings(FEED_CACHE_MIN_READS=1)
+    def test_heavy_reader_pages_come_from_cache_and_are_invalidated(self):
+        for i in range(3):
+            self.make_story(self.followed, f"Tale {i}")
+        self.feed()  # builds the cached head
+
+        # Cached head: no merge query over FeedItem, only the by-id fetch + tags
+        with self.assertNumQueries(2):
+            results = self.feed()["results"]
+        self.assertEqual(len(results), 3)
+
+        self.make_story(self.followed, "Fresh")
+        self.assertEqual(self.feed()["results"][0]["story"]["title"], "Fresh")
+
+        # Following someone new drops the cached head too
+        Follow.objects.create(follower=self.reader, following=self.stranger)
+        self.make_story(self.stranger, "Stranger Tale")
+        self.assertEqual(self.feed()["results"][0]["story"]["title"], "Stranger Tale")
+
+    @override_settings(FEED_CACHE_MIN_READS=1, FEED_CACHE_SIZE=2)
+    def test_paging_past_the_cached_head_falls_back_to_the_database(self):
+        for i in range(5):
+            self.make_story(self.followed, f"Tale {i}")
+        titles, cursor = [], None
+        while True:
+            data = self.feed(page_size=2, **({"cursor": cursor} if cursor else {}))
+            titles += [item["story"]["title"] for item in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(titles, [f"Tale {i}" for i in reversed(range(5))])
+
+
+@override_settings(NOTIFICATION_FANOUT_ASYNC=False)
+class StorySearchTests(APITestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dragon = Story.objects.create(
+                title="The Dragon Lord", synopsis="A tale of fire", genre="Fantasy", status="Ongoing", author=self.author,
+            )
+            self.space = Story.objects.create(
+                title="Void Runners", synopsis="Smugglers between stars, and one dragon", genre="Sci‑Fi",
+                status="Ongoing", author=self.author,
+            )
+            self.quiet = Story.objects.create(
+                title="Quiet Harbour", synopsis="Nothing happens", genre="Other", status="Ongoing", author=self.author,
+            )
+
+    def search(self, q, **params):
+        res = self.client.get(reverse("story-search"), {"q": q, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [story["title"] for story in res.data["results"]]
+
+    def test_ranked_and_prefix_matching(self):
+        # Title hits outrank synopsis hits; "drag" matches as a prefix.
+        self.assertEqual(self.search("drag"), ["The Dragon Lord", "Void Runners"])
+        self.assertEqual(self.search("dragon fire"), ["The Dragon Lord"])
+        self.assertEqual(self.search(""), [])
+
+    def test_tags_and_published_chapters_are_indexed_incrementally(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create(name="seafaring")
+            self.quiet.tags.add(tag)
+            Chapter.objects.create(story=self.quiet, title="One", chapter_no=1, content="a lighthouse keeper", is_published=True)
+            Chapter.objects.create(story=self.quiet, title="Two", chapter_no=2, content="secret kraken", is_published=False)
+        self.assertEqual(self.search("seafaring"), ["Quiet Harbour"])
+        self.assertEqual(self.search("lighthouse"), ["Quiet Harbour"])
+        self.assertEqual(self.search("kraken"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiet.title = "Loud Harbour"
+            self.quiet.save()
+        self.assertEqual(self.search("loud"), ["Loud Harbour"])
+        self.assertEqual(self.search("quiet"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiet.delete()
+        self.assertEqual(self.search("harbour"), [])
+
+    def test_pagination(self):
+        res = self.client.get(reverse("story-search"), {"q": "dragon", "page_size": 1})
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertIsNotNone(res.data["next"])
+        res = self.client.get(reverse("story-search"), {"q": "dragon", "page_size": 1, "page": 2})
+        self.assertIsNone(res.data["next"])
+
+    @override_settings(NOTIFICATION_FANOUT_ASYNC=False)
+    def test_one_request_indexes_the_story_once(self):
+        self.client.credentials(**get_auth_headers(self.author))
+        with mock.patch("stories.search.SQLiteSearchBackend.index") as index, \
+                self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(reverse("story-list-create"), {
+                "title": "Tagged", "synopsis": "s", "genre": "Other", "status": "Ongoing", "tags": ["a", "b"],
+            }, format="json")
+        self.assertEqual(res.status_code, 201)
+        index.assert_called_once_with([res.data["id"]])
+
+    def test_draft_autosaves_skip_the_reindex(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = Chapter.objects.create(story=self.quiet, title="One", chapter_no=1, content="draft")
+        with mock.patch("stories.search.SQLiteSearchBackend.index") as index, \
+                self.captureOnCommitCallbacks(execute=True):
+            draft.content = "still a draft"
+            draft.save()
+        index.assert_not_called()
+
+        with mock.patch("stories.search.SQLiteSearchBackend.index") as index, \
+                self.captureOnCommitCallbacks(execute=True):
+            draft.is_published = True
+            draft.save()
+            # Further edits of the now-published chapter share the same batch
+            draft.content = "published"
+            draft.save()
+        index.assert_called_once_with([self.quiet.id])
+
+    def test_rolled_back_reindex_does_not_block_the_next_one(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.quiet.save()
+                raise RuntimeError
+        with mock.patch("stories.search.SQLiteSearchBackend.index") as index, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.quiet.save()
+        index.assert_called_once_with([self.quiet.id])
+
+    def test_chapter_text_is_capped_in_the_query(self):
+        Chapter.objects.create(story=self.quiet, title="One", chapter_no=1, content="calm " * 100, is_published=True)
+        with mock.patch("stories.search.MAX_CHAPTER_CHARS", 12), self.assertNumQueries(3) as queries:
+            docs = _documents([self.quiet.id])
+        self.assertEqual(docs[self.quiet.id][3], "calm calm ca")
+        self.assertIn("SUBSTR", queries.captured_queries[-1]["sql"].upper())
+
+    def test_rebuild_command(self):
+        get_search_backend().clear()
+        self.assertEqual(self.search("dragon"), [])
+        out = StringIO()
+        call_command("rebuild_search_index", batch_size=2, stdout=out)
+        self.assertIn("Indexed 3 stories", out.getvalue())
+        self.assertEqual(self.search("dragon"), ["The Dragon Lord", "Void Runners"])
+
+
+class StoryCatalogFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="pass123")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pass123")
+        magic, dragons, space = (Tag.objects.create(name=name) for name in ("magic", "dragons", "space"))
+
+        self.wyrm = Story.objects.create(title="Wyrm", synopsis="s", genre="Fantasy", status="Ongoing", author=self.alice)
+        self.wyrm.tags.add(magic, dragons)
+        self.spell = Story.objects.create(
+            title="Spellbook", synopsis="s", genre="Fantasy", status="Completed", author=self.bob, is_serialized=True,
+        )
+        self.spell.tags.add(magic)
+        self.orbit = Story.objects.create(title="Orbit", synopsis="s", genre="Sci‑Fi", status="Ongoing", author=self.bob)
+        self.orbit.tags.add(space)
+        Story.objects.filter(pk=self.orbit.pk).update(created_at=date.today() - timedelta(days=30))
+
+    def titles(self, **params):
+        res = self.client.get(reverse("story-list-create"), params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(story["title"] for story in res.data["results"])
+
+    def test_filters(self):
+        self.assertEqual(self.titles(genre="Fantasy"), ["Spellbook", "Wyrm"])
+        self.assertEqual(self.titles(genre=["Fantasy", "Sci‑Fi"], status="Ongoing"), ["Orbit", "Wyrm"])
+        self.assertEqual(self.titles(author="bob"), ["Orbit", "Spellbook"])
+        self.assertEqual(self.titles(is_serialized="true"), ["Spellbook"])
+        self.assertEqual(self.titles(created_before=(date.today() - timedelta(days=1)).isoformat()), ["Orbit"])
+        self.assertEqual(self.titles(created_after=date.today().isoformat()), ["Spellbook", "Wyrm"])
+
+    def test_tag_any_and_all(self):
+        self.assertEqual(self.titles(tag=["dragons", "space"]), ["Orbit", "Wyrm"])
+        self.assertEqual(self.titles(tag=["magic", "dragons"], tag_mode="all"), ["Wyrm"])
+        self.assertEqual(self.titles(tag="magic", tag_mode="all"), ["Spellbook", "Wyrm"])
+
+    def test_invalid_filters(self):
+        for params in ({"genre": "Western"}, {"tag_mode": "some"}, {"is_serialized": "maybe"}, {"created_after": "yesterday"}):
+            res = self.client.get(reverse("story-list-create"), params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_facets_ignore_their_own_dimension(self):
+        res = self.client.get(reverse("story-list-create"), {"genre": "Fantasy", "status": "Ongoing"})
+        facets = res.data["facets"]
+        # Genre counts are narrowed by status only, status counts by genre only
+        self.assertEqual(facets["genre"], {"Fantasy": 1, "Sci‑Fi": 1})
+        self.assertEqual(facets["status"], {"Ongoing": 1, "Completed": 1})
+        self.assertEqual(facets["tags"], [{"name": "dragons", "count": 1}, {"name": "magic", "count": 1}])
+
+    def test_facets_are_grouped_queries_on_first_page_only(self):
+        # page, prefetched tags, then one GROUP BY per facet
+        with self.assertNumQueries(5):
+            res = self.client.get(reverse("story-list-create"), {"page_size": 1})
+        self.assertEqual(res.data["facets"]["tags"][0], {"name": "magic", "count": 2})
+        with self.assertNumQueries(2):
+            res = self.client.get(res.data["next"])
+        self.assertNotIn("facets", res.data)
+
+
+class StoryRankingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.reader = CustomUser.objects.create_user(username="reader", password="pass456")
+        self.quiet = Story.objects.create(title="Quiet", synopsis="s", genre="Other", status="Ongoing", author=self.author)
+        self.loud = Story.objects.create(title="Loud", synopsis="s", genre="Other", status="Ongoing", author=self.author)
+
+    def score(self, story):
+        story.refresh_from_db(fields=["trending_score"])
+        return story.trending_score
+
+    def test_engagement_bumps_and_toggles_back(self):
+        self.client.credentials(**get_auth_headers(self.reader))
+        self.client.post(reverse("story-like", args=[self.loud.id]))
+        self.client.post(reverse("story-bookmark", args=[self.loud.id]))
+        self.assertEqual(self.score(self.loud), 3.0)
+        self.client.post(reverse("story-like", args=[self.loud.id]))
+        self.assertEqual(self.score(self.loud), 2.0)
+
+        Comment.objects.create(story=self.quiet, user=self.reader, content="nice")
+        chapter = Chapter.objects.create(story=self.quiet, title="One", chapter_no=1, content="x")
+        self.assertEqual(self.score(self.quiet), 3.0)
+        chapter.is_published = True
+        chapter.save()
+        self.assertEqual(self.score(self.quiet), 8.0)
+
+        # Writers other than the toggle views go through m2m_changed
+        self.reader.liked_stories.add(self.quiet)
+        self.assertEqual(self.score(self.quiet), 9.0)
+
+    def test_decay_halves_scores_per_half_life(self):
+        Story.objects.filter(pk=self.loud.pk).update(trending_score=8.0)
+        Story.objects.filter(pk=self.quiet.pk).update(trending_score=0.005)
+        now = timezone.now()
+        self.assertEqual(decay_trending_scores(now), 2)
+        self.assertEqual(self.score(self.loud), 8.0)
+        self.assertEqual(self.score(self.quiet), 0)
+
+        with self.assertNumQueries(4):
+            decay_trending_scores(now + timedelta(hours=144))
+        self.assertAlmostEqual(self.score(self.loud), 2.0)
+
+    def test_revived_story_is_not_decayed_from_its_old_stamp(self):
+        now = timezone.now()
+        Story.objects.filter(pk=self.quiet.pk).update(trending_score=0.005, trending_at=now)
+        decay_trending_scores(now)
+        self.assertEqual(self.score(self.quiet), 0)
+
+        # A month later the story gets a like; the next run must not age it a month
+        later = now + timedelta(days=30)
+        self.quiet.likes.add(self.reader)
+        decay_trending_scores(later)
+        decay_trending_scores(later + timedelta(hours=72))
+        self.assertAlmostEqual(self.score(self.quiet), 0.5)
+
+    def test_recompute_rebuilds_scores_from_engagement(self):
+        self.loud.likes.add(self.reader)
+        Comment.objects.create(story=self.loud, user=self.reader, content="nice")
+        # Drift the incremental path never repairs, and a story predating the column
+        Story.objects.filter(pk=self.loud.pk).update(trending_score=50.0)
+        Story.objects.filter(pk=self.quiet.pk).update(likes_count=2, trending_score=0)
+        now = timezone.now()
+
+        self.assertEqual(recompute_trending_scores(now), 2)
+        self.assertAlmostEqual(self.score(self.loud), 4.0, places=3)
+        self.assertAlmostEqual(self.score(self.quiet), 2.0, places=3)
+        # Aged from the last activity, like the decay job would have
+        recompute_trending_scores(now + timedelta(hours=72))
+        self.assertAlmostEqual(self.score(self.loud), 2.0, places=3)
+
+        out = StringIO()
+        call_command("decay_trending_scores", recompute=True, stdout=out)
+        self.assertIn("Recomputed trending scores", out.getvalue())
+
+    def test_shelves_are_cached_and_paginated(self):
+        self.loud.likes.add(self.reader)
+        res = self.client.get(reverse("story-trending"), {"page_size": 1})
+        self.assertEqual([s["title"] for s in res.data["results"]], ["Loud"])
+        self.assertIsNone(res.data["next"])
+
+        res = self.client.get(reverse("story-popular"), {"page_size": 1})
+        self.assertEqual([s["title"] for s in res.data["results"]], ["Loud"])
+        self.assertIsNotNone(res.data["next"])
+        res = self.client.get(res.data["next"])
+        self.assertEqual([s["title"] for s in res.data["results"]], ["Quiet"])
+
+        # Snapshot served from cache: page of stories + their tags only
+        self.quiet.likes.add(self.author)
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("story-trending"))
+        self.assertEqual([s["title"] for s in res.data["results"]], ["Loud"])
+
+        decay_trending_scores()
+        res = self.client.get(reverse("story-trending"))
+        self.assertEqual([s["title"] for s in res.data["results"]], ["Loud", "Quiet"])
+
+
+@override_settings(AUTH_STATELESS_JWT=True)
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.reader = CustomUser.objects.create_user(username="reader", password="pass456")
+        self.story = Story.objects.create(title="Tale", synopsis="s", genre="Other", status="Ongoing", author=self.author)
+        self.chapter = Chapter.objects.create(story=self.story, title="One", chapter_no=1, content="words", is_published=True)
+        self.url = reverse("story-detail", args=[self.story.id])
+
+    def assertFresh(self, url, etag):
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.headers["ETag"], etag)
+
+    def assertStale(self, url, etag):
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.headers["ETag"], etag)
+        return res.headers["ETag"]
+
+    def test_story_etag_tracks_edits_engagement_chapters_and_comments(self):
+        etag = self.client.get(self.url).headers["ETag"]
+        self.assertFresh(self.url, etag)
+
+        self.client.credentials(**get_auth_headers(self.reader))
+        self.client.post(reverse("story-like", args=[self.story.id]))
+        etag = self.assertStale(self.url, etag)
+        Comment.objects.create(story=self.story, user=self.reader, content="hi")
+        etag = self.assertStale(self.url, etag)
+        self.chapter.title = "Renamed"
+        self.chapter.save()
+        etag = self.assertStale(self.url, etag)
+        self.story.synopsis = "changed"
+        self.story.save()
+        etag = self.assertStale(self.url, etag)
+        self.assertFresh(self.url, etag)
+
+    def test_story_etag_tracks_the_viewers_bookmark_tags_and_author(self):
+        other = CustomUser.objects.create_user(username="other", password="pass789")
+        self.story.bookmarks.add(other)
+        self.client.credentials(**get_auth_headers(self.reader))
+        res = self.client.get(self.url)
+        self.assertFalse(res.data["is_bookmarked"])
+        self.assertNotIn("bookmarks", res.data)
+        etag = res.headers["ETag"]
+
+        # Same bookmarks_count, but this viewer's flag flipped
+        self.story.bookmarks.remove(other)
+        self.story.bookmarks.add(self.reader)
+        etag = self.assertStale(self.url, etag)
+        self.assertTrue(self.client.get(self.url).data["is_bookmarked"])
+
+        tag = Tag.objects.create(name="old")
+        self.story.tags.add(tag)
+        etag = self.assertStale(self.url, etag)
+        tag.name = "new"
+        tag.save()
+        etag = self.assertStale(self.url, etag)
+
+        self.author.username = "renamed"
+        self.author.save()
+        etag = self.assertStale(self.url, etag)
+        self.assertFresh(self.url, etag)
+
+    def test_author_and_reader_get_different_story_etags(self):
+        reader_etag = self.client.get(self.url).headers["ETag"]
+        self.client.credentials(**get_auth_headers(self.author))
+        self.assertStale(self.url, reader_etag)
+
+    def test_chapter_conditional_get(self):
+        url = reverse("chapter-detail", args=[self.story.id, 1])
+        res = self.client.get(url)
+        etag, last_modified = res.headers["ETag"], res.headers["Last-Modified"]
+        self.assertFresh(url, etag)
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.chapter.content = "new words"
+        self.chapter.save()
+        self.assertStale(url, etag)
+
+    def test_draft_chapter_is_still_private(self):
+        self.chapter.is_published = False
+        self.chapter.save()
+        url = reverse("chapter-detail", args=[self.story.id, 1])
+        self.client.credentials(**get_auth_headers(self.author))
+        etag = self.client.get(url).headers["ETag"]
+        self.client.credentials(**get_auth_headers(self.reader))
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(AUTH_STATELESS_JWT=True)
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        caches["local"].clear()
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.reader = CustomUser.objects.create_user(username="reader", password="pass456")
+        self.story = Story.objects.create(title="Tale", synopsis="s", genre="Other", status="Ongoing", author=self.author)
+        Chapter.objects.create(story=self.story, title="One", chapter_no=1, content="words", is_published=True)
+        self.detail = reverse("story-detail", args=[self.story.id])
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        for url in (reverse("story-list-create"), reverse("chapter-list-create", args=[self.story.id]),
+                    reverse("user-stories", args=["author"])):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                again = self.client.get(url)
+            self.assertEqual(again.data, first.data)
+
+        # Detail still runs its ETag query, but not the story/prefetch queries
+        self.client.get(self.detail)
+        with self.assertNumQueries(1):
+            self.client.get(self.detail)
+
+    def test_query_params_and_viewer_class_are_part_of_the_key(self):
+        self.client.get(reverse("story-list-create"))
+        with self.assertNumQueries(5):
+            self.client.get(reverse("story-list-create"), {"genre": "Other"})
+        # Per-viewer pages are never cached for signed-in users (authors see drafts)
+        self.client.credentials(**get_auth_headers(self.author))
+        self.client.get(self.detail)
+        # ETag row, story (with the viewer's bookmark flag), chapters, tags
+        with self.assertNumQueries(4):
+            self.client.get(self.detail)
+
+    def test_signals_invalidate_only_affected_scopes(self):
+        other = Story.objects.create(title="Other", synopsis="s", genre="Other", status="Ongoing", author=self.author)
+        other_detail = reverse("story-detail", args=[other.id])
+        self.client.get(self.detail)
+        self.client.get(other_detail)
+
+        Comment.objects.create(story=self.story, user=self.reader, content="hi")
+        self.assertEqual(self.client.get(self.detail).data["comments_count"], 1)
+        with self.assertNumQueries(1):
+            self.client.get(other_detail)
+
+        Chapter.objects.create(story=self.story, title="Two", chapter_no=2, content="more", is_published=True)
+        res = self.client.get(reverse("chapter-list-create", args=[self.story.id]))
+        self.assertEqual(len(res.data), 2)
+
+        self.client.get(reverse("story-list-create"))
+        self.client.credentials(**get_auth_headers(self.reader))
+        self.client.post(reverse("story-like", args=[self.story.id]))
+        self.client.credentials()
+        res = self.client.get(reverse("story-list-create"))
+        liked = next(s for s in res.data["results"] if s["id"] == self.story.id)
+        self.assertEqual(liked["likes_count"], 1)
+
+        tag = Tag.objects.create(name="old")
+        self.story.tags.add(tag)
+        self.assertEqual(self.client.get(self.detail).data["tags"], ["old"])
+        tag.name = "new"
+        tag.save()
+        self.assertEqual(self.client.get(self.detail).data["tags"], ["new"])
+
+    def test_engagement_only_drops_the_pages_showing_the_story(self):
+        other_author = CustomUser.objects.create_user(username="other", password="pass789")
+        Story.objects.create(title="Elsewhere", synopsis="s", genre="Other", status="Ongoing", author=other_author)
+        catalog, mine, theirs = (
+            reverse("story-list-create"), reverse("user-stories", args=["author"]), reverse("user-stories", args=["other"]),
+        )
+        for url in (catalog, mine, theirs):
+            self.client.get(url)
+
+        self.client.credentials(**get_auth_headers(self.reader))
+        with mock.patch("stories.views.invalidate_responses", wraps=invalidate_responses) as bumped:
+            self.client.post(reverse("story-like", args=[self.story.id]))
+        bumped.assert_called_once_with(story_scope(self.story.id))
+        self.client.credentials()
+
+        # The other author's page only re-checks its story versions
+        with self.assertNumQueries(0):
+            self.client.get(theirs)
+        liked = next(s for s in self.client.get(catalog).data["results"] if s["id"] == self.story.id)
+        self.assertEqual(liked["likes_count"], 1)
+        self.assertEqual(self.client.get(mine).data[0]["likes_count"], 1)
+
+        Comment.objects.create(story=self.story, user=self.reader, content="hi")
+        self.assertEqual(self.client.get(mine).data[0]["comments_count"], 1)
+
+    def test_single_flight_waits_for_the_rebuild(self):
+        url = reverse("user-stories", args=["author"])
+        cached = [{"title": "from the other builder"}]
+        with mock.patch("stories.response_cache.cache.add", return_value=False), \
+             mock.patch("stories.response_cache._get", side_effect=[None, None, {"data": cached, "items": {}}]), \
+             mock.patch("stories.response_cache.time.sleep"):
+            with self.assertNumQueries(0):
+                res = self.client.get(url)
+        self.assertEqual(res.data, cached)
+
+    @override_settings(RESPONSE_CACHE_LOCK_WAIT=0)
+    def test_single_flight_falls_back_to_building(self):
+        url = reverse("user-stories", args=["author"])
+        with mock.patch("stories.response_cache.cache.add", return_value=False):
+            res = self.client.get(url)
+        self.assertEqual([s["title"] for s in res.data], ["Tale"])
+
+
+class StoryTagTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = CustomUser.objects.create_user(username="author", password="pass123")
+        self.story = Story.objects.create(title="Tale", synopsis="s", genre="Other", status="Ongoing", author=self.author)
+        self.detail = reverse("story-detail", args=[self.story.id])
+        self.client.credentials(**get_auth_headers(self.author))
+
+    def tags_of(self, story):
+        return sorted(story.tags.values_list("name", flat=True))
+
+    def test_tags_are_normalized_and_deduplicated(self):
+        Tag.objects.create(name="Magic")
+        res = self.client.put(self.detail, {"tags": [" MAGIC", "magic", "Space   Opera", ""]}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(sorted(res.data["tags"]), ["magic", "space opera"])
+        self.assertEqual(sorted(Tag.objects.values_list("name", flat=True)), ["magic", "space opera"])
+
+    @override_settings(TAG_ID_CACHE_ENABLED=True)
+    def test_resolving_names_is_two_selects_and_one_insert_then_cached(self):
+        Tag.objects.create(name="old")
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(3):
+                ids = resolve_tag_ids(["old", "new", "newer"])
+        self.assertEqual(set(ids), {"old", "new", "newer"})
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_tag_ids(["old", "new"]), {"old": ids["old"], "new": ids["new"]})
+
+        # Deleting a tag drops its entry from the shared cache
+        Tag.objects.get(pk=ids["new"]).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(3):
+                new_id = resolve_tag_ids(["new"])["new"]
+        self.assertTrue(Tag.objects.filter(pk=new_id, name="new").exists())
+
+    @override_settings(TAG_ID_CACHE_ENABLED=True)
+    def test_renamed_tag_is_not_resolved_by_its_old_name(self):
+        tag = Tag.objects.create(name="scifi")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(resolve_tag_ids(["scifi"]), {"scifi": tag.pk})
+
+        tag = Tag.objects.get(pk=tag.pk)
+        tag.name = "science fiction"
+        tag.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = resolve_tag_ids(["scifi", "science fiction"])
+        self.assertEqual(ids["science fiction"], tag.pk)
+        self.assertNotEqual(ids["scifi"], tag.pk)
+
+    def test_tag_ids_are_not_cached_per_process(self):
+        # The test cache is a LocMemCache, which other workers can't see
+        tag = Tag.objects.create(name="magic")
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(1):
+                    self.assertEqual(resolve_tag_ids(["magic"]), {"magic": tag.pk})
+
+    def test_update_keeps_clears_and_replaces_tags(self):
+        self.client.put(self.detail, {"tags": ["a", "b"]}, format="json")
+        self.client.put(self.detail, {"synopsis": "no tags sent"}, format="json")
+        self.assertEqual(self.tags_of(self.story), ["a", "b"])
+
+        self.client.put(self.detail, {"tags[]": ["c"]}, format="multipart")
+        self.assertEqual(self.tags_of(self.story), ["c"])
+
+        # The editor sends a single blank field when the last tag is removed
+        self.client.put(self.detail, {"tags": ""}, format="multipart")
+        self.assertEqual(self.tags_of(self.story), [])
+
+        self.client.put(self.detail, {"tags": ["d"]}, format="json")
+        self.client.put(self.detail, {"tags": []}, format="json")
+        self.assertEqual(self.tags_of(self.story), [])
+
+    def test_tag_limits_are_validated(self):
+        res = self.client.put(self.detail, {"tags": [f"t{i}" for i in range(11)]}, format="json")
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("tags", res.data)
+        res = self.client.put(self.detail, {"tags": ["x" * 31]}, format="json")
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Tag.objects.exists())
+
+    def test_catalog_tag_filter_is_case_insensitive(self):
+        self.story.tags.add(Tag.objects.create(name="magic"))
+        res = self.client.get(reverse("story-list-create"), {"tag": "MAGIC"})
+        self.assertEqual([story["title"] for story in res.data["results"]], ["Tale"])
+
+    def test_import_stories_in_bulk(self):
+        Tag.objects.create(name="magic")
+        rows = [
+            {"title": "Tale", "synopsis": "s", "genre": "Other", "status": "Ongoing"},
+            {"title": "Wyrm", "synopsis": "dragons", "genre": "Fantasy", "status": "Ongoing", "tags": ["Magic", "Dragons"]},
+            {"title": "Orbit", "synopsis": "stars", "genre": "Sci‑Fi", "status": "Completed", "tags": ["dragons"]},
+            {"title": "Orbit", "synopsis": "again", "genre": "Other", "status": "Ongoing"},
+            {"title": "Broken", "synopsis": "s", "genre": "Nope", "status": "Ongoing"},
+            {"title": "Long", "synopsis": "s", "genre": "Other", "status": "Ongoing", "tags": ["x" * 31]},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            # title check, story INSERT, tag SELECT + INSERT + SELECT for the
+            # new one, story-tag INSERT (+ savepoint and release for the batch)
+            with self.assertNumQueries(8):
+                result = import_stories(self.author, rows)
+
+        self.assertEqual(result["skipped"], ["Tale", "Orbit"])
+        self.assertEqual(list(result["errors"]), [4, 5])
+        self.assertIn("genre", result["errors"][4])
+        self.assertIn("tags", result["errors"][5])
+        wyrm, orbit = Story.objects.filter(pk__in=result["created"]).order_by("id")
+        self.assertEqual(self.tags_of(wyrm), ["dragons", "magic"])
+        self.assertEqual(self.tags_of(orbit), ["dragons"])
+        self.assertEqual(Tag.objects.count(), 2)
+        self.assertEqual(get_search_backend().search("wyrm", 10), [wyrm.pk])
+
+    def test_import_stories_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as fh:
+            json.dump([{"title": "Imported", "synopsis": "s", "genre": "Other", "status": "Ongoing", "tags": ["x"]}], fh)
+        self.addCleanup(os.remove, fh.name)
+        out = StringIO()
+        call_command("import_stories", fh.name, author="author", stdout=out)
+        self.assertIn("Imported 1 stories", out.getvalue())
+        self.assertEqual(self.tags_of(Story.objects.get(title="Imported")), ["x"])
@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Subquery
+from rest_framework.exceptions import NotFound
+
+from users.graph import follower_ids, following_ids
+from users.models import Follow
+from .models import FeedItem
+
+
+#-----------------SETTINGS--------------------------------
+
+def _setting(name, default):
+    return getattr(settings, f'FEED_{name}', default)
+
+
+def _timeline_key(user_id):
+    return f"feed:timeline:{user_id}"
+
+
+def _reads_key(user_id):
+    return f"feed:reads:{user_id}"
+
+
+#-----------------WRITE SIDE--------------------------------
+# Stories and chapter publishes become FeedItem rows (one per event, never one
+# per follower). Followers' cached timelines are dropped after commit.
+
+def invalidate_timelines(user_ids):
+    keys = [_timeline_key(user_id) for user_id in user_ids]
+    for start in range(0, len(keys), 1000):
+        cache.delete_many(keys[start:start + 1000])
+
+
+def _invalidate_followers(author_id):
+    ids = follower_ids(author_id)
+    if ids is None:
+        ids = Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+    invalidate_timelines(list(ids))
+
+
+def record_story(story):
+    FeedItem.objects.create(author_id=story.author_id, story=story, kind=FeedItem.Kind.STORY)
+    transaction.on_commit(lambda: _invalidate_followers(story.author_id))
+
+
+def sync_chapter(chapter, was_published, created):
+    """Add or drop the chapter's feed entry when its published state changes."""
+    if created:
+        was_published = False
+    if chapter.is_published and was_published is not True:
+        author_id = chapter.story.author_id
+        _, added = FeedItem.objects.get_or_create(
+            chapter=chapter,
+            defaults={'author_id': author_id, 'story_id': chapter.story_id, 'kind': FeedItem.Kind.CHAPTER},
+        )
+    elif not chapter.is_published and was_published is not False:
+        author_id = chapter.story.author_id
+        added = FeedItem.objects.filter(chapter=chapter).delete()[0] > 0
+    else:
+        return
+    if added:
+        transaction.on_commit(lambda: _invalidate_followers(author_id))
+
+
+#-----------------READ SIDE--------------------------------
+# Fan-out-on-read: one indexed query over FeedItem for the authors the reader
+# follows. Readers who hit the feed at least FEED_CACHE_MIN_READS times within
+# FEED_READS_WINDOW seconds get the head of their timeline cached as
+# (created_at, id) pairs, so their next pages skip the merge entirely.
+
+def timeline_queryset(user, items=None):
+    """FeedItems by the authors `user` follows (optionally narrowing `items`)."""
+    items = FeedItem.objects.all() if items is None else items
+    ids = following_ids(user.id)
+    if ids is not None:
+        return items.filter(author_id__in=ids)
+    return items.filter(
+        author_id__in=Subquery(Follow.objects.filter(follower_id=user.id).values('following_id'))
+    )
+
+
+def is_heavy_reader(user_id):
+    key = _reads_key(user_id)
+    try:
+        reads = cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, _setting('READS_WINDOW', 3600))
+        reads = 1
+    return reads >= _setting('CACHE_MIN_READS', 5)
+
+
+def _cached_entries(user):
+    key = _timeline_key(user.id)
+    entries = cache.get(key)
+    if entries is None:
+        entries = list(
+            timeline_queryset(user)
+            .order_by('-created_at', '-id')
+            .values_list('created_at', 'id')[:_setting('CACHE_SIZE', 200)]
+        )
+        cache.set(key, entries, _setting('CACHE_TTL', 600))
+    return entries
+
+
+def paginate_cached_timeline(user, paginator, request):
+    """
+    Page of FeedItem ids served from the cached timeline head, with the
+    paginator's cursor state filled in. Returns None when the page runs past
+    the cached head, in which case the caller pages the queryset instead.
+    """
+    entries = _cached_entries(user)
+    # A full head means older items may exist beyond it.
+    truncated = len(entries) >= _setting('CACHE_SIZE', 200)
+    paginator.request = request
+    paginator.page_size = paginator.get_page_size(request)
+
+    position = paginator.decode_cursor(request)
+    if position is not None:
+        value, pk = position
+        try:
+            value = FeedItem._meta.get_field('created_at').to_python(value)
+        except Exception:
+            raise NotFound(paginator.invalid_cursor_message)
+        entries = [entry for entry in entries if entry < (value, pk)]
+
+    page = entries[:paginator.page_size + 1]
+    if truncated and len(page) <= paginator.page_size:
+        return None
+
+    paginator.has_next = len(page) > paginator.page_size
+    page = page[:paginator.page_size]
+    paginator.next_cursor = paginator.encode_cursor(*page[-1]) if paginator.has_next else None
+    return [pk for _, pk in page]
@@ -5,14 +5,21 @@ urlpatterns = [
 
     # Stories
     path('stories/', views.story_list_create, name='story-list-create'),
+    path('stories/search/', views.story_search, name='story-search'),
+    path('stories/trending/', views.story_rankings, {'ranking': 'trending'}, name='story-trending'),
+    path('stories/popular/', views.story_rankings, {'ranking': 'popular'}, name='story-popular'),
     path('stories/<int:pk>/', views.story_detail, name='story-detail'),
     path('stories/<int:pk>/like/', views.toggle_like, name='story-like'),
     path('stories/<int:pk>/bookmark/', views.toggle_bookmark, name='story-bookmark'),
     path('stories/<int:pk>/comments/', views.comment_list_create, name='story-comments'),
 
+    # Following timeline
+    path('feed/', views.following_feed, name='following-feed'),
+
     #Notifications
     path('notifications/', views.notification_list, name='notification-list'),
     path('notifications/<int:notify_id>/read/', views.toggle_notification_read, name='notification-toggle-read'),
+    path('notifications/read/', views.mark_all_notifications_read, name='notification-mark-read'),
     
     # User stories
     path('<str:username>/stories/', views.user_stories_list, name='user-stories'),
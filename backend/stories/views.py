@@ -1,20 +1,28 @@
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Greatest
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import permissions, response, status
-from rest_framework.pagination import PageNumberPagination
-from .models import Story, Chapter, Comment, Notification
+from rest_framework.utils.urls import replace_query_param
+from .models import Story, Chapter, Comment, Notification, FeedItem
+from .pagination import StoryFeedPagination, CommentPagination, NotificationPagination, FeedPagination
+from .timeline import is_heavy_reader, paginate_cached_timeline, timeline_queryset
+from .search import get_search_backend
+from .ranking import trending_updates, ranked_story_ids
+from .conditional import story_etag, chapter_validators, not_modified, set_validators, viewer_bookmarked
+from .response_cache import LISTS, cached_response, invalidate_responses, story_item_scopes, story_scope
+from .filters import parse_story_filters, filter_stories, story_facets
+from .notifications import get_unread_count, adjust_unread_count, mark_notifications_read
 from .serializers import (
     StorySerializer,
     StoryListSerializer,
     ChapterSerializer,
     CommentSerializer,
     NotificationSerializer,
+    FeedItemSerializer,
 )
 
-# Helper Pagination Class
-class SmallPagination(PageNumberPagination):
-    page_size = 10
-
 #--------✅ Helper to check author permission----------
 def is_author_or_read_only(request, obj):
     if request.method in permissions.SAFE_METHODS:
@@ -26,9 +34,7 @@ def is_author_or_read_only(request, obj):
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
 def story_list_create(request):
     if request.method == 'GET':
-        stories = Story.objects.select_related('author').prefetch_related('tags', 'likes', 'bookmarks')
-        serializer = StoryListSerializer(stories, many=True, context={'request': request})
-        return response.Response(serializer.data)
+        return cached_response(request, [LISTS], lambda: _story_catalog(request), item_scopes=story_item_scopes)
 
     serializer = StorySerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
@@ -36,16 +42,93 @@ def story_list_create(request):
         return response.Response(serializer.data, status=status.HTTP_201_CREATED)
     return response.Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _story_catalog(request):
+    filters = parse_story_filters(request.query_params)
+    stories = filter_stories(Story.objects.select_related('author').prefetch_related('tags'), filters)
+    paginator = StoryFeedPagination()
+    page = paginator.paginate_queryset(stories, request)
+    serializer = StoryListSerializer(page, many=True, context={'request': request})
+    res = paginator.get_paginated_response(serializer.data)
+    # Facets only change with the filters, so later pages don't recount them
+    if not request.query_params.get(paginator.cursor_query_param):
+        res.data['facets'] = story_facets(filters)
+    return res
+
+#--------🔎 FULL-TEXT STORY SEARCH ---------
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def story_search(request):
+    query = request.query_params.get('q', '').strip()
+    try:
+        page, page_size = _page_params(request)
+    except ValueError:
+        return response.Response({'error': 'page and page_size must be numbers'}, status=400)
+
+    # Ranked ids from the search index (one extra to know if there's a next page)
+    ids = get_search_backend().search(query, limit=page_size + 1, offset=(page - 1) * page_size)
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+
+    return _ranked_page(request, ids, page, has_next)
+
+def _page_params(request):
+    page = max(int(request.query_params.get('page', 1)), 1)
+    page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 50)
+    return page, page_size
+
+def _ranked_page(request, ids, page, has_next):
+    # Stories for an already ranked page of ids, in that order
+    by_id = Story.objects.select_related('author').prefetch_related('tags').in_bulk(ids)
+    stories = [by_id[pk] for pk in ids if pk in by_id]
+    serializer = StoryListSerializer(stories, many=True, context={'request': request})
+    return response.Response({
+        'next': replace_query_param(request.build_absolute_uri(), 'page', page + 1) if has_next else None,
+        'results': serializer.data,
+    })
+
+#--------🔥 TRENDING / POPULAR SHELVES ---------
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def story_rankings(request, ranking):
+    try:
+        page, page_size = _page_params(request)
+    except ValueError:
+        return response.Response({'error': 'page and page_size must be numbers'}, status=400)
+
+    # Slice of the cached ranking snapshot
+    ranked = ranked_story_ids(ranking)
+    start = (page - 1) * page_size
+    ids = ranked[start:start + page_size]
+    return _ranked_page(request, ids, page, len(ranked) > start + page_size)
+
 #--------📖 GET, UPDATE, DELETE STORY ---------
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
 def story_detail(request, pk):
-    story = get_object_or_404(Story.objects.select_related('author').prefetch_related('chapters', 'tags', 'likes', 'bookmarks'), pk=pk)
+    stories = (
+        Story.objects.select_related('author')
+        .prefetch_related(Prefetch('chapters', queryset=Chapter.objects.defer('content')), 'tags')
+    )
 
     if request.method == 'GET':
-        serializer = StorySerializer(story, context={'request': request})
-        return response.Response(serializer.data)
-
+        # 304 straight from the validator query when the client's copy is current
+        etag = story_etag(pk, request.user)
+        if etag:
+            cached = not_modified(request, etag)
+            if cached:
+                return cached
+
+        def build():
+            readable = stories
+            if request.user.is_authenticated:
+                readable = stories.annotate(viewer_bookmarked=viewer_bookmarked(request.user))
+            story = get_object_or_404(readable, pk=pk)
+            return response.Response(StorySerializer(story, context={'request': request}).data)
+
+        res = cached_response(request, [story_scope(pk)], build, per_viewer=True)
+        return set_validators(res, etag) if etag else res
+
+    story = get_object_or_404(stories, pk=pk)
     if not is_author_or_read_only(request, story):
         return response.Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
@@ -59,47 +142,67 @@ def story_detail(request, pk):
     story.delete()
     return response.Response(status=status.HTTP_204_NO_CONTENT)
 
+#--------🔁 Helper to flip a user in a story's likes/bookmarks---------
+def toggle_story_membership(story, relation, user):
+    """
+    Add or remove `user` from `story.<relation>` and keep `<relation>_count` in step.
+
+    Membership is decided by the DELETE itself (rows removed or not), so the user
+    set is never loaded. The counter moves by an F() expression inside the same
+    transaction, together with the story's trending score. Returns (added, count).
+    """
+    field = Story._meta.get_field(relation)
+    through = field.remote_field.through
+    counter = f'{relation}_count'
+    lookup = {field.m2m_field_name(): story, field.m2m_reverse_field_name(): user}
+
+    with transaction.atomic():
+        deleted, _ = through.objects.filter(**lookup).delete()
+        if deleted:
+            added, delta = False, -1
+        else:
+            # get_or_create absorbs the IntegrityError of a concurrent double-click
+            _, created = through.objects.get_or_create(**lookup)
+            added, delta = True, 1 if created else 0
+
+        if delta:
+            Story.objects.filter(pk=story.pk).update(**{
+                counter: Greatest(F(counter) + delta, 0),
+                **trending_updates(relation, delta),
+            })
+            # The through table is written directly, so no m2m signal does this;
+            # list pages showing the story follow its scope
+            invalidate_responses(story_scope(story.pk))
+
+    count = Story.objects.values_list(counter, flat=True).get(pk=story.pk)
+    return added, count
+
 #--------❤️ TOGGLE LIKE ---------
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def toggle_like(request, pk):
-    story = get_object_or_404(Story, pk=pk)
-    user = request.user
-
-    if user in story.likes.all():
-        story.likes.remove(user)
-        action = 'disliked'
-    else:
-        story.likes.add(user)
-        action = 'liked'
-
-    return response.Response({'likes_count': story.likes.count(), 'action': action})
+    story = get_object_or_404(Story.objects.only('id'), pk=pk)
+    added, count = toggle_story_membership(story, 'likes', request.user)
+    return response.Response({'likes_count': count, 'action': 'liked' if added else 'disliked'})
 
 #---------🔖 TOGGLE BOOKMARK ---------
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def toggle_bookmark(request, pk):
-    story = get_object_or_404(Story, pk=pk)
-    user = request.user
-
-    if user in story.bookmarks.all():
-        story.bookmarks.remove(user)
-        action = 'unmarked'
-    else:
-        story.bookmarks.add(user)
-        action = 'bookmarked'
-
-    return response.Response({'bookmarks_count': story.bookmarks.count(), 'action': action})
+    story = get_object_or_404(Story.objects.only('id'), pk=pk)
+    added, count = toggle_story_membership(story, 'bookmarks', request.user)
+    return response.Response({'bookmarks_count': count, 'action': 'bookmarked' if added else 'unmarked'})
 
 #----------💬 COMMENTS (LIST & POST)----------
 @api_view(['GET', 'POST'])
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
 def comment_list_create(request, pk):
-    story = get_object_or_404(Story, pk=pk)
+    story = get_object_or_404(Story.objects.only('id'), pk=pk)
 
     if request.method == 'GET':
-        comments = Comment.objects.filter(story=story).order_by('-created_at')
-        paginator = SmallPagination()
+        # Newest first, keyset paged over the (story, created_at, id) index
+        comments = Comment.objects.filter(story=story).select_related('user')
+        paginator = CommentPagination()
         result = paginator.paginate_queryset(comments, request)
         serializer = CommentSerializer(result, many=True)
         return paginator.get_paginated_response(serializer.data)
@@ -115,14 +218,17 @@ def comment_list_create(request, pk):
 @api_view(['GET', 'POST'])
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
 def chapter_list_create(request, story_id):
-    story = get_object_or_404(Story, pk=story_id)
-
     if request.method == 'GET':
-        chapters = Chapter.objects.filter(story=story)
-        if request.user != story.author:
-            chapters = chapters.filter(is_published=True)
-        serializer = ChapterSerializer(chapters, many=True)
-        return response.Response(serializer.data)
+        def build():
+            story = get_object_or_404(Story.objects.select_related('author'), pk=story_id)
+            chapters = Chapter.objects.filter(story=story)
+            if request.user != story.author:
+                chapters = chapters.filter(is_published=True)
+            return response.Response(ChapterSerializer(chapters, many=True).data)
+
+        return cached_response(request, [story_scope(story_id)], build, per_viewer=True)
+
+    story = get_object_or_404(Story, pk=story_id)
 
     if request.user != story.author:
         return response.Response({'error': 'Only the author can add chapters.'}, status=403)
@@ -138,6 +244,12 @@ def chapter_list_create(request, story_id):
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
 def chapter_detail(request, story_id, chapter_no):
+    validators = chapter_validators(story_id, chapter_no, request.user) if request.method == 'GET' else None
+    if validators:
+        cached = not_modified(request, *validators)
+        if cached:
+            return cached
+
     chapter = get_object_or_404(Chapter, story_id=story_id, chapter_no=chapter_no)
 
     if not chapter.is_published and chapter.story.author != request.user:
@@ -145,7 +257,8 @@ def chapter_detail(request, story_id, chapter_no):
 
     if request.method == 'GET':
         serializer = ChapterSerializer(chapter)
-        return response.Response(serializer.data)
+        res = response.Response(serializer.data)
+        return set_validators(res, *validators) if validators else res
 
     if chapter.story.author != request.user:
         return response.Response({'error': 'Permission denied'}, status=403)
@@ -160,46 +273,83 @@ def chapter_detail(request, story_id, chapter_no):
     chapter.delete()
     return response.Response(status=204)
 
+#-------------🏠 FOLLOWING TIMELINE------------------
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def following_feed(request):
+    paginator = FeedPagination()
+    items = (
+        FeedItem.objects.select_related('author', 'story__author', 'chapter')
+        .defer('chapter__content')
+        .prefetch_related('story__tags')
+    )
+
+    # Heavy readers page through their cached timeline head; everyone else
+    # (and anyone paging past that head) merges followed authors on read.
+    ids = paginate_cached_timeline(request.user, paginator, request) if is_heavy_reader(request.user.id) else None
+    if ids is not None:
+        by_id = items.in_bulk(ids)
+        page = [by_id[pk] for pk in ids if pk in by_id]
+    else:
+        page = paginator.paginate_queryset(timeline_queryset(request.user, items), request)
+
+    serializer = FeedItemSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
 #-------------📩 USER NOTIFICATIONS------------------
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def notification_list(request):
     user = request.user
     if request.method == 'GET':
-        notifications = Notification.objects.filter(user=user).order_by('-created_at')
-        serializer = NotificationSerializer(notifications, many=True)
-        unread_count = notifications.filter(is_read=False).count()
+        paginator = NotificationPagination()
+        page = paginator.paginate_queryset(Notification.objects.filter(user=user), request)
+        serializer = NotificationSerializer(page, many=True)
         return response.Response({
             "notifications": serializer.data,
-            "unread_count": unread_count
+            "unread_count": get_unread_count(user.id),
+            "next": paginator.get_next_link(),
+            "next_cursor": paginator.next_cursor,
         })
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def toggle_notification_read(request, notify_id):
     user = request.user
-    try:
-        notify = Notification.objects.get(id=notify_id, user=user)
-        if not notify.is_read:
-            notify.is_read = True
-            notify.save()
-        return response.Response({'id': notify.id, 'is_read': notify.is_read})
-    except Notification.DoesNotExist:
+    updated = Notification.objects.filter(id=notify_id, user=user, is_read=False).update(is_read=True)
+    if updated:
+        adjust_unread_count(user.id, -1)
+    elif not Notification.objects.filter(id=notify_id, user=user).exists():
         return response.Response({'error': 'Notification not found'}, status=404)
+    return response.Response({'id': notify_id, 'is_read': True})
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def mark_all_notifications_read(request):
+    up_to = request.data.get('up_to')
+    if up_to is not None:
+        try:
+            up_to = int(up_to)
+        except (TypeError, ValueError):
+            return response.Response({'error': 'up_to must be a notification id'}, status=400)
+
+    updated = mark_notifications_read(request.user.id, up_to_id=up_to)
+    return response.Response({'updated': updated, 'unread_count': get_unread_count(request.user.id)})
 
 #-----------------👤 USER'S STORIES----------------------
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def user_stories_list(request, username):
-    stories = Story.objects.filter(author__username=username).select_related('author').prefetch_related('tags', 'likes', 'bookmarks')
-    serializer = StoryListSerializer(stories, many=True, context={'request': request})
-    return response.Response(serializer.data)
+    def build():
+        stories = Story.objects.filter(author__username=username).select_related('author').prefetch_related('tags')
+        return response.Response(StoryListSerializer(stories, many=True, context={'request': request}).data)
+
+    return cached_response(request, [LISTS], build, item_scopes=story_item_scopes)
 
 #----------------🔖 USER'S BOOKMARKED STORIES-------------
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def bookmarked_stories(request):
-    user = request.user
-    bookmarked = user.bookmarked_stories.select_related('author').prefetch_related('tags', 'likes', 'bookmarks')
+    bookmarked = Story.objects.filter(bookmarks=request.user).select_related('author').prefetch_related('tags')
     serializer = StoryListSerializer(bookmarked, many=True, context={'request': request})
     return response.Response(serializer.data)
@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Model
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+
+#-----------------CACHED TOKEN -> USER--------------------------------
+# Shared by REST (StatelessJWTAuthentication) and WebSockets
+# (chat.middleware.TokenAuthMiddleware). Users are cached per token id (jti).
+# Each user also has a "state" entry (version stamp, is_active) that is
+# rewritten whenever the account is saved or deleted: the stamp is part of the
+# cache key, so a change orphans every cached copy, and the flag lets a
+# deactivated account be rejected without touching the database.
+
+def _state_key(user_id):
+    return f"auth:state:{user_id}"
+
+
+def invalidate_cached_user(user_id, is_active=None):
+    # is_active=None keeps whatever flag is currently recorded.
+    key = _state_key(user_id)
+    if is_active is None:
+        _, is_active = cache.get(key, (0, True))
+    cache.set(key, (timezone.now().timestamp(), is_active), None)
+
+
+def _user_key(validated_token, stamp):
+    return f"auth:user:{validated_token[api_settings.JTI_CLAIM]}:{stamp}"
+
+
+def get_cached_user(validated_token):
+    """The cached user for this token, or None. Never queries the database."""
+    user_id = validated_token[api_settings.USER_ID_CLAIM]
+    stamp, is_active = cache.get(_state_key(user_id), (0, True))
+    if not is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return cache.get(_user_key(validated_token, stamp))
+
+
+def resolve_user(validated_token):
+    """The user for this token, from the cache or (once per TTL) the database."""
+    user = get_cached_user(validated_token)
+    if user is not None:
+        return user
+
+    user_id = validated_token[api_settings.USER_ID_CLAIM]
+    try:
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise AuthenticationFailed("User not found", code="user_not_found")
+    if not user.is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+    # Never outlive the token itself.
+    remaining = int(validated_token["exp"] - timezone.now().timestamp())
+    ttl = min(getattr(settings, "AUTH_USER_CACHE_TTL", 300), remaining)
+    if ttl > 0:
+        stamp, _ = cache.get(_state_key(user_id), (0, True))
+        cache.set(_user_key(validated_token, stamp), user, ttl)
+    return user
+
+
+#-----------------LAZY TOKEN USER--------------------------------
+
+class TokenUser(SimpleLazyObject):
+    """
+    Stands in for CustomUser using only the token's claims.
+
+    `id`/`pk`, the auth flags, equality and `filter(user=...)` lookups are
+    answered from the token; touching any other attribute loads the real row
+    through resolve_user() on first use.
+    """
+
+    def __init__(self, validated_token):
+        super().__init__(lambda: resolve_user(validated_token))
+        self.__dict__["_user_id"] = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def __class__(self):
+        return User
+
+    @property
+    def _meta(self):
+        return User._meta
+
+    @property
+    def pk(self):
+        return self.__dict__["_user_id"]
+
+    id = pk
+
+    def _is_pk_set(self):
+        return self.pk is not None
+
+    def __getattr__(self, name):
+        # Duck-typing probes such as the ORM's hasattr(value, "resolve_expression")
+        # must not load the row just to learn that CustomUser has no such attribute.
+        if self._wrapped is empty and not name.startswith("_") and not hasattr(User, name):
+            raise AttributeError(name)
+        return super().__getattr__(name)
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, Model) and other._meta.concrete_model is User._meta.concrete_model and other.pk == self.pk
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.pk)
+
+
+#-----------------REST AUTHENTICATION--------------------------------
+
+# Skipping the user query is only safe when every worker sees the same "state"
+# entries, i.e. the default cache is shared (Redis). With per-process memory a
+# deactivation or delete in one worker is invisible to the others, so
+# AUTH_STATELESS_JWT=None (auto) turns the stateless path off in that case.
+# Writes always check the row: a TokenUser for a deleted account would otherwise
+# reach the view and fail on its foreign keys.
+
+def stateless_auth_enabled():
+    enabled = getattr(settings, "AUTH_STATELESS_JWT", None)
+    if enabled is None:
+        return not isinstance(caches["default"], LocMemCache)
+    return enabled
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query on reads.
+
+    Safe-method requests get the cached user when there is one, otherwise a
+    TokenUser that only loads CustomUser if the view needs more than the id.
+    Unsafe methods, and every request when stateless_auth_enabled() is False,
+    load the user row like JWTAuthentication does.
+    """
+
+    def authenticate(self, request):
+        self.verify_user = request.method not in SAFE_METHODS or not stateless_auth_enabled()
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if getattr(self, "verify_user", True):
+            return super().get_user(validated_token)
+        try:
+            validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed("Token contained no recognizable user identification", code="token_not_valid")
+
+        return get_cached_user(validated_token) or TokenUser(validated_token)
@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+
+from .models import Follow
+
+
+#-----------------FOLLOW GRAPH CACHE--------------------------------
+# Per-user adjacency sets (who follows X, whom X follows) for story fan-out and
+# is_following checks. Users with more than FOLLOW_GRAPH_CACHE_MAX edges are not
+# cached (callers fall back to a query) so one celebrity account can't push a
+# huge value through the cache on every read. The sets are only trusted when
+# every worker sees the same invalidations, so with FOLLOW_GRAPH_CACHE_ENABLED
+# unset they are used only when the default cache is shared (not LocMemCache).
+#
+# Each set is stored with the generation it was read under. users.signals bumps
+# the generation whenever a Follow row is created or deleted (again after
+# commit), so a reader that queried the old edges and writes its set after the
+# bump leaves an entry that no longer matches and is ignored.
+
+_TOO_BIG = 'too-big'
+
+
+def _setting(name, default):
+    return getattr(settings, f'FOLLOW_GRAPH_CACHE_{name}', default)
+
+
+def _enabled():
+    enabled = _setting('ENABLED', None)
+    if enabled is None:
+        return not isinstance(caches['default'], LocMemCache)
+    return enabled
+
+
+def _key(kind, user_id):
+    return f"follow-graph:{kind}:{user_id}"
+
+
+def _generation_key(kind, user_id):
+    return f"follow-graph:gen:{kind}:{user_id}"
+
+
+def _adjacent_ids(kind, user_id):
+    if not _enabled():
+        return None
+
+    key, gen_key = _key(kind, user_id), _generation_key(kind, user_id)
+    found = cache.get_many([key, gen_key])
+    generation = found[gen_key] if gen_key in found else cache.get_or_set(gen_key, time.time_ns, None)
+    entry = found.get(key)
+
+    if entry is not None and entry[0] == generation:
+        ids = entry[1]
+    else:
+        limit = _setting('MAX', 5000)
+        if kind == 'followers':
+            rows = Follow.objects.filter(following_id=user_id).values_list('follower_id', flat=True)
+        else:
+            rows = Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+        ids = list(rows[:limit + 1])
+        if len(ids) > limit:
+            ids = _TOO_BIG
+        cache.set(key, (generation, ids), _setting('TTL', 3600))
+
+    if ids == _TOO_BIG:
+        return None
+    return frozenset(ids)
+
+
+def follower_ids(user_id):
+    """Ids of users following `user_id`, or None if not cacheable."""
+    return _adjacent_ids('followers', user_id)
+
+
+def following_ids(user_id):
+    """Ids of users that `user_id` follows, or None if not cacheable."""
+    return _adjacent_ids('following', user_id)
+
+
+def _bump(keys):
+    cache.set_many({key: time.time_ns() for key in keys}, None)
+
+
+def invalidate_follow_edge(follower_id, following_id):
+    keys = [_generation_key('following', follower_id), _generation_key('followers', following_id)]
+    _bump(keys)
+    if connection.in_atomic_block:
+        # A reader between the bump and the commit still sees the old edges
+        transaction.on_commit(lambda: _bump(keys))
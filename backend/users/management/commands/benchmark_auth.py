@@ -0,0 +1,69 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.authentication import StatelessJWTAuthentication
+from users.models import CustomUser
+
+
+DEFAULT_PATHS = ['/api/core/stories/', '/api/core/notifications/', '/api/core/stories/bookmarked/']
+
+
+def _private_caches(run):
+    # Each run starts cold in its own process-local caches; the real (possibly
+    # shared) cache holds deactivation flags and invalidation versions and must
+    # never be cleared or filled by a benchmark.
+    return {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-auth-{run}-{alias}'}
+        for alias in settings.CACHES
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare queries and time per request for JWTAuthentication vs StatelessJWTAuthentication."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--path', action='append', dest='paths', help="GET endpoint to hit (repeatable).")
+        parser.add_argument('--requests', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['username'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        token = str(RefreshToken.for_user(user).access_token)
+        factory = APIRequestFactory()
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost'
+
+        for path in options['paths'] or DEFAULT_PATHS:
+            match = resolve(path)
+            self.stdout.write(path)
+            for auth_class in (JWTAuthentication, StatelessJWTAuthentication):
+                queries, elapsed = 0, 0.0
+                # Views bind their authenticators at import time, so swap them here.
+                # The stateless path is measured even on a per-process cache.
+                with mock.patch.object(APIView, 'get_authenticators', lambda view: [auth_class()]), \
+                        override_settings(AUTH_STATELESS_JWT=True, CACHES=_private_caches(f'{path}-{auth_class.__name__}')):
+                    for _ in range(options['requests']):
+                        request = factory.get(path, SERVER_NAME=host, HTTP_AUTHORIZATION=f"Bearer {token}")
+                        started = time.perf_counter()
+                        with CaptureQueriesContext(connection) as captured:
+                            match.func(request, *match.args, **match.kwargs).render()
+                        elapsed += time.perf_counter() - started
+                        queries += len(captured)
+
+                n = options['requests']
+                self.stdout.write(
+                    f"  {auth_class.__name__:<28} {queries / n:6.2f} queries/request  {elapsed / n * 1000:7.2f} ms/request"
+                )
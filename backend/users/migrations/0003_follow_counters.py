@@ -0,0 +1,46 @@
+# Generated by Django 5.2.3 on 2026-10-18 19:56
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_follow_counters(apps, schema_editor):
+    CustomUser = apps.get_model("users", "CustomUser")
+    Follow = apps.get_model("users", "Follow")
+
+    def count_of(fk):
+        counts = (
+            Follow.objects.filter(**{fk: OuterRef("pk")})
+            .order_by()
+            .values(fk)
+            .annotate(c=Count("*"))
+            .values("c")
+        )
+        return Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+
+    CustomUser.objects.update(
+        followers_count=count_of("following_id"),
+        following_count=count_of("follower_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_customuser_manager"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_follow_counters, migrations.RunPython.noop),
+    ]
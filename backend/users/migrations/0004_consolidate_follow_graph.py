@@ -0,0 +1,82 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_m2m_into_follow(apps, schema_editor):
+    # Rows written through the old auto-created CustomUser.following table
+    # become Follow rows; pairs that already exist in Follow are kept as is.
+    CustomUser = apps.get_model("users", "CustomUser")
+    Follow = apps.get_model("users", "Follow")
+    OldFollowing = CustomUser.following.through
+
+    pairs = OldFollowing.objects.values_list("from_customuser_id", "to_customuser_id")
+    existing = set(Follow.objects.values_list("follower_id", "following_id"))
+    missing = [
+        Follow(follower_id=follower_id, following_id=following_id)
+        for follower_id, following_id in pairs.iterator()
+        if (follower_id, following_id) not in existing and follower_id != following_id
+    ]
+    Follow.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+
+    if not missing:
+        return
+    touched = {f.follower_id for f in missing} | {f.following_id for f in missing}
+
+    def count_of(fk):
+        counts = (
+            Follow.objects.filter(**{fk: OuterRef("pk")})
+            .order_by()
+            .values(fk)
+            .annotate(c=Count("*"))
+            .values("c")
+        )
+        return Coalesce(Subquery(counts, output_field=models.IntegerField()), Value(0))
+
+    CustomUser.objects.filter(pk__in=touched).update(
+        followers_count=count_of("following_id"),
+        following_count=count_of("follower_id"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_follow_counters"),
+    ]
+
+    # Django can't add through= to an existing M2M in place: copy the rows,
+    # drop the old join table, then re-add the field on top of Follow.
+    operations = [
+        migrations.RunPython(copy_m2m_into_follow, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="customuser",
+            name="following",
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="following",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="followers",
+                through="users.Follow",
+                through_fields=("follower", "following"),
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["following", "followed_at"], name="follow_following_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["follower", "followed_at"], name="follow_follower_idx"
+            ),
+        ),
+    ]
@@ -1,14 +1,63 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.contrib.auth.models import AbstractUser, UserManager
 from cloudinary.models import CloudinaryField
 
 
 #-----------------USER MODEL--------------------------------
 
+def _follow_count_subquery(fk):
+    # Correlated COUNT over Follow only, so both counts can be refreshed in one
+    # UPDATE without the row multiplication of two Count() joins.
+    counts = (
+        Follow.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+class CustomUserQuerySet(models.QuerySet):
+    def with_is_following(self, viewer=None):
+        """Annotate is_following: whether `viewer` follows each user (one EXISTS subquery)."""
+        if viewer is not None and viewer.is_authenticated:
+            is_following = Exists(Follow.objects.filter(follower_id=viewer.id, following_id=OuterRef('pk')))
+        else:
+            is_following = Value(False)
+        return self.annotate(is_following=is_following)
+
+    def refresh_follow_counts(self):
+        """Recompute followers_count/following_count from the Follow table."""
+        return self.update(
+            followers_count=_follow_count_subquery('following_id'),
+            following_count=_follow_count_subquery('follower_id'),
+        )
+
+
+class CustomUserManager(UserManager.from_queryset(CustomUserQuerySet)):
+    pass
+
+
 class CustomUser(AbstractUser):
     profile_image = CloudinaryField('image', folder='profile/', blank=True, null=True)
     bio = models.CharField(blank=True, null=True, max_length=50)
-    following = models.ManyToManyField('self', symmetrical=False, related_name='followers', blank=True)
+    # Same graph as the Follow model (its table), not a second join table
+    following = models.ManyToManyField(
+        'self', symmetrical=False, related_name='followers', blank=True,
+        through='Follow', through_fields=('follower', 'following'),
+    )
+
+    # Denormalized from Follow; kept in step by users.signals
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Profile edits; the profile ETag (PublicUserDetailView) is built on it
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CustomUserManager()
 
     def __str__(self):
         return f"{self.username}"
@@ -22,6 +71,12 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ('follower', 'following')
+        indexes = [
+            # Follower lists / fan-out ("who follows X, newest first") and the
+            # following timeline ("whom does X follow") as index-only scans.
+            models.Index(fields=['following', 'followed_at'], name='follow_following_idx'),
+            models.Index(fields=['follower', 'followed_at'], name='follow_follower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.follower} follows {self.following}"
\ No newline at end of file
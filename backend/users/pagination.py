@@ -0,0 +1,8 @@
+from stories.pagination import KeysetPagination
+
+
+#-----------------EXPLORE USERS PAGINATION--------------------------------
+
+class PublicUserPagination(KeysetPagination):
+    ordering_field = 'date_joined'
+    page_size = 24
@@ -30,8 +30,8 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 #-----------------USER SERIALIZER--------------------------------
 
 class UserSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    followers_count = serializers.IntegerField(read_only=True)
+    following_count = serializers.IntegerField(read_only=True)
     profile_image_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -42,12 +42,6 @@ class UserSerializer(serializers.ModelSerializer):
             'profile_image_url'
         ]
 
-    def get_followers_count(self, obj):
-        return obj.followers_set.count()
-
-    def get_following_count(self, obj):
-        return obj.following_set.count()
-
     def get_profile_image_url(self, obj):
         if obj.profile_image:
             return obj.profile_image.url.replace("/upload/", "/upload/q_auto,f_auto,w_600/")
@@ -67,8 +61,8 @@ class FollowSerializer(serializers.ModelSerializer):
 
 
 class PublicUsersSerializer(serializers.ModelSerializer):
-    followers_count = serializers.SerializerMethodField()
-    following_count = serializers.SerializerMethodField()
+    followers_count = serializers.IntegerField(read_only=True)
+    following_count = serializers.IntegerField(read_only=True)
     is_following = serializers.SerializerMethodField()
     profile_image_url = serializers.SerializerMethodField()
 
@@ -80,13 +74,15 @@ class PublicUsersSerializer(serializers.ModelSerializer):
             'is_following', 'profile_image','profile_image_url'
         ]
 
-    def get_followers_count(self, obj):
-        return obj.followers_set.count()
-
-    def get_following_count(self, obj):
-        return obj.following_set.count()
-
+    # Views supply either the viewer's cached following set (context
+    # 'following_ids') or an is_following annotation; the per-object query is
+    # only a fallback.
     def get_is_following(self, obj):
+        if hasattr(obj, 'is_following'):
+            return obj.is_following
+        following_ids = self.context.get('following_ids')
+        if following_ids is not None:
+            return obj.id in following_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Follow.objects.filter(follower=request.user, following=obj).exists()
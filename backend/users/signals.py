@@ -0,0 +1,57 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_cached_user
+from .graph import invalidate_follow_edge
+from .models import CustomUser, Follow
+
+
+#------Drop cached token users when the account changes------
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_cache_on_save(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk, instance.is_active)
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_user_cache_on_delete(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk, is_active=False)
+
+
+#------Keep follower/following counters and the follow graph cache in step------
+
+def _apply_follow_delta(follow, delta):
+    CustomUser.objects.filter(pk=follow.following_id).update(followers_count=Greatest(F('followers_count') + delta, 0))
+    CustomUser.objects.filter(pk=follow.follower_id).update(following_count=Greatest(F('following_count') + delta, 0))
+    invalidate_follow_edge(follow.follower_id, follow.following_id)
+    # The counters are changed with UPDATE, which skips post_save; drop the
+    # cached token users so /me/ shows the new numbers.
+    invalidate_cached_user(follow.follower_id)
+    invalidate_cached_user(follow.following_id)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        _apply_follow_delta(instance, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_removed_follow(sender, instance, **kwargs):
+    _apply_follow_delta(instance, -1)
+
+
+@receiver(m2m_changed, sender=CustomUser.following.through)
+def count_m2m_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    # user.following.add() writes Follow rows with bulk_create, which skips
+    # post_save; removals go through Follow deletes and are handled above.
+    if action != 'post_add' or not pk_set:
+        return
+    CustomUser.objects.filter(pk__in={instance.pk, *pk_set}).refresh_follow_counts()
+    for other_id in pk_set:
+        follower_id, following_id = (other_id, instance.pk) if reverse else (instance.pk, other_id)
+        invalidate_follow_edge(follower_id, following_id)
+        invalidate_cached_user(other_id)
+    invalidate_cached_user(instance.pk)
@@ -2,7 +2,17 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from users.models import CustomUser, Follow
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from stories.models import Notification, Story
+from users.authentication import TokenUser
+from users.graph import follower_ids, following_ids
+from django.test import override_settings
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
 
 class UserFlowTests(APITestCase):
     def setUp(self):
@@ -57,7 +67,7 @@ class UserFlowTests(APITestCase):
         self.client.credentials(**self.get_auth_headers(self.user1))
         res = self.client.get(reverse("public-users"))
         self.assertEqual(res.status_code, 200)
-        usernames = [u["username"] for u in res.data]
+        usernames = [u["username"] for u in res.data["results"]]
         self.assertIn("bob", usernames)
         self.assertNotIn("alice", usernames)
 
@@ -86,9 +96,288 @@ class UserFlowTests(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(res.data[0]["username"], "bob")
 
+    def test_follow_lists_are_newest_first(self):
+        carol = CustomUser.objects.create_user(username="carol", password="pass1234")
+        dave = CustomUser.objects.create_user(username="dave", password="pass1234")
+        now = timezone.now()
+        for user in [carol, self.user2, dave]:
+            Follow.objects.create(follower=user, following=self.user1)
+            Follow.objects.create(follower=self.user1, following=user)
+        for i, follow in enumerate(Follow.objects.order_by("id")):
+            Follow.objects.filter(pk=follow.pk).update(followed_at=now - timedelta(minutes=10 - i))
+
+        self.client.credentials(**self.get_auth_headers(self.user1))
+        res = self.client.get(reverse("followers-list", args=["alice"]))
+        self.assertEqual([u["username"] for u in res.data], ["dave", "bob", "carol"])
+        res = self.client.get(reverse("following-list", args=["alice"]))
+        self.assertEqual([u["username"] for u in res.data], ["dave", "bob", "carol"])
+
     def test_following_list(self):
         Follow.objects.create(follower=self.user1, following=self.user2)
         self.client.credentials(**self.get_auth_headers(self.user1))
         res = self.client.get(reverse("following-list", args=["alice"]))
         self.assertEqual(res.status_code, 200)
         self.assertEqual(res.data[0]["username"], "bob")
+
+
+@override_settings(AUTH_STATELESS_JWT=True, FOLLOW_GRAPH_CACHE_ENABLED=True)
+class PublicUserStatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = CustomUser.objects.create_user(username="viewer", password="pass1234")
+        self.users = [CustomUser.objects.create_user(username=f"user{i}", password="pass1234") for i in range(6)]
+        for user in self.users[:3]:
+            Follow.objects.create(follower=self.viewer, following=user)
+        Follow.objects.create(follower=self.users[0], following=self.users[1])
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.viewer).access_token}")
+
+    def test_explore_is_one_query_regardless_of_size(self):
+        # The first request also loads the viewer's following set into the graph cache.
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("public-users"))
+        self.assertEqual(len(res.data["results"]), 6)
+
+        # After that, one page query: counts are columns, the JWT user comes from the token.
+        CustomUser.objects.create_user(username="late", password="pass1234")
+        with self.assertNumQueries(1):
+            self.client.get(reverse("public-users"))
+
+    @override_settings(FOLLOW_GRAPH_CACHE_ENABLED=False)
+    def test_explore_without_graph_cache_uses_exists(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(reverse("public-users"))
+        by_name = {u["username"]: u for u in res.data["results"]}
+        self.assertTrue(by_name["user0"]["is_following"])
+        self.assertFalse(by_name["user4"]["is_following"])
+
+    def test_explore_stats(self):
+        res = self.client.get(reverse("public-users"))
+        by_name = {u["username"]: u for u in res.data["results"]}
+        self.assertNotIn("viewer", by_name)
+        self.assertEqual(by_name["user1"]["followers_count"], 2)
+        self.assertEqual(by_name["user0"]["following_count"], 1)
+        self.assertTrue(by_name["user2"]["is_following"])
+        self.assertFalse(by_name["user3"]["is_following"])
+
+    def test_explore_pagination(self):
+        res = self.client.get(reverse("public-users") + "?page_size=4")
+        self.assertEqual(len(res.data["results"]), 4)
+        res = self.client.get(reverse("public-users") + f"?page_size=4&cursor={res.data['next_cursor']}")
+        self.assertEqual(len(res.data["results"]), 2)
+        self.assertIsNone(res.data["next_cursor"])
+
+    def test_detail_and_follow_lists_are_single_query(self):
+        following_ids(self.viewer.id)
+
+        # ETag validator row + the profile (a 304 skips the second one)
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("public-user-detail", args=[self.users[1].id]))
+        self.assertEqual(res.data["followers_count"], 2)
+        self.assertTrue(res.data["is_following"])
+
+        # get_object_or_404 for the profile owner + one list query
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("following-list", args=["viewer"]))
+        self.assertEqual(len(res.data), 3)
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("followers-list", args=["user1"]))
+        self.assertEqual({u["username"] for u in res.data}, {"viewer", "user0"})
+
+    def test_public_user_detail_conditional_get(self):
+        url = reverse("public-user-detail", args=[self.users[1].id])
+        res = self.client.get(url)
+        etag = res.headers["ETag"]
+        self.assertTrue(res.data["is_following"])
+
+        # Validator query only: no serializer, no user load
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Being unfollowed, gaining a follower or editing the profile all change it
+        Follow.objects.filter(follower=self.viewer, following=self.users[1]).delete()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(res.data["is_following"])
+        etag = res.headers["ETag"]
+        self.users[1].bio = "new bio"
+        self.users[1].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class FollowCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="pass1234")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pass5678")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.alice).access_token}")
+
+    def counts(self, user):
+        user.refresh_from_db(fields=["followers_count", "following_count"])
+        return user.followers_count, user.following_count
+
+    def test_follow_and_unfollow_update_counters(self):
+        self.client.post(reverse("follow-user", args=["bob"]))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+        self.client.post(reverse("unfollow-user", args=["bob"]))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    def test_profile_counts_are_fresh_despite_user_cache(self):
+        self.assertEqual(self.client.get(reverse("user-edit")).data["following_count"], 0)
+        self.client.post(reverse("follow-user", args=["bob"]))
+        self.assertEqual(self.client.get(reverse("user-edit")).data["following_count"], 1)
+
+    def test_deleting_a_user_decrements_the_other_side(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        self.bob.delete()
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    @override_settings(FOLLOW_GRAPH_CACHE_ENABLED=True)
+    def test_graph_cache_is_invalidated_on_follow_changes(self):
+        self.assertEqual(follower_ids(self.bob.id), frozenset())
+        follow = Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertEqual(follower_ids(self.bob.id), {self.alice.id})
+        self.assertEqual(following_ids(self.alice.id), {self.bob.id})
+        with self.assertNumQueries(0):
+            follower_ids(self.bob.id)
+        follow.delete()
+        self.assertEqual(follower_ids(self.bob.id), frozenset())
+
+    @override_settings(FOLLOW_GRAPH_CACHE_ENABLED=True)
+    def test_set_read_before_a_follow_change_is_not_kept(self):
+        real_filter = Follow.objects.filter
+
+        def follow_lands_mid_read(*args, **kwargs):
+            # Read the edges, then a follow commits before the reader caches them
+            rows = list(real_filter(*args, **kwargs).values_list('follower_id', flat=True))
+            with self.captureOnCommitCallbacks(execute=True):
+                Follow.objects.create(follower=self.alice, following=self.bob)
+            return mock.Mock(values_list=lambda *a, **k: rows)
+
+        with mock.patch.object(Follow.objects, "filter", side_effect=follow_lands_mid_read):
+            self.assertEqual(follower_ids(self.bob.id), frozenset())
+        self.assertEqual(follower_ids(self.bob.id), {self.alice.id})
+
+    def test_graph_cache_is_off_with_a_per_process_cache(self):
+        # The test cache is a LocMemCache, whose invalidations other workers can't see
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertIsNone(follower_ids(self.bob.id))
+        self.assertIsNone(following_ids(self.alice.id))
+        self.assertFalse(cache.has_key(f"follow-graph:followers:{self.bob.id}"))
+
+    @override_settings(FOLLOW_GRAPH_CACHE_MAX=1, FOLLOW_GRAPH_CACHE_ENABLED=True)
+    def test_large_adjacency_sets_are_not_cached(self):
+        carol = CustomUser.objects.create_user(username="carol", password="pass1234")
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Follow.objects.create(follower=carol, following=self.bob)
+        self.assertIsNone(follower_ids(self.bob.id))
+
+    def test_refresh_follow_counts_repairs_drift(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        CustomUser.objects.update(followers_count=7, following_count=7)
+        CustomUser.objects.refresh_follow_counts()
+        self.assertEqual(self.counts(self.bob), (1, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+    @override_settings(NOTIFICATION_FANOUT_ASYNC=False, FOLLOW_GRAPH_CACHE_ENABLED=True)
+    def test_story_fanout_uses_cached_followers(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        follower_ids(self.bob.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Story.objects.create(title="Tale", genre="Fantasy", synopsis="s", author=self.bob)
+        self.assertTrue(Notification.objects.filter(user=self.alice, message__contains="Tale").exists())
+
+
+@override_settings(AUTH_STATELESS_JWT=True)
+class StatelessJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="alice", password="pass1234")
+        self.other = CustomUser.objects.create_user(username="bob", password="pass5678")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_id_only_views_skip_user_query(self):
+        Notification.objects.create(user=self.user, message="hi")
+        # SELECT notifications + COUNT for the unread badge; no CustomUser row
+        with self.assertNumQueries(2):
+            res = self.client.get(reverse("notification-list"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["notifications"]), 1)
+
+    def test_full_user_loads_lazily_and_is_cached(self):
+        with CaptureQueriesContext(connection) as first:
+            res = self.client.get(reverse("user-edit"))
+        self.assertEqual(res.data["username"], "alice")
+        with CaptureQueriesContext(connection) as second:
+            self.client.get(reverse("user-edit"))
+
+        def user_selects(queries):
+            return [q for q in queries if q["sql"].startswith('SELECT "users_customuser"')]
+        self.assertEqual(len(user_selects(first.captured_queries)), 1)
+        self.assertEqual(user_selects(second.captured_queries), [])
+
+    def test_token_user_compares_like_a_model(self):
+        token = AccessToken.for_user(self.user)
+        user = TokenUser(token)
+        with self.assertNumQueries(0):
+            self.assertTrue(isinstance(user, CustomUser))
+            self.assertEqual(user, self.user)
+            self.assertNotEqual(user, self.other)
+            self.assertIn(f"= {self.user.id}", str(Follow.objects.filter(follower=user).query))
+        self.assertEqual(user.username, "alice")
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(reverse("notification-list"))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.user.delete()
+        res = self.client.get(reverse("user-edit"))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_check_the_user_row(self):
+        story = Story.objects.create(title="Tale", genre="Fantasy", synopsis="s", author=self.other)
+        self.user.delete()
+        # Another worker's cache never saw the delete
+        cache.clear()
+        self.assertEqual(self.client.get(reverse("notification-list")).status_code, status.HTTP_200_OK)
+        res = self.client.post(reverse("story-like", args=[story.id]))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_STATELESS_JWT=None)
+    def test_auto_mode_loads_the_user_without_a_shared_cache(self):
+        # LocMemCache is per process, so reads load the row as well
+        with self.assertNumQueries(3):
+            res = self.client.get(reverse("notification-list"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class FollowGraphConsolidationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username="alice", password="pass1234")
+        self.bob = CustomUser.objects.create_user(username="bob", password="pass5678")
+
+    def test_m2m_and_follow_share_one_table(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        self.assertEqual(list(self.alice.following.all()), [self.bob])
+        self.assertEqual(list(self.bob.followers.all()), [self.alice])
+        self.assertIs(CustomUser.following.through, Follow)
+
+    @override_settings(FOLLOW_GRAPH_CACHE_ENABLED=True)
+    def test_m2m_add_keeps_counters_and_cache_in_step(self):
+        self.assertEqual(follower_ids(self.bob.id), frozenset())
+        self.alice.following.add(self.bob)
+        self.assertTrue(Follow.objects.filter(follower=self.alice, following=self.bob).exists())
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.followers_count, 1)
+        self.assertEqual(follower_ids(self.bob.id), {self.alice.id})
+
+        self.alice.following.remove(self.bob)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.followers_count, 0)
@@ -8,7 +8,7 @@ urlpatterns = [
     path('register/', UserRegisterView.as_view(), name='register'),
     path('me/', UserUpdateView.as_view(), name='user-edit'),
     path('explore/', PublicUserListView.as_view(), name='public-users'),
-    path('explore/<str:id>/', PublicUserDetailView.as_view(), name='public-user-detail'),
+    path('explore/<int:id>/', PublicUserDetailView.as_view(), name='public-user-detail'),
 
     # 👇 New Follow routes
     path('follow/<str:username>/', FollowUserView.as_view(), name='follow-user'),
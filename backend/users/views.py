@@ -5,6 +5,9 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework import generics, permissions, status
 from .models import CustomUser, Follow
 from rest_framework.views import APIView
+from .pagination import PublicUserPagination
+from .graph import following_ids
+from stories.conditional import make_etag, not_modified, set_validators
 
 #-----------------REGISTER USER--------------------------------
 
@@ -39,24 +42,70 @@ class UserUpdateView(generics.RetrieveUpdateDestroyAPIView):
         return self.request.user
 
 
+#-------------------is_following for public user views------------------------
+
+class FollowStatsMixin:
+    # Counts are plain columns on CustomUser. is_following comes from the
+    # viewer's cached following set when available, else one EXISTS subquery.
+
+    def get_following_ids(self):
+        if not hasattr(self, '_following_ids'):
+            self._following_ids = following_ids(self.request.user.id)
+        return self._following_ids
+
+    def with_follow_stats(self, queryset):
+        if self.get_following_ids() is None:
+            return queryset.with_is_following(self.request.user)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['following_ids'] = self.get_following_ids()
+        return context
+
+
 #-------------------View all public users (Explore)------------------------
 
-class PublicUserListView(generics.ListAPIView):
+class PublicUserListView(FollowStatsMixin, generics.ListAPIView):
     serializer_class = PublicUsersSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PublicUserPagination
 
     def get_queryset(self):
-        return CustomUser.objects.exclude(id=self.request.user.id)
+        return self.with_follow_stats(CustomUser.objects.exclude(id=self.request.user.id))
 
     
 #-----------------View public user details-------------------------------
 
-class PublicUserDetailView(generics.RetrieveAPIView):
-    queryset = CustomUser.objects.all()
+class PublicUserDetailView(FollowStatsMixin, generics.RetrieveAPIView):
     serializer_class = PublicUsersSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
 
+    def get_queryset(self):
+        return self.with_follow_stats(CustomUser.objects.all())
+
+    def get_etag(self):
+        # One row of validator columns; is_following from the cached set if any
+        following = self.get_following_ids()
+        users = CustomUser.objects.filter(id=self.kwargs['id'])
+        fields = ['id', 'updated_at', 'followers_count', 'following_count']
+        if following is None:
+            row = users.with_is_following(self.request.user).values_list(*fields, 'is_following').first()
+        else:
+            row = users.values_list(*fields).first()
+            row = row and (*row, row[0] in following)
+        return make_etag(*row) if row else None
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        if etag:
+            cached = not_modified(request, etag)
+            if cached:
+                return cached
+        res = super().retrieve(request, *args, **kwargs)
+        return set_validators(res, etag) if etag else res
+
 
 #-----------------Follow View--------------------------------
 
@@ -105,23 +154,27 @@ class UnfollowUserView(APIView):
 
 #-----------------Followers View--------------------------------
 
-class FollowersListView(generics.ListAPIView):
+class FollowersListView(FollowStatsMixin, generics.ListAPIView):
     serializer_class = PublicUsersSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         username = self.kwargs['username']
-        user = generics.get_object_or_404(CustomUser, username=username)
-        return CustomUser.objects.filter(following_set__following=user)
+        user = generics.get_object_or_404(CustomUser.objects.only('id'), username=username)
+        # Newest follower first, straight off follow_following_idx
+        users = CustomUser.objects.filter(following_set__following=user).order_by('-following_set__followed_at', 'id')
+        return self.with_follow_stats(users)
 
 
 #-----------------Following View--------------------------------
 
-class FollowingListView(generics.ListAPIView):
+class FollowingListView(FollowStatsMixin, generics.ListAPIView):
     serializer_class = PublicUsersSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         username = self.kwargs['username']
-        user = generics.get_object_or_404(CustomUser, username=username)
-        return CustomUser.objects.filter(followers_set__follower=user)
+        user = generics.get_object_or_404(CustomUser.objects.only('id'), username=username)
+        # Most recently followed first, straight off follow_follower_idx
+        users = CustomUser.objects.filter(followers_set__follower=user).order_by('-followers_set__followed_at', 'id')
+        return self.with_follow_stats(users)
@@ -13,17 +13,19 @@ const GroupChat = () => {
   const [onlineUsers, setOnlineUsers] = useState([]);
   const [onlineCount, setOnlineCount] = useState(0);
   const [typingUser, setTypingUser] = useState(null);
+  const [chatError, setChatError] = useState(null);
 
   const socketRef = useRef(null);
   const messagesEndRef = useRef(null);
-  const typingTimeoutRef = useRef(null);
+  const lastTypingSentRef = useRef(0);
+  const lastSentRef = useRef("");
 
   // Fetch message history once
   useEffect(() => {
     const fetchHistory = async () => {
       try {
         const res = await api.get("chat/messages/");
-        setMessages(res.data);
+        setMessages(res.data.results);
       } catch (err) {
         console.error("Failed to fetch chat history:", err);
       }
@@ -47,14 +49,35 @@ const GroupChat = () => {
     socket.onmessage = (event) => {
       const data = JSON.parse(event.data);
 
+      if (data.type === "presence") {
+        setOnlineUsers(data.online_users);
+        setOnlineCount(data.online_count);
+        return;
+      }
+
+      if (data.type === "presence_diff") {
+        setOnlineUsers((prev) => [
+          ...prev.filter((u) => !data.left.includes(u) && !data.joined.includes(u)),
+          ...data.joined,
+        ]);
+        setOnlineCount(data.online_count);
+        return;
+      }
+
+      if (data.type === "error") {
+        // Rate limited or the server couldn't queue it: the message was not posted
+        setChatError(data.error);
+        setMessage((current) => current || lastSentRef.current);
+        return;
+      }
+
       if (data.type === "typing") {
-        if (data.typing && data.user !== authUser.username) {
-          setTypingUser(data.user);
-          clearTimeout(typingTimeoutRef.current);
-          typingTimeoutRef.current = setTimeout(() => {
-            setTypingUser(null);
-          }, 1000);
-        }
+        // Server sends batched start/stop transitions, not every keystroke
+        const started = data.started.filter((u) => u !== authUser.username);
+        setTypingUser((prev) => {
+          if (started.length) return started[0];
+          return data.stopped.includes(prev) ? null : prev;
+        });
         return;
       }
 
@@ -73,9 +96,6 @@ const GroupChat = () => {
           return [...prev, data];
         });
       }
-
-      if (data.online_users) setOnlineUsers(data.online_users);
-      if (data.online_count) setOnlineCount(data.online_count);
     };
 
     socket.onerror = (err) => {
@@ -96,8 +116,11 @@ const GroupChat = () => {
     const socket = socketRef.current;
     if (socket && socket.readyState === WebSocket.OPEN && message.trim()) {
       setSending(true);
+      setChatError(null);
+      lastSentRef.current = message;
       socket.send(JSON.stringify({ message }));
       socket.send(JSON.stringify({ typing: false }));
+      lastTypingSentRef.current = 0;
       setMessage("");
 
       // simulate delay for better UX
@@ -107,7 +130,13 @@ const GroupChat = () => {
 
   const handleTyping = (value) => {
     setMessage(value);
-    if (socketRef.current?.readyState === WebSocket.OPEN) {
+    // The server only needs a refresh every second or so to keep us "typing"
+    const now = Date.now();
+    if (
+      socketRef.current?.readyState === WebSocket.OPEN &&
+      now - lastTypingSentRef.current > 1000
+    ) {
+      lastTypingSentRef.current = now;
       socketRef.current.send(JSON.stringify({ typing: true }));
     }
   };
@@ -202,6 +231,11 @@ const GroupChat = () => {
 
       {/* Input */}
       <div className="p-6 border-t border-gray-200 bg-white">
+        {chatError && (
+          <p className="text-sm text-red-600 mb-3" role="alert">
+            {chatError}
+          </p>
+        )}
         <div className="flex items-center space-x-3">
           <input
             type="text"
@@ -8,6 +8,8 @@ const ExploreUsers = () => {
   const [allUsers, setAllUsers] = useState([]);
   const [query, setQuery] = useState("");
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const filteredUsers = query.trim()
     ? allUsers.filter((user) => {
@@ -23,7 +25,10 @@ const ExploreUsers = () => {
     const fetchUsers = async () => {
       try {
         const { data } = await api.get("users/explore/");
-        if (isMounted) setAllUsers(data);
+        if (isMounted) {
+          setAllUsers(data.results);
+          setNextCursor(data.next_cursor);
+        }
       } catch (err) {
         console.error("Error loading users:", err);
       } finally {
@@ -34,6 +39,20 @@ const ExploreUsers = () => {
     return () => (isMounted = false);
   }, []);
 
+  // Fetch the next page using the cursor returned by the previous one
+  const loadMore = () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    api
+      .get("users/explore/", { params: { cursor: nextCursor } })
+      .then(({ data }) => {
+        setAllUsers((prev) => [...prev, ...data.results]);
+        setNextCursor(data.next_cursor);
+      })
+      .catch((err) => console.error("Error loading users:", err))
+      .finally(() => setLoadingMore(false));
+  };
+
   return (
     <>
       <Navbar />
@@ -64,6 +83,19 @@ const ExploreUsers = () => {
         ) : (
           <MiniUserCard users={filteredUsers} />
         )}
+
+        {/* Load More */}
+        {!loading && nextCursor && (
+          <div className="flex justify-center mt-8">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 bg-purple-600 text-white rounded-lg font-medium hover:bg-purple-700 transition-colors duration-300 disabled:opacity-50"
+            >
+              {loadingMore ? "Loading..." : "Load more people"}
+            </button>
+          </div>
+        )}
       </div>
     </>
   );
@@ -120,6 +120,8 @@ function StoryEdit() {
     data.append("status", formData.status);
     data.append("synopsis", formData.synopsis);
     formData.tags.forEach((tag) => data.append("tags[]", tag));
+    // A blank "tags" field tells the API to clear every tag
+    if (formData.tags.length === 0) data.append("tags", "");
     if (formData.cover_image) data.append("cover_image", formData.cover_image);
 
     try {
@@ -20,7 +20,9 @@ function StoryDetail() {
   const navigate = useNavigate();
   const [story, setStory] = useState(null);
   const [chapters, setChapters] = useState([]);
-  const [comments, setComments] = useState([]);
+  const [comments, setComments] = useState(null);
+  const [commentsCount, setCommentsCount] = useState(0);
+  const [commentsCursor, setCommentsCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [activeTab, setActiveTab] = useState("overview");
@@ -52,8 +54,8 @@ function StoryDetail() {
         const data = res.data;
         setStory(data);
         setChapters(data.chapters || []);
-        setComments(data.comments || []);
-        setIsBookmarked(data.bookmarks?.includes(userId));
+        setCommentsCount(data.comments_count || 0);
+        setIsBookmarked(Boolean(data.is_bookmarked));
         setLikes(data.likes_count || 0);
         setLoading(false);
       })
@@ -64,6 +66,30 @@ function StoryDetail() {
       });
   }, [id, userId]);
 
+  // Comments are only fetched once their tab is opened
+  useEffect(() => {
+    if (activeTab !== "comments" || comments !== null) return;
+    api
+      .get(`core/stories/${id}/comments/`)
+      .then((res) => {
+        setComments(res.data.results);
+        setCommentsCursor(res.data.next_cursor);
+      })
+      .catch((err) => console.error("Failed to load comments:", err));
+  }, [activeTab, comments, id]);
+
+  // Older comments, using the cursor from the previous page
+  const loadMoreComments = () => {
+    if (!commentsCursor) return;
+    api
+      .get(`core/stories/${id}/comments/`, { params: { cursor: commentsCursor } })
+      .then((res) => {
+        setComments((prev) => [...prev, ...res.data.results]);
+        setCommentsCursor(res.data.next_cursor);
+      })
+      .catch((err) => console.error("Failed to load comments:", err));
+  };
+
   const toggleBookmark = async () => {
     if (!userId) {
       setShowLoginModal(true);
@@ -146,7 +172,8 @@ function StoryDetail() {
         content: newComment,
       });
       if (response.status === 201) {
-        setComments((prev) => [response.data, ...prev]);
+        setComments((prev) => [response.data, ...(prev || [])]);
+        setCommentsCount((prev) => prev + 1);
         setNewComment("");
       }
     } catch (err) {
@@ -342,7 +369,7 @@ function StoryDetail() {
             >
               {tab.charAt(0).toUpperCase() + tab.slice(1)}
               {tab === "chapters" && ` (${chapters.length})`}
-              {tab === "comments" && ` (${comments.length})`}
+              {tab === "comments" && ` (${commentsCount})`}
             </motion.button>
           ))}
         </nav>
@@ -505,6 +532,10 @@ function StoryDetail() {
                               : "Unknown"}
                           </span>
                         </div>
+                        <div className="flex items-center space-x-1">
+                          <FiClock className="w-3 h-3" />
+                          <span>{chapter.word_count} words</span>
+                        </div>
                       </div>
                     </div>
                     <FiPlay className="w-5 h-5 text-gray-400 group-hover:text-purple-600 transition-colors" />
@@ -549,7 +580,9 @@ function StoryDetail() {
             </motion.button>
           </div>
           <div className="space-y-4">
-            {comments.length > 0 ? (
+            {comments === null ? (
+              <p className="text-gray-500">Loading comments…</p>
+            ) : comments.length > 0 ? (
               comments.map((comment, index) => (
                 <motion.div
                   key={comment.id}
@@ -560,7 +593,9 @@ function StoryDetail() {
                 >
                   <div className="text-sm text-gray-600 mb-1">
                     {comment.user || "Anonymous"} •{" "}
-                    {comment.created_at ? comment.created_at : "Unknown"}
+                    {comment.created_at
+                      ? new Date(comment.created_at).toLocaleString()
+                      : "Unknown"}
                   </div>
                   <p className="text-gray-800">{comment.content}</p>
                 </motion.div>
@@ -568,6 +603,14 @@ function StoryDetail() {
             ) : (
               <p className="text-gray-500">No comments yet.</p>
             )}
+            {commentsCursor && (
+              <button
+                onClick={loadMoreComments}
+                className="text-purple-600 hover:text-purple-700 font-medium"
+              >
+                Load more comments
+              </button>
+            )}
           </div>
         </motion.div>
       )}
@@ -16,52 +16,88 @@ import NavBar from "../layout/NavBar";
 
 function StoryFeed() {
   const [stories, setStories] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [viewMode, setViewMode] = useState("grid");
   const [searchTerm, setSearchTerm] = useState("");
   const [searchQuery, setSearchQuery] = useState("");
+  const [searchResults, setSearchResults] = useState(null);
   const [selectedGenre, setSelectedGenre] = useState("All");
   const [selectedStatus, setSelectedStatus] = useState("All");
   const [sortBy, setSortBy] = useState("title");
   const [showFilters, setShowFilters] = useState(false);
   const navigate = useNavigate();
 
-  // Fetch stories once
+  const [facets, setFacets] = useState(null);
+
+  // Genre/status filters are applied by the API
+  const filterParams = useMemo(() => {
+    const params = {};
+    if (selectedGenre !== "All") params.genre = selectedGenre;
+    if (selectedStatus !== "All") params.status = selectedStatus;
+    return params;
+  }, [selectedGenre, selectedStatus]);
+
+  // Fetch the first page of stories (and facet counts) for the current filters
   useEffect(() => {
     api
-      .get("core/stories/")
+      .get("core/stories/", { params: filterParams })
       .then((res) => {
-        setStories(res.data);
+        setStories(res.data.results);
+        setNextCursor(res.data.next_cursor);
+        setFacets(res.data.facets);
         setLoading(false);
       })
       .catch((err) => {
         console.error("Error fetching stories:", err);
         setLoading(false);
       });
-  }, []);
+  }, [filterParams]);
 
-  // Unique genres
-  const genres = useMemo(() => {
-    const uniqueGenres = Array.from(
-      new Set(stories.map((story) => story.genre))
-    );
-    return ["All", ...uniqueGenres];
-  }, [stories]);
+  // Fetch the next page using the cursor returned by the previous one
+  const loadMore = () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    api
+      .get("core/stories/", { params: { ...filterParams, cursor: nextCursor } })
+      .then((res) => {
+        setStories((prev) => [...prev, ...res.data.results]);
+        setNextCursor(res.data.next_cursor);
+      })
+      .catch((err) => console.error("Error fetching stories:", err))
+      .finally(() => setLoadingMore(false));
+  };
+
+  // Server-side full-text search (title, synopsis, tags, published chapters)
+  useEffect(() => {
+    if (!searchQuery) {
+      setSearchResults(null);
+      return;
+    }
+    api
+      .get("core/stories/search/", { params: { q: searchQuery } })
+      .then((res) => setSearchResults(res.data.results))
+      .catch((err) => console.error("Error searching stories:", err));
+  }, [searchQuery]);
+
+  // Genres that have stories, from the API's facet counts
+  const genres = useMemo(
+    () => ["All", ...Object.keys(facets?.genre ?? {})],
+    [facets]
+  );
 
   const statuses = ["All", "Ongoing", "Completed", "Hiatus"];
 
   // Filter & sort logic
   const filteredAndSortedStories = useMemo(() => {
-    let filtered = stories.filter((story) => {
-      const matchesSearch =
-        searchQuery === "" ||
-        story.title.toLowerCase().includes(searchQuery.toLowerCase());
+    let filtered = (searchResults ?? stories).filter((story) => {
       const matchesGenre =
         selectedGenre === "All" || story.genre === selectedGenre;
       const matchesStatus =
         selectedStatus === "All" || story.status === selectedStatus;
 
-      return matchesSearch && matchesGenre && matchesStatus;
+      return matchesGenre && matchesStatus;
     });
 
     return filtered.sort((a, b) => {
@@ -78,7 +114,7 @@ function StoryFeed() {
           return 0;
       }
     });
-  }, [stories, searchQuery, selectedGenre, selectedStatus, sortBy]);
+  }, [stories, searchResults, selectedGenre, selectedStatus, sortBy]);
 
   // Handle search action
   const handleSearch = () => {
@@ -202,6 +238,8 @@ function StoryFeed() {
                   {genres.map((genre) => (
                     <option key={genre} value={genre}>
                       {genre}
+                      {facets?.genre?.[genre] !== undefined &&
+                        ` (${facets.genre[genre]})`}
                     </option>
                   ))}
                 </select>
@@ -287,6 +325,19 @@ function StoryFeed() {
             ))}
           </div>
         )}
+
+        {/* Load More */}
+        {nextCursor && !searchResults && (
+          <div className="flex justify-center mt-8">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 bg-purple-600 text-white rounded-lg font-medium hover:bg-purple-700 transition-colors duration-300 disabled:opacity-50"
+            >
+              {loadingMore ? "Loading..." : "Load more stories"}
+            </button>
+          </div>
+        )}
       </div>
     </>
   );
@@ -27,7 +27,7 @@ const Navbar = () => {
 
   const fetchUnreadCount = async () => {
     try {
-      const res = await api.get("core/notifications/");
+      const res = await api.get("core/notifications/", { params: { page_size: 1 } });
       setUnread(res.data.unread_count || 0);
     } catch (err) {
       console.error("Notification fetch error:", err);